@@ -0,0 +1,140 @@
+# benchmarks/card_index_check.py
+"""
+Check the in-memory recipe card index (services/card_index.py) against the
+database listing on a seeded SQLite catalog. It verifies that:
+
+    every combination of sort key, order and range filter lists the same ids
+    in the same order as the SQL listing, including recipes with NULL times
+    and calories and recipes without nutrition facts
+    an empty catalog lists nothing, and its first recipe is listed at once
+    updates, new recipes and deletions reach the index through invalidation
+    GET /recipes/ and GET /recipes/cards answer from it
+
+and reports the index's bytes per recipe next to the ORM objects' and the
+time to compute a listing both ways.
+
+    python -m benchmarks.card_index_check
+"""
+import itertools
+import tracemalloc
+
+from benchmarks.checks import Checks, check_directory, seed, timed
+
+SEED_RECIPES = 3000
+ORM_SAMPLE = 500
+
+FILTERS = [
+    {},
+    {"min_total_minutes": 30, "max_total_minutes": 90},
+    {"max_servings": 4},
+    {"min_calories": 100, "max_calories": 300},
+    {"min_servings": 2, "max_calories": 500},
+]
+
+
+def main():
+    check_directory("card-index-check-", RECIPE_CARD_INDEX="1")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select, update
+
+    import database
+    from benchmarks.seed import CatalogGenerator
+    from models import NutritionFacts, Recipe
+    from routers.recipes import RecipeListFilters, recipe_list_ids_statement
+    from services.card_index import card_index
+    from services.serializers import RECIPE_DOCUMENT_OPTIONS
+
+    generator = CatalogGenerator(1)
+    # Schema and vocabulary only: the first checks run against an empty catalog
+    seed(0, generator)
+
+    checks = Checks()
+
+    from main import app
+
+    with TestClient(app) as client:
+        listing = client.get("/recipes/")
+        cards = client.get("/recipes/cards")
+        checks.expect("an empty catalog lists no recipes",
+                      listing.status_code == 200 and listing.json()["recipes"] == []
+                      and cards.status_code == 200 and cards.json()["cards"] == [])
+        created = client.post("/recipes/", json=generator.payload(1))
+        listing = client.get("/recipes/")
+        checks.expect("the first recipe created is listed",
+                      created.status_code == 200 and listing.status_code == 200
+                      and [item["id"] for item in listing.json()["recipes"]] == [1])
+
+    # The app's shutdown disposed of the engines; seeding creates them again
+    seed(SEED_RECIPES - 1, generator)
+    # NULLs and missing nutrition facts, which both sides must place the same way
+    with database.engine.begin() as connection:
+        connection.execute(update(Recipe).where(Recipe.id % 17 == 0).values(total_time_minutes=None))
+        connection.execute(update(NutritionFacts).where(NutritionFacts.recipe_id % 13 == 0).values(calories_per_serving=None))
+        connection.execute(update(NutritionFacts).where(NutritionFacts.recipe_id % 19 == 0).values(deleted=True))
+    # Written around the session, so nothing told the index
+    card_index.invalidate()
+
+    def make_filters(sort, order, values):
+        arguments = dict.fromkeys((
+            "min_total_minutes", "max_total_minutes", "min_servings", "max_servings", "min_calories", "max_calories",
+        ))
+        arguments.update(values, sort=sort, order=order)
+        return RecipeListFilters(**arguments)
+
+    def mismatches():
+        found = []
+        with database.SessionLocal() as db:
+            for sort, order, values in itertools.product(
+                ("id", "title", "total_time", "servings", "calories"), ("asc", "desc"), FILTERS,
+            ):
+                filters = make_filters(sort, order, values)
+                card_index.ensure_current()
+                if card_index.ordered_ids(filters) != db.scalars(recipe_list_ids_statement(filters)).all():
+                    found.append((sort, order, values))
+        return found
+
+    card_index.ensure_current()
+    different = mismatches()
+    checks.expect(f"{10 * len(FILTERS)} listings match the database"
+                  + (f" (differ: {different[:3]})" if different else ""), not different)
+
+    filters = make_filters("calories", "desc", {"max_servings": 6})
+    index_ms = timed(lambda: card_index.ordered_ids(filters), 20)
+    with database.SessionLocal() as db:
+        database_ms = timed(lambda: db.scalars(recipe_list_ids_statement(filters)).all(), 20)
+    print(f"     listing ids: index {index_ms:.2f} ms, database {database_ms:.2f} ms")
+
+    status = card_index.status()
+    with database.SessionLocal() as db:
+        tracemalloc.start()
+        recipes = db.scalars(select(Recipe).options(*RECIPE_DOCUMENT_OPTIONS).limit(ORM_SAMPLE)).all()
+        orm_bytes = tracemalloc.get_traced_memory()[0] / len(recipes)
+        tracemalloc.stop()
+    print(f"     {status['recipes']} recipes: {status['bytes_per_recipe']} bytes per recipe in the index, "
+          f"{orm_bytes:.0f} as ORM objects with their relationships")
+    checks.expect("the index is far smaller than the ORM objects", status["bytes_per_recipe"] < orm_bytes / 10)
+
+    with TestClient(app) as client:
+        with database.SessionLocal() as db:
+            recipe = db.get(Recipe, 5)
+            recipe.servings, recipe.title = 99, "Aaa first title"
+            db.get(Recipe, 6).deleted = True
+            db.commit()
+        checks.expect("writes mark the recipes stale", not card_index.current)
+        by_servings = [item["id"] for item in client.get("/recipes/?sort=servings&order=desc").json()["recipes"]]
+        by_title = [item["id"] for item in client.get("/recipes/?sort=title").json()["recipes"]]
+        checks.expect("GET /recipes/ lists the updated and deleted recipes correctly",
+                      card_index.current and by_servings[0] == 5 and by_title[0] == 5 and 6 not in by_servings)
+        checks.expect("after the write, listings still match the database", not mismatches())
+        cards = client.get("/recipes/cards?offset=0&limit=5").json()["cards"]
+        checks.expect("GET /recipes/cards pages through the index",
+                      [card["id"] for card in cards] == [1, 2, 3, 4, 5] and cards[4]["servings"] == 99)
+        metrics = client.get("/metrics").text
+        checks.expect("metrics report bytes per recipe", "recipe_card_index_bytes_per_recipe" in metrics)
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    main()
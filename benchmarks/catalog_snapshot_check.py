@@ -0,0 +1,160 @@
+# benchmarks/catalog_snapshot_check.py
+"""
+Check the memory-mapped catalog snapshot (services/catalog_snapshot.py)
+against a seeded SQLite catalog. It verifies that:
+
+    the snapshot is built when the app starts without one
+    GET /recipes/{id} and GET /recipes/cards return the same bytes from the
+    snapshot as from the database, and reports the latency of each
+    a new recipe is served at once (from the database while dirty), then from
+    the snapshot after an incremental build
+    a tag rename triggers a full rebuild carrying the new name
+    a second worker maps the file instead of building its own
+
+    python -m benchmarks.catalog_snapshot_check
+"""
+import json
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.checks import Checks, check_directory, seed
+
+SEED_RECIPES = 200
+REPEATS = 200
+BUILD_TIMEOUT_S = 10
+
+NEW_RECIPE = {
+    "title": "Snapshot check soup",
+    "prep_time_value": 10,
+    "prep_time_unit": "minutes",
+    "cook_time_value": 1,
+    "cook_time_unit": "hours",
+    "servings": 4,
+    "nutrition_facts": {"calories": "320", "fat": "12g", "carbohydrates": "40g", "protein": "9g"},
+    "instructions": [{"step_number": 1, "instruction": "Simmer everything."}],
+    "ingredients": [{"item": "Water", "quantity": "1 l", "price": 0.1, "currency": "EUR"}],
+    "categories": [{"name": "Soups"}],
+    "tags": [{"name": "Snapshot"}],
+}
+
+
+def peer():
+    """
+    The second worker: reports what it built and whether it served from the file.
+    """
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from services.catalog_snapshot import catalog_snapshot
+
+    with TestClient(app) as client:
+        deadline = time.time() + BUILD_TIMEOUT_S
+        while catalog_snapshot.snapshot is None and time.time() < deadline:
+            time.sleep(0.05)
+        client.get("/recipes/1")
+        print(json.dumps({"status": catalog_snapshot.status(), "hits": catalog_snapshot.hits}), flush=True)
+
+
+def wait_until(condition):
+    deadline = time.time() + BUILD_TIMEOUT_S
+    while not condition() and time.time() < deadline:
+        time.sleep(0.02)
+    return condition()
+
+
+def main():
+    if "--peer" in sys.argv:
+        return peer()
+
+    directory = check_directory(
+        "catalog-snapshot-check-", CATALOG_SNAPSHOT_DEBOUNCE_S="0.05", CATALOG_SNAPSHOT_POLL_INTERVAL_S="0.1",
+    )
+    os.environ["CATALOG_SNAPSHOT_PATH"] = os.path.join(directory, "catalog.snapshot")
+
+    from fastapi.testclient import TestClient
+
+    from services.catalog_snapshot import catalog_snapshot
+    from services.recipe_cache import recipe_cache
+
+    seed(SEED_RECIPES)
+
+    from main import app
+
+    checks = Checks()
+
+    def timed(client, path):
+        started = time.perf_counter()
+        for _ in range(REPEATS):
+            response = client.get(path)
+        return response, (time.perf_counter() - started) * 1000 / REPEATS
+
+    with TestClient(app) as client:
+        checks.expect("snapshot is built at startup",
+                      wait_until(lambda: catalog_snapshot.snapshot is not None)
+                      and catalog_snapshot.snapshot.count == SEED_RECIPES and catalog_snapshot.builds["full"] == 1)
+        snapshot = catalog_snapshot.snapshot
+        print(f"     {snapshot.count} recipes, {snapshot.size / 1024:.0f} KiB")
+
+        hits = catalog_snapshot.hits
+        mapped, mapped_ms = timed(client, "/recipes/1")
+        cards, cards_ms = timed(client, "/recipes/cards?offset=20&limit=100")
+        checks.expect("reads are served from the snapshot", catalog_snapshot.hits == hits + 2 * REPEATS)
+
+        # The same requests the usual way: the dirty-everything state makes both fall back
+        catalog_snapshot._dirty_all = time.time()
+        recipe_cache.invalidate()
+        _, database_ms = timed(client, "/recipes/1")
+        _, database_cards_ms = timed(client, "/recipes/cards?offset=20&limit=100")
+        checks.expect("GET /recipes/1 matches the database bytes", mapped.content == client.get("/recipes/1").content)
+        checks.expect("GET /recipes/cards matches the database bytes",
+                      cards.content == client.get("/recipes/cards?offset=20&limit=100").content)
+        scaled = client.get("/recipes/1?servings=12").json()
+        catalog_snapshot._dirty_all = None
+        checks.expect("scaled recipes match", client.get("/recipes/1?servings=12").json() == scaled)
+        print(f"     GET /recipes/1: snapshot {mapped_ms:.2f} ms, cache/database {database_ms:.2f} ms")
+        print(f"     GET /recipes/cards: snapshot {cards_ms:.2f} ms, database {database_cards_ms:.2f} ms")
+
+        builds = dict(catalog_snapshot.builds)
+        client.post("/recipes/", json=NEW_RECIPE)
+        recipe_id = SEED_RECIPES + 1
+        hits = catalog_snapshot.hits
+        document = client.get(f"/recipes/{recipe_id}")
+        checks.expect("a new recipe is served at once, from the database",
+                      document.status_code == 200 and catalog_snapshot.hits == hits)
+        checks.expect("an incremental build picks it up",
+                      wait_until(lambda: catalog_snapshot.snapshot.document(recipe_id) is not None
+                                 and recipe_id not in catalog_snapshot._dirty)
+                      and catalog_snapshot.builds["incremental"] == builds["incremental"] + 1
+                      and catalog_snapshot.builds["full"] == builds["full"])
+        hits = catalog_snapshot.hits
+        checks.expect("then it is served from the snapshot",
+                      client.get(f"/recipes/{recipe_id}").content == document.content and catalog_snapshot.hits == hits + 1)
+
+        name = client.get("/recipes/1").json()["tags"][0]
+        tag_id = next(tag["id"] for tag in client.get("/tags/").json() if tag["name"] == name)
+        client.put(f"/tags/{tag_id}", json={"name": "Renamed tag"})
+        checks.expect("a tag rename is served at once", "Renamed tag" in client.get("/recipes/1").json()["tags"])
+        checks.expect("and triggers a full rebuild carrying the new name",
+                      wait_until(lambda: catalog_snapshot._dirty_all is None)
+                      and catalog_snapshot.builds["full"] == builds["full"] + 1
+                      and b"Renamed tag" in bytes(catalog_snapshot.snapshot.document(1)))
+
+        worker = subprocess.run(
+            [sys.executable, "-m", "benchmarks.catalog_snapshot_check", "--peer"],
+            capture_output=True, text=True, env=os.environ, timeout=60,
+        )
+        report = json.loads(worker.stdout.strip().splitlines()[-1]) if worker.returncode == 0 else None
+        checks.expect("a second worker maps the file without building",
+                      report is not None and report["hits"] == 1
+                      and report["status"]["builds"] == {"full": 0, "incremental": 0})
+        metrics = client.get("/metrics").text
+        checks.expect("metrics report the snapshot", "catalog_snapshot_recipes" in metrics
+                      and 'catalog_snapshot_builds_total{kind="incremental"}' in metrics)
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+# benchmarks/checks.py
+"""
+Shared scaffolding for the behaviour checks in benchmarks/, and a runner for
+all of them.
+
+A check points the app at a throwaway SQLite catalog before importing it,
+reports each expectation and exits with status 1 if any failed:
+
+    directory = check_directory("card-index-check-", RECIPE_CARD_INDEX="1")
+    ...import the app modules, which read the environment...
+    seed(200)
+    checks = Checks()
+    checks.expect("the listing matches", ...)
+    checks.finish()
+
+The app reads its settings at import, so the runner starts each check in its
+own process and exits with status 1 if any failed:
+
+    python -m benchmarks.checks
+    python -m benchmarks.checks card_index_check sql_json_check
+"""
+import argparse
+import atexit
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+# (module, arguments) of every check, in the order the runner starts them
+CHECKS = (
+    ("replica_routing", ()),
+    ("replica_routing", ("--async-db",)),
+    ("invalidation_check", ()),
+    ("shared_cache_check", ()),
+    ("single_flight_check", ()),
+    ("catalog_snapshot_check", ()),
+    ("card_index_check", ()),
+    ("sql_json_check", ()),
+    ("document_table_check", ()),
+)
+
+
+class Checks:
+    """
+    The expectations of one check, printed as they are met or missed.
+    """
+
+    def __init__(self):
+        self.failures = []
+
+    def expect(self, label, condition):
+        print(f"{'ok  ' if condition else 'FAIL'} {label}", flush=True)
+        if not condition:
+            self.failures.append(label)
+
+    def finish(self):
+        if self.failures:
+            sys.exit(1)
+
+
+def check_directory(prefix, database="catalog.db", **environment):
+    """
+    A temporary directory, removed at exit, holding the SQLite file DATABASE_URL now
+    points at. The app runs sync with no warm-up unless `environment` says otherwise.
+    """
+    directory = tempfile.mkdtemp(prefix=prefix)
+    atexit.register(shutil.rmtree, directory, True)
+    os.environ.update(
+        DATABASE_URL=f"sqlite:///{os.path.join(directory, database)}",
+        USE_ASYNC_DB="0",
+        WARMUP_ENABLED="0",
+    )
+    os.environ.update(environment)
+    return directory
+
+
+def seed(recipes, generator=None):
+    """
+    Migrate DATABASE_URL, add `recipes` generated recipes and return the engine.
+    """
+    import database
+    from benchmarks.seed import CatalogGenerator, seed_catalog
+
+    engine = database.init_engines()
+    seed_catalog(engine, recipes, generator or CatalogGenerator(1), progress=lambda line: None)
+    return engine
+
+
+def timed(function, repeats):
+    """
+    Median milliseconds of `repeats` calls of `function`.
+    """
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - started) * 1000)
+    return statistics.median(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("modules", nargs="*", help="Checks to run; all of them if omitted")
+    args = parser.parse_args()
+
+    failed = []
+    for module, arguments in CHECKS:
+        if args.modules and module not in args.modules:
+            continue
+        name = " ".join((module, *arguments))
+        print(f"== {name}", flush=True)
+        if subprocess.run([sys.executable, "-m", f"benchmarks.{module}", *arguments]).returncode != 0:
+            failed.append(name)
+    if failed:
+        print(f"Failed: {', '.join(failed)}")
+        sys.exit(1)
+    print("All checks passed")
+
+
+if __name__ == "__main__":
+    main()
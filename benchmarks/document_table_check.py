@@ -0,0 +1,159 @@
+# benchmarks/document_table_check.py
+"""
+Check the recipe_documents table (services/document_table.py) on a seeded
+SQLite catalog. It verifies that:
+
+    the rebuild CLI fills the table with the documents the database renders
+    GET /recipes/{id} sends the stored bytes, gzip-compressed when accepted,
+    and rescales them on request
+    creating a recipe, editing a recipe, ingredient prices, renaming and
+    deleting a tag, and soft-deleting a recipe rewrite the rows in the same
+    transaction, while a rolled-back write leaves them alone
+    after all of that, every row still matches a fresh rendering
+
+and times one recipe read from the table, assembled by the database, and
+loaded through the ORM.
+
+    python -m benchmarks.document_table_check
+"""
+import gzip
+import json
+import os
+import subprocess
+import sys
+
+from benchmarks.checks import Checks, check_directory, seed, timed
+
+SEED_RECIPES = 500
+REPEATS = 200
+
+NEW_RECIPE = {
+    "title": "Document table check stew",
+    "prep_time_value": 15,
+    "prep_time_unit": "minutes",
+    "cook_time_value": 2,
+    "cook_time_unit": "hours",
+    "servings": 6,
+    "nutrition_facts": {"calories": "410", "fat": "18g", "carbohydrates": "30g", "protein": "28g"},
+    "instructions": [{"step_number": 1, "instruction": "Brown the meat."}, {"step_number": 2, "instruction": "Braise."}],
+    "ingredients": [{"item": "Beef", "quantity": "1 kg", "price": 12.0, "currency": "EUR"}],
+    "categories": [{"name": "Stews"}],
+    "tags": [{"name": "Document table"}],
+}
+
+
+def main():
+    check_directory("document-table-check-", RECIPE_DOCUMENT_TABLE="1", RECIPE_CACHE_SIZE="0")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+
+    import database
+    from models import Ingredient, Recipe
+    from routers.recipes import recipe_by_id_statement
+    from services import document_table
+    from services.document_loader import load_document
+    from services.document_table import load_stored, recipe_documents
+    from services.sql_documents import load_json
+
+    seed(SEED_RECIPES)
+
+    checks = Checks()
+
+    def stored(recipe_id):
+        with database.SessionLocal() as db:
+            return load_stored(db, recipe_id)
+
+    def rendered(recipe_id):
+        with database.SessionLocal() as db:
+            return load_json(db, [recipe_id]).get(recipe_id)
+
+    def stale_rows():
+        with database.SessionLocal() as db:
+            rows = dict(db.execute(select(recipe_documents.c.recipe_id, recipe_documents.c.document)).all())
+            live = load_json(db, db.scalars(select(Recipe.id)).all())
+        return {recipe_id for recipe_id in rows.keys() | live.keys()
+                if recipe_id not in rows or recipe_id not in live or rows[recipe_id].encode("utf-8") != live[recipe_id]}
+
+    checks.expect("the table starts empty", stored(1) is None)
+    cli = subprocess.run(
+        [sys.executable, "-m", "services.document_table"], capture_output=True, text=True, env=os.environ, timeout=120,
+    )
+    report = cli.stdout.strip().splitlines()[-1] if cli.returncode == 0 else cli.stderr[-300:]
+    checks.expect(f"the rebuild CLI renders every live recipe ({report})", cli.returncode == 0 and not stale_rows())
+
+    from main import app
+
+    with TestClient(app) as client:
+        document = stored(7)
+        hits = document_table.stats["hits"]
+        plain = client.get("/recipes/7", headers={"Accept-Encoding": "identity"})
+        checks.expect("GET /recipes/7 sends the stored bytes",
+                      plain.content == document and "content-encoding" not in plain.headers
+                      and plain.headers.get("vary") == "Accept-Encoding")
+        with client.stream("GET", "/recipes/7", headers={"Accept-Encoding": "gzip"}) as response:
+            encoding, vary = response.headers.get("content-encoding"), response.headers.get("vary")
+            raw = b"".join(response.iter_raw())
+        checks.expect("with Accept-Encoding: gzip it sends the gzip copy",
+                      encoding == "gzip" and vary == "Accept-Encoding" and gzip.decompress(raw) == plain.content)
+        scaled = client.get("/recipes/7?servings=3")
+        checks.expect("GET /recipes/7?servings=3 rescales the stored document",
+                      scaled.json()["servings"] == 3 and scaled.headers.get("vary") == "Accept-Encoding")
+        checks.expect("the reads hit the table", document_table.stats["hits"] == hits + 3)
+
+        client.post("/recipes/", json=NEW_RECIPE)
+        recipe_id = SEED_RECIPES + 1
+        checks.expect("a new recipe gets its row when it commits",
+                      stored(recipe_id) is not None and stored(recipe_id) == rendered(recipe_id))
+
+        name = client.get("/recipes/1").json()["tags"][0]
+        tag_id = next(tag["id"] for tag in client.get("/tags/").json() if tag["name"] == name)
+        tagged = [recipe_id for recipe_id in range(1, SEED_RECIPES + 1) if name in json.loads(stored(recipe_id))["tags"]]
+        client.put(f"/tags/{tag_id}", json={"name": "Renamed tag"})
+        checks.expect(f"a tag rename rewrites the {len(tagged)} recipes carrying it",
+                      all("Renamed tag" in json.loads(stored(recipe_id))["tags"] for recipe_id in tagged))
+        client.delete(f"/tags/{tag_id}")
+        checks.expect("deleting the tag removes it from them",
+                      not any("Renamed tag" in json.loads(stored(recipe_id))["tags"] for recipe_id in tagged))
+
+        with database.SessionLocal() as db:
+            recipe = db.get(Recipe, 5)
+            recipe.title = "Retitled"
+            recipe.instructions[0].instruction = "Edited step"
+            ingredient = db.get(Ingredient, 1)
+            ingredient.price = (ingredient.price or 0) + 1
+            db.get(Recipe, 6).deleted = True
+            db.commit()
+        checks.expect("edits to a recipe and its steps are rewritten",
+                      json.loads(stored(5))["title"] == "Retitled"
+                      and json.loads(stored(5))["instructions"][0]["instruction"] == "Edited step")
+        checks.expect("a soft-deleted recipe loses its row, and GET answers 404",
+                      stored(6) is None and client.get("/recipes/6").status_code == 404)
+
+        before = stored(8)
+        with database.SessionLocal() as db:
+            db.get(Recipe, 8).title = "Never committed"
+            db.flush()
+            db.rollback()
+        checks.expect("a rolled-back write leaves the row alone", stored(8) == before)
+
+        stale = stale_rows()
+        checks.expect(f"every row matches a fresh rendering (ingredient price change included)"
+                      + (f" (stale: {sorted(stale)[:5]})" if stale else ""), not stale)
+        checks.expect("metrics report the table's hits", 'cache="recipe_document_table"' in client.get("/metrics").text)
+
+    size = len(stored(7))
+    with database.SessionLocal() as db:
+        compressed = load_stored(db, 7, compressed=True)
+        table_ms = timed(lambda: load_stored(db, 7), REPEATS)
+        sql_ms = timed(lambda: load_json(db, [7]), REPEATS)
+        orm_ms = timed(lambda: (load_document(db, 7, recipe_by_id_statement(7)), db.expunge_all()), REPEATS)
+    checks.expect("the gzip copy decompresses to the document", gzip.decompress(compressed) == stored(7))
+    print(f"     recipe 7: {size} bytes, {len(compressed)} gzip-compressed")
+    print(f"     one recipe: table {table_ms:.3f} ms, SQL JSON {sql_ms:.3f} ms, ORM {orm_ms:.3f} ms")
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,90 @@
+# benchmarks/import_budget.py
+"""
+Worker cold-start check: time `import main` in fresh interpreters and fail
+when the best run exceeds the budget, when the import touches the database,
+or when it pulls in modules that should load on first use (NumPy).
+
+The budget is relative: the time `import main` adds on top of `import
+fastapi` in the same interpreter (SQLAlchemy, models, routers, services),
+as a multiple of the time `import fastapi` took. A slow or busy machine
+slows both, so the ratio holds where a wall-clock number does not, and
+FastAPI and pydantic, which no change here can make cheaper, are left out.
+
+    python -m benchmarks.import_budget
+    python -m benchmarks.import_budget --budget-ratio 0.8 --runs 5
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+
+# Modules the app only needs once a request uses them
+LAZY_MODULES = ("numpy",)
+
+PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import fastapi
+baseline = time.perf_counter()
+import main
+finished = time.perf_counter()
+print(json.dumps({
+    "fastapi": baseline - started, "main": finished - baseline,
+    "loaded": [name for name in %r if name in sys.modules],
+}))
+"""
+
+
+def measure_import(database_url):
+    """
+    Import the app once in a fresh interpreter; returns (seconds for fastapi, seconds main
+    added on top, lazy modules loaded).
+    """
+    env = {**os.environ, "DATABASE_URL": database_url}
+    result = subprocess.run(
+        [sys.executable, "-c", PROBE % (LAZY_MODULES,)],
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        env=env, capture_output=True, text=True, check=True,
+    )
+    report = json.loads(result.stdout.strip().splitlines()[-1])
+    return report["fastapi"], report["main"], report["loaded"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument(
+        "--budget-ratio", type=float, default=1.0, help="What import main may add, as a multiple of import fastapi",
+    )
+    parser.add_argument("--runs", type=int, default=3, help="Best of this many fresh imports")
+    args = parser.parse_args()
+
+    failures = []
+    with tempfile.TemporaryDirectory() as directory:
+        # A file-backed SQLite URL that does not exist yet: importing must not create it
+        database_path = os.path.join(directory, "import-budget.db")
+        baselines, timings = [], []
+        for _ in range(args.runs):
+            baseline, seconds, loaded = measure_import(f"sqlite:///{database_path}")
+            baselines.append(baseline)
+            timings.append(seconds)
+        if os.path.exists(database_path):
+            failures.append("importing main connected to the database")
+        if loaded:
+            failures.append(f"importing main loaded {', '.join(loaded)}")
+
+    best_ms, baseline_ms = min(timings) * 1000, min(baselines) * 1000
+    budget_ms = baseline_ms * args.budget_ratio
+    print(f"import main after import fastapi ({baseline_ms:.0f} ms): best {best_ms:.0f} ms, "
+          f"worst {max(timings) * 1000:.0f} ms over {args.runs} runs (budget {budget_ms:.0f} ms)")
+    if best_ms > budget_ms:
+        failures.append(f"import took {best_ms:.0f} ms, over the {budget_ms:.0f} ms budget")
+    if failures:
+        for failure in failures:
+            print(f"  FAIL {failure}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+# benchmarks/invalidation_check.py
+"""
+Check cross-worker cache invalidation (services/invalidation.py) with the
+unix backend: this process and a peer worker process share one SQLite file
+and a socket directory, and the check verifies that:
+
+    a tag rename here is visible here at once (local eviction at commit)
+    the peer evicts the recipes it cached, and how quickly
+    the peer clears its caches after a lost message (a write that bumps the
+    generation without publishing) within the gap grace period
+
+    python -m benchmarks.invalidation_check
+"""
+import json
+import os
+import sqlite3
+import subprocess
+import sys
+import time
+
+from benchmarks.checks import Checks, check_directory, seed
+
+POLL_INTERVAL_S = 0.2
+# Eviction after a published message should take milliseconds, not poll intervals
+MAX_EVICTION_MS = 100
+
+
+def peer():
+    """
+    The second worker: answers commands read from stdin, one per line.
+
+        get <recipe id>                       -> the recipe's tag names
+        wait <recipe id> <since> <timeout>    -> ms from `since` until evicted, or "timeout"
+    """
+    from fastapi.testclient import TestClient
+
+    from main import app
+    from services.recipe_cache import recipe_cache
+
+    with TestClient(app) as client:
+        print("ready", flush=True)
+        for line in sys.stdin:
+            command, recipe_id, *rest = line.split()
+            recipe_id = int(recipe_id)
+            if command == "get":
+                reply = client.get(f"/recipes/{recipe_id}").json()["tags"]
+            else:
+                since, timeout = float(rest[0]), float(rest[1])
+                while recipe_id in recipe_cache and time.time() < since + timeout:
+                    time.sleep(0.001)
+                reply = "timeout" if recipe_id in recipe_cache else round((time.time() - since) * 1000, 1)
+            print(json.dumps(reply), flush=True)
+
+
+def main():
+    directory = check_directory(
+        "invalidation-check-",
+        INVALIDATION_BACKEND="unix",
+        INVALIDATION_POLL_INTERVAL_S=str(POLL_INTERVAL_S),
+    )
+    os.environ["INVALIDATION_SOCKET_DIR"] = os.path.join(directory, "sockets")
+
+    from fastapi.testclient import TestClient
+
+    import database
+
+    seed(20)
+
+    worker = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.invalidation_check", "--peer"],
+        stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, env=os.environ,
+    )
+
+    def ask(*command):
+        worker.stdin.write(" ".join(str(part) for part in command) + "\n")
+        worker.stdin.flush()
+        return json.loads(worker.stdout.readline())
+
+    checks = Checks()
+
+    from main import app
+
+    try:
+        if worker.stdout.readline().strip() != "ready":
+            raise SystemExit("peer worker did not start")
+        with TestClient(app) as client:
+            recipe_id = 1
+            old_name = client.get(f"/recipes/{recipe_id}").json()["tags"][0]
+            tag_id = next(tag["id"] for tag in client.get("/tags/").json() if tag["name"] == old_name)
+            checks.expect("peer caches the recipe", ask("get", recipe_id) == client.get(f"/recipes/{recipe_id}").json()["tags"])
+
+            renamed_at = time.time()
+            client.put(f"/tags/{tag_id}", json={"name": "Renamed once"})
+            checks.expect("rename is visible here at once", "Renamed once" in client.get(f"/recipes/{recipe_id}").json()["tags"])
+            elapsed_ms = ask("wait", recipe_id, renamed_at, 5)
+            checks.expect(f"peer evicts the recipe (after {elapsed_ms} ms)",
+                          elapsed_ms != "timeout" and elapsed_ms <= MAX_EVICTION_MS)
+            checks.expect("peer serves the new name", "Renamed once" in ask("get", recipe_id))
+
+            # A write whose message never arrives: change the row and bump the
+            # generation behind the workers' backs
+            lost_at = time.time()
+            with sqlite3.connect(database.engine.url.database) as connection:
+                connection.execute("UPDATE tags SET name = 'Renamed twice' WHERE id = ?", (tag_id,))
+                connection.execute("UPDATE cache_generation SET generation = generation + 1 WHERE id = 1")
+            elapsed_ms = ask("wait", recipe_id, lost_at, 10 * POLL_INTERVAL_S)
+            checks.expect(f"peer clears its caches after a lost message (after {elapsed_ms} ms)", elapsed_ms != "timeout")
+            checks.expect("peer serves the new name", "Renamed twice" in ask("get", recipe_id))
+    finally:
+        worker.stdin.close()
+        worker.wait(timeout=30)
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    if sys.argv[1:] == ["--peer"]:
+        peer()
+    else:
+        main()
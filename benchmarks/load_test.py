@@ -0,0 +1,135 @@
+# benchmarks/load_test.py
+"""
+Closed-loop HTTP load test: each client sends requests back to back for a fixed
+duration, cycling through the given paths. Reports throughput, latency
+percentiles and errors.
+
+Against a running server:
+    python -m benchmarks.load_test --url http://127.0.0.1:8002 --clients 500
+
+Sync vs async database path, each on a fresh uvicorn process:
+    python -m benchmarks.load_test --compare --database-url sqlite:///./bench.db
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+
+import httpx
+
+DEFAULT_PATHS = ["/recipes/?sort=total_time", "/recipes/1", "/tags/", "/tags/1"]
+
+
+def percentile(values, fraction):
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+async def run_load(url, paths, clients, duration):
+    latencies = []
+    errors = 0
+    deadline = time.perf_counter() + duration
+    limits = httpx.Limits(max_connections=clients, max_keepalive_connections=clients)
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        async def worker(offset):
+            nonlocal errors
+            i = offset
+            while time.perf_counter() < deadline:
+                path = paths[i % len(paths)]
+                i += 1
+                started = time.perf_counter()
+                try:
+                    response = await client.get(path)
+                    if response.status_code >= 500:
+                        errors += 1
+                        continue
+                except httpx.HTTPError:
+                    errors += 1
+                    continue
+                latencies.append(time.perf_counter() - started)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(i) for i in range(clients)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "clients": clients,
+        "requests": len(latencies),
+        "errors": errors,
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "p50_ms": round(percentile(latencies, 0.50) * 1000, 2) if latencies else None,
+        "p95_ms": round(percentile(latencies, 0.95) * 1000, 2) if latencies else None,
+        "p99_ms": round(percentile(latencies, 0.99) * 1000, 2) if latencies else None,
+    }
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def start_server(database_url, use_async, extra_env=None):
+    """
+    Start uvicorn on a free local port with the given database settings and
+    return once it reports ready.
+    """
+    port = _free_port()
+    env = dict(os.environ, DATABASE_URL=database_url, USE_ASYNC_DB="1" if use_async else "0", **(extra_env or {}))
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "main:app", "--port", str(port), "--log-level", "warning"],
+        env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+    )
+    url = f"http://127.0.0.1:{port}"
+    # Wait for the warm-up to finish, as a load balancer would
+    for _ in range(300):
+        try:
+            if httpx.get(f"{url}/ready", timeout=1).status_code == 200:
+                return process, url
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    process.terminate()
+    raise RuntimeError("Server did not start")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://127.0.0.1:8002")
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--clients", type=int, default=500)
+    parser.add_argument("--duration", type=float, default=30)
+    parser.add_argument("--compare", action="store_true", help="Start sync and async servers and compare them")
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"))
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+
+    results = {}
+    if args.compare:
+        for mode, use_async in (("sync", False), ("async", True)):
+            process, url = start_server(args.database_url, use_async)
+            try:
+                results[mode] = asyncio.run(run_load(url, args.paths, args.clients, args.duration))
+            finally:
+                process.terminate()
+                process.wait()
+    else:
+        results["target"] = asyncio.run(run_load(args.url, args.paths, args.clients, args.duration))
+
+    for mode, result in results.items():
+        print(f"{mode:>7}: {result['throughput_rps']:>8} req/s  p50 {result['p50_ms']} ms  "
+              f"p95 {result['p95_ms']} ms  p99 {result['p99_ms']} ms  errors {result['errors']}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,70 @@
+# benchmarks/memory.py
+"""
+Peak memory per route on a seeded database (see benchmarks/seed.py).
+
+Runs the app in-process with MEMORY_PROFILING on, calls each path
+--iterations times and prints the per-route peaks and the largest live
+allocation sites reported by /health/memory.
+
+    python -m benchmarks.memory --database-url sqlite:///./bench-10000.db
+    python -m benchmarks.memory --database-url sqlite:///./bench-10000.db \\
+        --paths "/recipes/?max_total_minutes=20" /recipes/42 --ceiling-mb 0
+"""
+import argparse
+import json
+import os
+
+DEFAULT_PATHS = [
+    "/recipes/",
+    "/recipes/?min_total_minutes=30&max_total_minutes=30&sort=calories",
+    "/recipes/1",
+    "/recipes/1?servings=8",
+    "/recipes/nearest-macros?calories=500&protein=30&k=10",
+    "/tags/",
+    "/tags/1",
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), required=not os.getenv("DATABASE_URL"))
+    parser.add_argument("--paths", nargs="+", default=DEFAULT_PATHS)
+    parser.add_argument("--iterations", type=int, default=3)
+    parser.add_argument("--ceiling-mb", type=int, help="Override RESPONSE_MEMORY_CEILING_MB (0 never streams)")
+    parser.add_argument("--async-db", action="store_true")
+    parser.add_argument("--output", help="Write the report as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ.update(
+        DATABASE_URL=args.database_url,
+        MEMORY_PROFILING="1",
+        USE_ASYNC_DB="1" if args.async_db else "0",
+    )
+    if args.ceiling_mb is not None:
+        os.environ["RESPONSE_MEMORY_CEILING_MB"] = str(args.ceiling_mb)
+
+    # Imported after the environment is set; settings are read at import
+    from fastapi.testclient import TestClient
+    from main import app
+
+    with TestClient(app) as client:
+        for path in args.paths:
+            for _ in range(args.iterations):
+                client.get(path).raise_for_status()
+        report = client.get("/health/memory").json()
+
+    print(f"{'route':<40} {'requests':>8} {'peak KiB max':>13} {'avg':>10}")
+    for route, stats in report["routes"].items():
+        if route.endswith("/health/memory"):
+            continue
+        print(f"{route:<40} {stats['requests']:>8} {stats['peak_kib_max']:>13} {stats['peak_kib_avg']:>10}")
+    print("\nLargest live allocations:")
+    for allocation in report["top_allocations"]:
+        print(f"  {allocation['kib']:>10} KiB  {allocation['location']}")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,183 @@
+# benchmarks/micro.py
+"""
+Microbenchmarks for the CPU-heavy pieces of the request path, on in-memory
+SQLite with a fixed seed:
+
+    validate_*      RecipeCreate validation of small / medium / large payloads
+    serialize_*     recipe_to_dict and the JSON body for 100 loaded recipes (GET /recipes/)
+    normalize_names strip().capitalize() over 1000 names
+    tag_lookup      the case-insensitive tag lookup done by create_tag / create_recipe
+    hydrate_recipes loading 20 recipe graphs with RECIPE_DOCUMENT_OPTIONS
+
+Each benchmark reports ops/sec (best of --rounds) and, from a separate
+tracemalloc run, peak KiB per op and the memory blocks still held per op.
+Results are compared with the checked-in baseline; ops/sec depend on the
+machine, so refresh the baseline with --update-baseline when changing hardware.
+
+    python -m benchmarks.micro
+    python -m benchmarks.micro --filter validate --update-baseline
+"""
+import argparse
+import json
+import os
+import platform
+import sys
+import time
+import tracemalloc
+
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "baselines", "micro.json")
+SEED = 1234
+
+
+def build_benchmarks():
+    """
+    Seed an in-memory catalog and return {name: zero-argument callable}.
+    """
+    # Imported here so the app modules see the in-memory DATABASE_URL
+    from sqlalchemy import select
+
+    from benchmarks.seed import CatalogGenerator, seed_catalog
+    import database
+    from database import SessionLocal
+    from models import Recipe, Tag
+    from schemas.recipes import RecipeCreate
+    from services.request_stats import TimedJSONResponse
+    from services.serializers import recipe_to_dict, RECIPE_DOCUMENT_OPTIONS
+
+    generator = CatalogGenerator(SEED)
+    seed_catalog(database.init_engines(), 500, generator, progress=lambda line: None)
+    payloads = {
+        "small": generator.payload(1, ingredients=3, steps=5),
+        "medium": generator.payload(2, ingredients=12, steps=15),
+        "large": generator.payload(3, ingredients=40, steps=60),
+    }
+    names = [f"  {name.lower()}  " for name in generator.ingredient_names[:1000]]
+    tag_names = [name.upper() for name in generator.tag_names[:50]]
+
+    db = SessionLocal()
+    loaded = db.scalars(select(Recipe).options(*RECIPE_DOCUMENT_OPTIONS).limit(100)).all()
+    documents = {"recipes": [recipe_to_dict(recipe) for recipe in loaded]}
+    hydrate_ids = list(range(1, 21))
+
+    def tag_lookup():
+        for name in tag_names:
+            db.query(Tag).filter(Tag.name.ilike(name.strip().capitalize())).first()
+
+    def hydrate_recipes():
+        with SessionLocal() as session:
+            session.scalars(
+                select(Recipe).options(*RECIPE_DOCUMENT_OPTIONS).where(Recipe.id.in_(hydrate_ids))
+            ).all()
+
+    benchmarks = {
+        f"validate_{size}": (lambda payload=payload: RecipeCreate.model_validate(payload))
+        for size, payload in payloads.items()
+    }
+    benchmarks.update({
+        "serialize_to_dict": lambda: [recipe_to_dict(recipe) for recipe in loaded],
+        "serialize_json": lambda: TimedJSONResponse(documents).body,
+        "normalize_names": lambda: [name.strip().capitalize() for name in names],
+        "tag_lookup": tag_lookup,
+        "hydrate_recipes": hydrate_recipes,
+    })
+    return benchmarks
+
+
+def measure(function, rounds, min_time):
+    """
+    Best ops/sec over `rounds` rounds of at least `min_time` seconds each.
+    """
+    function()
+    best = 0.0
+    for _ in range(rounds):
+        operations = 0
+        started = time.perf_counter()
+        elapsed = 0.0
+        while elapsed < min_time:
+            function()
+            operations += 1
+            elapsed = time.perf_counter() - started
+        best = max(best, operations / elapsed)
+    return best
+
+
+def measure_allocations(function, operations=20):
+    tracemalloc.start()
+    try:
+        function()
+        tracemalloc.reset_peak()
+        before_size, _ = tracemalloc.get_traced_memory()
+        before = tracemalloc.take_snapshot()
+        peak = 0
+        for _ in range(operations):
+            tracemalloc.reset_peak()
+            function()
+            peak = max(peak, tracemalloc.get_traced_memory()[1] - before_size)
+        after = tracemalloc.take_snapshot()
+        blocks = sum(stat.count_diff for stat in after.compare_to(before, "filename") if stat.count_diff > 0)
+    finally:
+        tracemalloc.stop()
+    return round(peak / 1024, 1), round(blocks / operations, 1)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filter", help="Only run benchmarks whose name contains this")
+    parser.add_argument("--rounds", type=int, default=5)
+    parser.add_argument("--min-time", type=float, default=0.3, help="Seconds per round")
+    parser.add_argument("--baseline", default=BASELINE_PATH)
+    parser.add_argument("--threshold", type=float, default=0.3, help="Allowed relative ops/sec drop")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--output", help="Also write the results as JSON to this file")
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = "sqlite://"
+    benchmarks = build_benchmarks()
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    results = {}
+    regressions = []
+    print(f"{'benchmark':<20} {'ops/sec':>12} {'baseline':>12} {'change':>8} {'peak KiB':>9} {'held/op':>10}")
+    for name, function in benchmarks.items():
+        if args.filter and args.filter not in name:
+            continue
+        ops = measure(function, args.rounds, args.min_time)
+        peak_kib, blocks = measure_allocations(function)
+        results[name] = {"ops_per_sec": round(ops, 1), "peak_kib": peak_kib, "held_blocks_per_op": blocks}
+        before = baseline.get("results", {}).get(name)
+        change = ""
+        if before:
+            ratio = ops / before["ops_per_sec"] - 1
+            change = f"{ratio * 100:+.0f}%"
+            if ratio < -args.threshold:
+                regressions.append(f"{name}: {before['ops_per_sec']} -> {ops:.1f} ops/sec")
+        print(f"{name:<20} {ops:>12.1f} {before['ops_per_sec'] if before else '-':>12} {change:>8} "
+              f"{peak_kib:>9} {blocks:>10}")
+
+    report = {
+        "meta": {"python": platform.python_version(), "machine": platform.machine(), "seed": SEED},
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(report, output, indent=2)
+    if args.update_baseline:
+        if baseline and args.filter:
+            report["results"] = {**baseline.get("results", {}), **results}
+        os.makedirs(os.path.dirname(args.baseline), exist_ok=True)
+        with open(args.baseline, "w") as baseline_file:
+            json.dump(report, baseline_file, indent=2)
+            baseline_file.write("\n")
+        print(f"Baseline written to {args.baseline}")
+    elif regressions:
+        print("Regressions:")
+        for line in regressions:
+            print(f"  {line}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
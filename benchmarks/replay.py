@@ -0,0 +1,141 @@
+# benchmarks/replay.py
+"""
+Replay a request capture (see services/capture.py) against a server and report
+latency percentiles per route.
+
+Requests are sent at their captured offsets divided by --speed (0 sends them
+as fast as --concurrency allows). Routes are grouped by method and route
+template, so /recipes/1 and /recipes/2 report together.
+
+Against a running server:
+    python -m benchmarks.replay captures/requests.jsonl --url http://127.0.0.1:8002 --speed 4
+
+On a fresh local uvicorn seeded with a copy of production-shaped data:
+    python -m benchmarks.replay captures/requests.jsonl --database-url sqlite:///./seeded.db \\
+        --speed 0 --concurrency 64 --output replay.json
+"""
+import argparse
+import asyncio
+import json
+import time
+from collections import defaultdict
+
+import httpx
+
+from benchmarks.load_test import percentile, start_server
+
+
+def load_capture(path, limit=None):
+    with open(path) as capture_file:
+        records = [json.loads(line) for line in capture_file if line.strip()]
+    records.sort(key=lambda record: record["ts"])
+    return records[:limit] if limit else records
+
+
+async def replay(url, records, speed, concurrency):
+    latencies = defaultdict(list)
+    errors = defaultdict(int)
+    status_changes = defaultdict(int)
+    lag = []
+    semaphore = asyncio.Semaphore(concurrency)
+    limits = httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency)
+    first_ts = records[0]["ts"] if records else 0.0
+
+    async with httpx.AsyncClient(base_url=url, limits=limits, timeout=60) as client:
+        started = time.perf_counter()
+
+        async def send(record):
+            key = f"{record['method']} {record.get('route') or record['path']}"
+            if speed > 0:
+                due = started + (record["ts"] - first_ts) / speed
+                await asyncio.sleep(max(due - time.perf_counter(), 0))
+            async with semaphore:
+                if speed > 0:
+                    lag.append(max(time.perf_counter() - due, 0))
+                request_started = time.perf_counter()
+                try:
+                    response = await client.request(
+                        record["method"], record["path"],
+                        params=[tuple(pair) for pair in record.get("query") or []],
+                        json=record.get("body"),
+                    )
+                except httpx.HTTPError:
+                    errors[key] += 1
+                    return
+                latencies[key].append(time.perf_counter() - request_started)
+                if response.status_code >= 500:
+                    errors[key] += 1
+                if response.status_code != record.get("status"):
+                    status_changes[key] += 1
+
+        await asyncio.gather(*(send(record) for record in records))
+        elapsed = time.perf_counter() - started
+
+    def summary(values):
+        return {
+            "requests": len(values),
+            "p50_ms": round(percentile(values, 0.50) * 1000, 2) if values else None,
+            "p90_ms": round(percentile(values, 0.90) * 1000, 2) if values else None,
+            "p99_ms": round(percentile(values, 0.99) * 1000, 2) if values else None,
+            "max_ms": round(max(values) * 1000, 2) if values else None,
+        }
+
+    routes = {
+        key: {**summary(values), "errors": errors[key], "status_changes": status_changes[key]}
+        for key, values in sorted(latencies.items())
+    }
+    for key in errors.keys() - latencies.keys():
+        routes[key] = {**summary([]), "errors": errors[key], "status_changes": 0}
+    all_latencies = [value for values in latencies.values() for value in values]
+    return {
+        "speed": speed,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 2),
+        "throughput_rps": round(len(all_latencies) / elapsed, 1) if elapsed else None,
+        "overall": {**summary(all_latencies), "errors": sum(errors.values())},
+        # How far behind schedule requests went out; large values mean the
+        # client or --concurrency, not the server, set the pace
+        "schedule_lag_p99_ms": round(percentile(lag, 0.99) * 1000, 2) if lag else None,
+        "routes": routes,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("capture", help="JSONL file written with CAPTURE_PATH")
+    parser.add_argument("--url", help="Replay against this running server")
+    parser.add_argument("--database-url", help="Start a local uvicorn on this database instead")
+    parser.add_argument("--async-db", action="store_true", help="Start the local server with USE_ASYNC_DB=1")
+    parser.add_argument("--speed", type=float, default=1.0, help="Time compression; 0 for no pacing")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--limit", type=int, help="Replay only the first N requests")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    args = parser.parse_args()
+    if not args.url and not args.database_url:
+        parser.error("one of --url or --database-url is required")
+
+    records = load_capture(args.capture, args.limit)
+    process = None
+    url = args.url
+    if not url:
+        process, url = start_server(args.database_url, args.async_db)
+    try:
+        results = asyncio.run(replay(url, records, args.speed, args.concurrency))
+    finally:
+        if process is not None:
+            process.terminate()
+            process.wait()
+
+    print(f"{'route':<40} {'n':>6} {'p50':>8} {'p90':>8} {'p99':>8} {'max':>8} {'err':>5}")
+    for key, route in list(results["routes"].items()) + [("overall", results["overall"])]:
+        print(f"{key[:40]:<40} {route['requests']:>6} {route['p50_ms'] or '-':>8} {route['p90_ms'] or '-':>8} "
+              f"{route['p99_ms'] or '-':>8} {route['max_ms'] or '-':>8} {route['errors']:>5}")
+    print(f"{results['throughput_rps']} req/s over {results['elapsed_s']} s, "
+          f"schedule lag p99 {results['schedule_lag_p99_ms']} ms")
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(results, output, indent=2)
+
+
+if __name__ == "__main__":
+    main()
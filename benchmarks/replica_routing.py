@@ -0,0 +1,92 @@
+# benchmarks/replica_routing.py
+"""
+Check read-replica routing locally with two SQLite files standing in for the
+primary and a replica (see services/replicas.py).
+
+The replica is a copy of the seeded primary with one tag renamed, so each
+response shows where it was read from. The check then verifies that:
+
+    reads without a token come from the replica
+    a write goes to the primary and returns a consistency token
+    reads with that token come from the primary, then from the replica once
+    READ_YOUR_WRITES_WINDOW_S has passed
+    reads fall back to the primary while the replica fails its health check
+
+    python -m benchmarks.replica_routing
+    python -m benchmarks.replica_routing --async-db
+"""
+import argparse
+import os
+import shutil
+import sqlite3
+import time
+
+from benchmarks.checks import Checks, check_directory, seed
+
+WINDOW_SECONDS = 1.0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--async-db", action="store_true")
+    args = parser.parse_args()
+
+    directory = check_directory(
+        "replica-routing-", "primary.db",
+        USE_ASYNC_DB="1" if args.async_db else "0",
+        READ_YOUR_WRITES_WINDOW_S=str(WINDOW_SECONDS),
+        REPLICA_CHECK_INTERVAL_S="0.2",
+    )
+    primary_path = os.path.join(directory, "primary.db")
+    replica_path = os.path.join(directory, "replica.db")
+    os.environ["DATABASE_REPLICA_URLS"] = f"sqlite:///{replica_path}"
+
+    # Imported here so the app modules see the URLs above
+    from fastapi.testclient import TestClient
+
+    from services.replicas import TOKEN_COOKIE, TOKEN_HEADER, replica_set
+
+    seed(20)
+    shutil.copyfile(primary_path, replica_path)
+    with sqlite3.connect(replica_path) as replica:
+        replica.execute("UPDATE tags SET name = 'Replica' WHERE id = 1")
+
+    from main import app
+
+    checks = Checks()
+
+    def tag_name(client, **headers):
+        return client.get("/tags/1", headers=headers).json()["name"]
+
+    with TestClient(app) as client:
+        checks.expect("read without a token comes from the replica", tag_name(client) == "Replica")
+
+        response = client.post("/tags/", json={"name": "Written on primary"})
+        token = response.headers.get(TOKEN_HEADER)
+        checks.expect("write returns a consistency token", response.status_code == 201 and bool(token))
+        checks.expect("write sets the token cookie", client.cookies.get(TOKEN_COOKIE) == token)
+
+        names = [tag["name"] for tag in client.get("/tags/", headers={TOKEN_HEADER: token}).json()]
+        checks.expect("read with the token sees the write", "Written on primary" in names)
+        client.cookies.clear()
+        names = [tag["name"] for tag in client.get("/tags/").json()]
+        checks.expect("read without the token does not (the replica is a stale copy)", "Written on primary" not in names)
+
+        time.sleep(WINDOW_SECONDS + 0.1)
+        checks.expect("token older than the window reads from the replica again",
+                      tag_name(client, **{TOKEN_HEADER: token}) == "Replica")
+
+        os.replace(replica_path, replica_path + ".offline")
+        with open(replica_path, "w") as broken:
+            broken.write("not a database")
+        # Drop the pooled connections, which still point at the old file
+        replica_set.replicas[0].engine.dispose()
+        time.sleep(0.5)
+        checks.expect("unhealthy replica is skipped", not replica_set.replicas[0].healthy
+                      and tag_name(client) != "Replica")
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,308 @@
+# benchmarks/seed.py
+"""
+Generate a synthetic recipe catalog for benchmarks.
+
+Tags, categories and ingredients are drawn from Zipf distributions, so a few
+are on most recipes and the long tail is rare, as in real catalogs. Every
+recipe gets 5-25 steps, nutrition facts and 3-15 ingredient lines with
+quantities the unit parser understands (plus a few it does not). Rows are
+written with Core executemany inserts in batches, not through the ORM.
+
+    python -m benchmarks.seed --database-url sqlite:///./bench-100k.db --recipes 100000
+
+Running it again on the same database appends more recipes and reuses the
+tag, category and ingredient vocabulary.
+"""
+import argparse
+import os
+import time
+
+import numpy as np
+
+from services.units import parse_quantity
+
+ADJECTIVES = [
+    "smoky", "creamy", "spicy", "crispy", "lemony", "garlicky", "roasted", "braised", "grilled",
+    "quick", "rustic", "herbed", "golden", "sticky", "zesty", "hearty", "fresh", "slow-cooked",
+]
+MAINS = [
+    "chicken", "tofu", "salmon", "lentil", "mushroom", "beef", "chickpea", "pork", "shrimp",
+    "cauliflower", "eggplant", "turkey", "black bean", "halloumi", "cod", "sweet potato",
+]
+DISHES = [
+    "stew", "curry", "salad", "tacos", "soup", "pasta", "bowl", "skillet", "traybake", "risotto",
+    "stir-fry", "sandwich", "pie", "noodles", "chili", "flatbread", "casserole", "burger",
+]
+TAG_WORDS = [
+    "quick meal", "vegetarian", "vegan", "gluten free", "dairy free", "high protein", "low carb",
+    "weeknight", "meal prep", "one pot", "kid friendly", "budget", "spicy", "comfort food",
+    "summer", "winter", "holiday", "brunch", "freezer friendly", "air fryer",
+]
+CATEGORY_WORDS = [
+    "dinner", "lunch", "breakfast", "dessert", "snack", "side", "soup", "salad", "baking",
+    "drinks", "sauce", "appetizer",
+]
+INGREDIENT_WORDS = [
+    "onion", "garlic", "olive oil", "salt", "black pepper", "butter", "flour", "sugar", "egg",
+    "milk", "tomato", "carrot", "celery", "lemon", "rice", "potato", "cumin", "paprika",
+    "parsley", "cilantro", "ginger", "soy sauce", "honey", "chicken stock", "cream", "cheddar",
+    "spinach", "bell pepper", "basil", "oregano",
+]
+# Quantity texts as users type them; the last few are left unparsed on purpose
+QUANTITIES = [
+    "1 cup", "1/2 cup", "1/4 cup", "2 cups", "1 1/2 cups", "1 tbsp", "2 tbsp", "1 tsp", "1/2 tsp",
+    "2 tsp", "100 g", "200 g", "250 g", "500 g", "1 kg", "100 ml", "250 ml", "1 l", "4 oz",
+    "8 oz", "1 lb", "1 pinch", "2 cloves", "1", "2", "3", "6", "to taste", "a handful", "as needed",
+]
+TIME_UNITS = ["min", "min", "min", "minutes", "hours"]
+CURRENCIES = ["USD", "USD", "USD", "EUR", "GBP"]
+
+
+def zipf_weights(count, exponent):
+    weights = 1.0 / np.arange(1, count + 1) ** exponent
+    return weights / weights.sum()
+
+
+def vocabulary(words, size):
+    """
+    `size` distinct names: the word list first, then numbered variants.
+    """
+    names = [word.capitalize() for word in words[:size]]
+    round_number = 2
+    while len(names) < size:
+        names.extend(f"{word} {round_number}".capitalize() for word in words[: size - len(names)])
+        round_number += 1
+    return names
+
+
+class CatalogGenerator:
+    """
+    Deterministic (per seed) source of catalog rows and RecipeCreate payloads.
+    """
+
+    def __init__(self, seed=42, tags=300, categories=40, ingredients=2000, zipf_exponent=1.1):
+        self.rng = np.random.default_rng(seed)
+        self.tag_names = vocabulary(TAG_WORDS, tags)
+        self.category_names = vocabulary(CATEGORY_WORDS, categories)
+        self.ingredient_names = vocabulary(INGREDIENT_WORDS, ingredients)
+        self.tag_weights = zipf_weights(tags, zipf_exponent)
+        self.category_weights = zipf_weights(categories, zipf_exponent)
+        self.ingredient_weights = zipf_weights(ingredients, zipf_exponent)
+        self.parsed_quantities = [parse_quantity(text) for text in QUANTITIES]
+
+    def _zipf_sets(self, count, weights, low, high):
+        """
+        For `count` recipes, a set of low..high distinct indexes each, Zipf-weighted.
+        """
+        sizes = self.rng.integers(low, high + 1, size=count)
+        draws = self.rng.choice(len(weights), size=(count, high * 2), p=weights)
+        picked = []
+        for row, size in zip(draws, sizes):
+            chosen = list(dict.fromkeys(row.tolist()))[:size]
+            picked.append(chosen)
+        return picked
+
+    def title(self, number):
+        rng = self.rng
+        return (
+            f"{ADJECTIVES[rng.integers(len(ADJECTIVES))]} {MAINS[rng.integers(len(MAINS))]} "
+            f"{DISHES[rng.integers(len(DISHES))]} {number}"
+        ).capitalize()
+
+    def batch(self, first_id, count, tag_ids, category_ids, ingredient_ids):
+        """
+        Rows for recipes first_id .. first_id + count - 1, keyed by table name.
+        The *_ids arguments map vocabulary positions to database ids.
+        """
+        rng = self.rng
+        rows = {name: [] for name in (
+            "recipes", "instructions", "nutrition_facts", "recipe_ingredients", "recipe_tags", "recipe_categories",
+        )}
+        tag_sets = self._zipf_sets(count, self.tag_weights, 1, 6)
+        category_sets = self._zipf_sets(count, self.category_weights, 1, 3)
+        ingredient_sets = self._zipf_sets(count, self.ingredient_weights, 3, 15)
+        step_counts = rng.integers(5, 26, size=count)
+        servings = rng.integers(1, 13, size=count)
+        prep = rng.integers(5, 61, size=count)
+        cook = rng.integers(0, 181, size=count)
+        calories = rng.gamma(4.0, 150.0, size=count)
+
+        for offset in range(count):
+            recipe_id = first_id + offset
+            cook_unit = TIME_UNITS[rng.integers(len(TIME_UNITS))]
+            cook_value = max(int(cook[offset]) // 60, 1) if cook_unit == "hours" else int(cook[offset])
+            cook_minutes = cook_value * 60 if cook_unit == "hours" else cook_value
+            rows["recipes"].append({
+                "id": recipe_id,
+                "title": self.title(recipe_id),
+                "prep_time_value": int(prep[offset]),
+                "prep_time_unit": "min",
+                "cook_time_value": cook_value,
+                "cook_time_unit": cook_unit,
+                "total_time_minutes": int(prep[offset]) + cook_minutes,
+                "servings": int(servings[offset]),
+                "image": f"https://images.example.com/recipes/{recipe_id}.jpg",
+                "deleted": False,
+            })
+            rows["instructions"].extend(
+                {
+                    "recipe_id": recipe_id,
+                    "step_number": step,
+                    "instruction": f"Step {step}: prepare and combine the ingredients, then cook until done.",
+                    "deleted": False,
+                }
+                for step in range(1, int(step_counts[offset]) + 1)
+            )
+            recipe_calories = round(float(calories[offset]), 1)
+            rows["nutrition_facts"].append({
+                "recipe_id": recipe_id,
+                "calories": recipe_calories,
+                "fat": round(recipe_calories * rng.uniform(0.02, 0.06), 1),
+                "carbohydrates": round(recipe_calories * rng.uniform(0.05, 0.15), 1),
+                "protein": round(recipe_calories * rng.uniform(0.02, 0.1), 1),
+                "calories_per_serving": recipe_calories / int(servings[offset]),
+                "deleted": False,
+            })
+            for position in ingredient_sets[offset]:
+                choice = rng.integers(len(QUANTITIES))
+                parsed = self.parsed_quantities[choice]
+                rows["recipe_ingredients"].append({
+                    "recipe_id": recipe_id,
+                    "ingredient_id": ingredient_ids[position],
+                    "quantity": QUANTITIES[choice],
+                    "quantity_value": parsed[0] if parsed else None,
+                    "quantity_unit": parsed[1] if parsed else None,
+                    "notes": None,
+                })
+            rows["recipe_tags"].extend(
+                {"recipe_id": recipe_id, "tag_id": tag_ids[position]} for position in tag_sets[offset]
+            )
+            rows["recipe_categories"].extend(
+                {"recipe_id": recipe_id, "category_id": category_ids[position]} for position in category_sets[offset]
+            )
+        return rows
+
+    def payload(self, number, ingredients=None, steps=None):
+        """
+        A POST /recipes/ body. `ingredients` and `steps` fix the list sizes.
+        """
+        rng = self.rng
+        ingredient_count = ingredients or int(rng.integers(3, 16))
+        step_count = steps or int(rng.integers(5, 26))
+        items = self._zipf_sets(1, self.ingredient_weights, ingredient_count, ingredient_count)[0]
+        return {
+            "title": f"{self.title(number)} {rng.integers(1 << 30)}",
+            "prep_time_value": int(rng.integers(5, 61)),
+            "prep_time_unit": "min",
+            "cook_time_value": int(rng.integers(0, 181)),
+            "cook_time_unit": "minutes",
+            "servings": int(rng.integers(1, 13)),
+            "image": None,
+            "nutrition_facts": {"calories": "450 kcal", "fat": "12g", "carbohydrates": "40g", "protein": "25g"},
+            "instructions": [
+                {"step_number": step, "instruction": "stir everything together and simmer gently."}
+                for step in range(1, step_count + 1)
+            ],
+            "ingredients": [
+                {
+                    "item": self.ingredient_names[position],
+                    "quantity": QUANTITIES[rng.integers(len(QUANTITIES))],
+                    "price": round(float(rng.uniform(0.2, 12)), 2),
+                    "currency": CURRENCIES[rng.integers(len(CURRENCIES))],
+                }
+                for position in items
+            ],
+            "categories": [
+                {"name": self.category_names[position]}
+                for position in self._zipf_sets(1, self.category_weights, 1, 3)[0]
+            ],
+            "tags": [
+                {"name": self.tag_names[position]}
+                for position in self._zipf_sets(1, self.tag_weights, 1, 6)[0]
+            ],
+        }
+
+
+def _vocabulary_ids(connection, table, column, names, extra=None):
+    """
+    Ids for `names` in `table`, inserting the missing ones.
+    """
+    from sqlalchemy import insert, select
+
+    existing = dict(connection.execute(select(table.c[column], table.c.id)).all())
+    missing = [name for name in names if name not in existing]
+    if missing:
+        connection.execute(insert(table), [{column: name, **(extra(name) if extra else {})} for name in missing])
+        existing = dict(connection.execute(select(table.c[column], table.c.id)).all())
+    return [existing[name] for name in names]
+
+
+def seed_catalog(engine, recipes, generator, batch_size=2000, progress=print):
+    """
+    Insert `recipes` generated recipes (and any missing vocabulary) into the database.
+    """
+    # Imported here so DATABASE_URL can be set from the command line first
+    from sqlalchemy import func, insert, select, text
+    from database import Base
+    from migrations import migrate
+    from models import Recipe
+
+    migrate(engine)
+    tables = Base.metadata.tables
+    price_rng = np.random.default_rng(len(generator.ingredient_names))
+
+    with engine.begin() as connection:
+        tag_ids = _vocabulary_ids(connection, tables["tags"], "name", generator.tag_names)
+        category_ids = _vocabulary_ids(connection, tables["categories"], "name", generator.category_names)
+        ingredient_ids = _vocabulary_ids(
+            connection, tables["ingredients"], "item", generator.ingredient_names,
+            lambda name: {"price": int(price_rng.integers(20, 1200)), "currency": CURRENCIES[int(price_rng.integers(5))]},
+        )
+        first_id = (connection.execute(select(func.max(Recipe.id))).scalar() or 0) + 1
+
+    started = time.perf_counter()
+    written = 0
+    while written < recipes:
+        count = min(batch_size, recipes - written)
+        rows = generator.batch(first_id + written, count, tag_ids, category_ids, ingredient_ids)
+        with engine.begin() as connection:
+            # Parents first so foreign keys hold on databases that enforce them
+            for table_name in ("recipes", "instructions", "nutrition_facts",
+                               "recipe_ingredients", "recipe_tags", "recipe_categories"):
+                connection.execute(insert(tables[table_name]), rows[table_name])
+        written += count
+        elapsed = time.perf_counter() - started
+        progress(f"{written}/{recipes} recipes, {written / elapsed:.0f}/s")
+    if engine.dialect.name == "postgresql":
+        # The ids were given explicitly; move the sequence past them so the app can insert
+        with engine.begin() as connection:
+            connection.execute(text(
+                "SELECT setval(pg_get_serial_sequence('recipes', 'id'), "
+                "(SELECT COALESCE(MAX(id), 0) + 1 FROM recipes), false)"
+            ))
+    return first_id, first_id + recipes - 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--database-url", default=os.getenv("DATABASE_URL"), required=not os.getenv("DATABASE_URL"))
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--tags", type=int, default=300)
+    parser.add_argument("--categories", type=int, default=40)
+    parser.add_argument("--ingredients", type=int, default=2000)
+    parser.add_argument("--zipf-exponent", type=float, default=1.1)
+    parser.add_argument("--batch-size", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ["DATABASE_URL"] = args.database_url
+    from sqlalchemy import create_engine
+
+    engine = create_engine(args.database_url)
+    generator = CatalogGenerator(args.seed, args.tags, args.categories, args.ingredients, args.zipf_exponent)
+    first, last = seed_catalog(engine, args.recipes, generator, args.batch_size)
+    print(f"Seeded recipes {first}..{last}")
+
+
+if __name__ == "__main__":
+    main()
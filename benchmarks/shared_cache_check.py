@@ -0,0 +1,203 @@
+# benchmarks/shared_cache_check.py
+"""
+Check the shared recipe cache tier (services/shared_cache.py) against a local
+Redis-protocol server: a socket server in this process that speaks RESP in
+front of the in-process stand-in store. It verifies that:
+
+    a recipe read once is served from the shared tier after the worker's own
+    cache is dropped (as after a restart), and reports each tier's latency
+    listings fetch their documents with one MGET
+    large documents are stored compressed
+    concurrent misses for one recipe load it once (stampede protection)
+    a document loaded before a write commits, and stored after the writer
+    evicted it, is not served
+    a tag rename drops the shared copies
+    reads fall back to the database while the server is down
+
+    python -m benchmarks.shared_cache_check
+"""
+import socketserver
+import threading
+import time
+from collections import Counter
+
+from benchmarks.checks import Checks, check_directory, seed
+
+SEED_RECIPES = 50
+CONCURRENT_LOADERS = 20
+
+
+class RespServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self):
+        super().__init__(("127.0.0.1", 0), RespHandler)
+        self.store = None
+        self.commands = Counter()
+
+
+class RespHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        from services.shared_cache import StoreError
+
+        while True:
+            command = self._read_command()
+            if command is None:
+                return
+            name = command[0].decode().upper()
+            self.server.commands[name] += 1
+            # Keys and options as text, stored values as bytes
+            args = [arg if name == "SET" and index == 1 else arg.decode() for index, arg in enumerate(command[1:])]
+            if name == "SET" and ":lock:" not in args[0]:
+                self.server.commands["SET document"] += 1
+            try:
+                reply = self.server.store.execute(name, *args)
+            except StoreError as exc:
+                self.wfile.write(b"-ERR %s\r\n" % str(exc).encode())
+                continue
+            self.wfile.write(_encode_reply(reply))
+
+    def _read_command(self):
+        line = self.rfile.readline()
+        if not line:
+            return None
+        args = []
+        for _ in range(int(line[1:])):
+            length = int(self.rfile.readline()[1:])
+            args.append(self.rfile.read(length + 2)[:-2])
+        return args
+
+
+def _encode_reply(reply):
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, list):
+        return b"*%d\r\n" % len(reply) + b"".join(_encode_reply(item) for item in reply)
+    return b"$%d\r\n%s\r\n" % (len(reply), reply)
+
+
+def main():
+    server = RespServer()
+    check_directory(
+        "shared-cache-check-",
+        RECIPE_SHARED_CACHE_URL=f"redis://127.0.0.1:{server.server_address[1]}/0",
+        # Low enough that most seeded recipes are stored compressed
+        RECIPE_SHARED_CACHE_COMPRESS_BYTES="1024",
+        # The Python server here answers slower than Redis under concurrent load
+        RECIPE_SHARED_CACHE_TIMEOUT_S="2",
+    )
+
+    from fastapi.testclient import TestClient
+
+    import database
+    from models import Recipe
+    from routers.recipes import recipe_by_id_statement
+    from services.document_loader import _load
+    from services.recipe_cache import recipe_cache
+    from services.serializers import recipe_to_dict
+    from services.shared_cache import MemoryStore, shared_cache
+
+    server.store = MemoryStore()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    seed(SEED_RECIPES)
+
+    from main import app
+
+    checks = Checks()
+
+    def timed_get(client, path):
+        started = time.perf_counter()
+        response = client.get(path)
+        return response, (time.perf_counter() - started) * 1000
+
+    with TestClient(app) as client:
+        _, database_ms = timed_get(client, "/recipes/1")
+        _, local_ms = timed_get(client, "/recipes/1")
+        recipe_cache.invalidate()
+        hits = shared_cache.hits
+        response, shared_ms = timed_get(client, "/recipes/1")
+        checks.expect("recipe comes from the shared tier after the local cache is dropped",
+                      response.status_code == 200 and shared_cache.hits == hits + 1)
+        print(f"     GET /recipes/1: database {database_ms:.2f} ms, shared {shared_ms:.2f} ms, local {local_ms:.2f} ms")
+
+        client.get("/recipes/")
+        recipe_cache.invalidate()
+        server.commands.clear()
+        hits = shared_cache.hits
+        response = client.get("/recipes/")
+        checks.expect("listing reads its documents with one MGET",
+                      len(response.json()["recipes"]) == SEED_RECIPES and server.commands["MGET"] == 1
+                      and shared_cache.hits == hits + SEED_RECIPES)
+        checks.expect(f"large documents are stored compressed ({shared_cache.compressed} so far)",
+                      shared_cache.compressed > 0)
+
+        recipe_id = 2
+        recipe_cache.invalidate()
+        shared_cache.evict([recipe_id])
+        server.commands.clear()
+        barrier = threading.Barrier(CONCURRENT_LOADERS)
+        documents = []
+
+        def load():
+            with database.SessionLocal() as db:
+                barrier.wait()
+                # Below the per-worker single flight, as loaders in separate workers would be
+                documents.append(_load(db, recipe_id, recipe_by_id_statement(recipe_id)))
+
+        waits = shared_cache.lock_waits
+        threads = [threading.Thread(target=load) for _ in range(CONCURRENT_LOADERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        checks.expect(f"{CONCURRENT_LOADERS} concurrent misses store the recipe once "
+                      f"({shared_cache.lock_waits - waits} waited for the loader)",
+                      server.commands["SET document"] == 1 and all(document and document["id"] == recipe_id for document in documents))
+
+        # A loader misses and reads the row; a writer commits and evicts; then the loader stores its copy
+        recipe_id = 4
+        recipe_cache.invalidate()
+        shared_cache.evict([recipe_id])
+        stale = shared_cache.stale
+        _, tokens = shared_cache.lookup([recipe_id])
+        with database.SessionLocal() as db:
+            loaded = recipe_to_dict(db.scalars(recipe_by_id_statement(recipe_id)).first())
+        with database.SessionLocal() as db:
+            db.get(Recipe, recipe_id).title = "Written while loading"
+            db.commit()
+        shared_cache.put_many({recipe_id: loaded}, tokens)
+        recipe_cache.invalidate()
+        checks.expect("a copy loaded before a write and stored after it is not served",
+                      client.get(f"/recipes/{recipe_id}").json()["title"] == "Written while loading"
+                      and shared_cache.stale == stale + 1)
+
+        name = client.get("/recipes/1").json()["tags"][0]
+        tag_id = next(tag["id"] for tag in client.get("/tags/").json() if tag["name"] == name)
+        client.put(f"/tags/{tag_id}", json={"name": "Renamed tag"})
+        recipe_cache.invalidate()
+        checks.expect("tag rename drops the shared copies", "Renamed tag" in client.get("/recipes/1").json()["tags"])
+
+        server.shutdown()
+        server.server_close()
+        shared_cache.store.close()
+        errors = shared_cache.errors
+        recipe_cache.invalidate()
+        response = client.get("/recipes/3")
+        checks.expect("reads fall back to the database while the server is down",
+                      response.status_code == 200 and shared_cache.errors == errors + 1
+                      and not shared_cache.available)
+        metrics = client.get("/metrics").text
+        checks.expect("metrics report each tier",
+                      'cache_hits_total{cache="recipe_documents"}' in metrics
+                      and 'cache_hits_total{cache="recipe_documents_shared"}' in metrics
+                      and "recipe_shared_cache_errors_total 1" in metrics)
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,143 @@
+# benchmarks/single_flight_check.py
+"""
+Check request coalescing (services/single_flight.py).
+
+First the flights themselves, with threads and with tasks: concurrent calls
+for one key run one load, its exception reaches every caller, and waiting
+callers give up after the timeout. Then a burst of concurrent
+GET /recipes/{id} against real sync and async servers with the recipe cache
+disabled, reporting how many requests were collapsed into how many loads.
+
+    python -m benchmarks.single_flight_check
+"""
+import asyncio
+import os
+import re
+import threading
+import time
+
+import httpx
+
+from benchmarks.checks import Checks, check_directory, seed
+
+CALLERS = 50
+BURST = 200
+
+checks = Checks()
+
+
+def check_threads(SingleFlight, SingleFlightTimeout):
+    flight = SingleFlight("check")
+    barrier = threading.Barrier(CALLERS)
+    results = []
+
+    def call(load, timeout=None):
+        barrier.wait()
+        try:
+            results.append(flight.do("key", load, timeout))
+        except Exception as exc:
+            results.append(exc)
+
+    def run(load, timeout=None):
+        results.clear()
+        threads = [threading.Thread(target=call, args=(load, timeout)) for _ in range(CALLERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return list(results)
+
+    def slow(value=None, error=None, seconds=0.2):
+        def load():
+            time.sleep(seconds)
+            if error:
+                raise error
+            return value
+        return load
+
+    results = run(slow("document"))
+    checks.expect(f"threads: {CALLERS} callers, {flight.loads} load", flight.loads == 1 and results == ["document"] * CALLERS)
+    error = ValueError("database unavailable")
+    results = run(slow(error=error))
+    checks.expect("threads: the load's error reaches every caller", flight.errors == 1 and all(item is error for item in results))
+    results = run(slow("late", seconds=0.5), timeout=0.1)
+    timeouts = sum(isinstance(item, SingleFlightTimeout) for item in results)
+    checks.expect(f"threads: waiting callers time out ({timeouts})", timeouts == CALLERS - 1 and results.count("late") == 1)
+
+
+async def check_tasks(SingleFlight, SingleFlightTimeout):
+    flight = SingleFlight("check")
+
+    def slow(value=None, error=None, seconds=0.2):
+        async def load():
+            await asyncio.sleep(seconds)
+            if error:
+                raise error
+            return value
+        return load
+
+    async def run(load, timeout=None):
+        return await asyncio.gather(
+            *[flight.do_async("key", load, timeout) for _ in range(CALLERS)], return_exceptions=True,
+        )
+
+    results = await run(slow("document"))
+    checks.expect(f"tasks: {CALLERS} callers, {flight.loads} load", flight.loads == 1 and results == ["document"] * CALLERS)
+    error = ValueError("database unavailable")
+    results = await run(slow(error=error))
+    checks.expect("tasks: the load's error reaches every caller", flight.errors == 1 and all(item is error for item in results))
+    results = await run(slow("late", seconds=0.5), timeout=0.1)
+    timeouts = sum(isinstance(item, SingleFlightTimeout) for item in results)
+    checks.expect(f"tasks: waiting callers time out ({timeouts})", timeouts == CALLERS - 1 and results.count("late") == 1)
+
+    # The load outlives a cancelled leader
+    leader = asyncio.ensure_future(flight.do_async("other", slow("kept")))
+    await asyncio.sleep(0)
+    follower = asyncio.ensure_future(flight.do_async("other", slow("unused")))
+    await asyncio.sleep(0)
+    leader.cancel()
+    checks.expect("tasks: a cancelled leader does not cancel the load", await follower == "kept")
+
+
+def counter(metrics, name, flight):
+    match = re.search(rf'^{name}{{flight="{flight}"}} (\S+)$', metrics, re.MULTILINE)
+    return float(match.group(1)) if match else 0.0
+
+
+async def burst(url, recipe_id):
+    async with httpx.AsyncClient(base_url=url, timeout=30) as client:
+        responses = await asyncio.gather(*[client.get(f"/recipes/{recipe_id}") for _ in range(BURST)])
+        metrics = (await client.get("/metrics")).text
+    return responses, counter(metrics, "single_flight_loads_total", "recipe"), \
+        counter(metrics, "single_flight_collapsed_total", "recipe")
+
+
+def main():
+    check_directory("single-flight-check-")
+    database_url = os.environ["DATABASE_URL"]
+
+    from benchmarks.load_test import start_server
+    from services.single_flight import SingleFlight, SingleFlightTimeout
+
+    check_threads(SingleFlight, SingleFlightTimeout)
+    asyncio.run(check_tasks(SingleFlight, SingleFlightTimeout))
+
+    seed(20)
+    for use_async in (False, True):
+        # Without the per-worker cache every request reaches the loader
+        process, url = start_server(database_url, use_async, {"RECIPE_CACHE_SIZE": "0", "WARMUP_ENABLED": "0"})
+        try:
+            responses, loads, collapsed = asyncio.run(burst(url, 1))
+        finally:
+            process.terminate()
+            process.wait()
+        mode = "async" if use_async else "sync"
+        checks.expect(f"{mode}: {BURST} concurrent reads ran {loads:.0f} loads, {collapsed:.0f} collapsed",
+                      all(response.status_code == 200 for response in responses)
+                      and loads + collapsed == BURST and collapsed > 0)
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# benchmarks/sql_json_check.py
+"""
+Check and time the SQL-side JSON read engine (services/sql_documents.py)
+against the ORM path on a seeded SQLite catalog.
+
+It verifies that every document the database assembles decodes to what
+recipe_to_dict builds, and that GET /recipes/{id} (plain, rescaled and
+missing) and GET /recipes/ answer the same through SQL_JSON_ENDPOINTS.
+Then it times one recipe and a batch of recipes each way, from the query to
+the encoded bytes, with the recipe caches out of the picture.
+
+    python -m benchmarks.sql_json_check
+    python -m benchmarks.sql_json_check --recipes 5000 --batch 200
+"""
+import argparse
+import json
+
+from benchmarks.checks import Checks, check_directory, seed, timed
+
+
+def encode(document):
+    # As JSONResponse encodes the ORM path's dicts
+    return json.dumps(document, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--recipes", type=int, default=1000)
+    parser.add_argument("--batch", type=int, default=100)
+    parser.add_argument("--repeats", type=int, default=50)
+    args = parser.parse_args()
+
+    check_directory("sql-json-check-", SQL_JSON_ENDPOINTS="recipe,list", RECIPE_CACHE_SIZE="0")
+
+    from fastapi.testclient import TestClient
+    from sqlalchemy import select
+
+    import database
+    from models import Recipe
+    from services.scaling import scale_recipe
+    from services.serializers import RECIPE_DOCUMENT_OPTIONS, recipe_to_dict
+    from services.sql_documents import json_array, load_json
+
+    seed(args.recipes)
+
+    checks = Checks()
+
+    def orm_documents(db, recipe_ids):
+        statement = select(Recipe).options(*RECIPE_DOCUMENT_OPTIONS).where(Recipe.id.in_(recipe_ids))
+        return {recipe.id: recipe_to_dict(recipe) for recipe in db.scalars(statement)}
+
+    recipe_ids = list(range(1, args.recipes + 1))
+    with database.SessionLocal() as db:
+        expected = orm_documents(db, recipe_ids)
+        assembled = load_json(db, recipe_ids)
+    different = [recipe_id for recipe_id in recipe_ids if json.loads(assembled[recipe_id]) != expected[recipe_id]]
+    identical = sum(assembled[recipe_id] == encode(expected[recipe_id]) for recipe_id in recipe_ids)
+    checks.expect(f"{len(assembled)} documents decode to the ORM documents ({identical} byte-identical)",
+                  len(assembled) == args.recipes and not different)
+
+    from main import app
+
+    with TestClient(app) as client:
+        response = client.get("/recipes/7")
+        checks.expect("GET /recipes/7 sends the assembled bytes",
+                      response.content == assembled[7] and response.headers["content-type"] == "application/json")
+        checks.expect("GET /recipes/7?servings=3 rescales the assembled document",
+                      client.get("/recipes/7?servings=3").json() == scale_recipe(expected[7], 3))
+        checks.expect("a missing recipe is a 404", client.get(f"/recipes/{args.recipes + 1}").status_code == 404)
+        listing = client.get("/recipes/?sort=calories&order=desc&max_servings=4").json()["recipes"]
+        checks.expect(f"GET /recipes/ lists the assembled documents in order ({len(listing)} recipes)",
+                      listing and all(document == expected[document["id"]] for document in listing))
+
+    single, batch = 7, recipe_ids[:args.batch]
+    with database.SessionLocal() as db:
+        rows = [
+            ("one recipe", lambda: encode(orm_documents(db, [single])[single]), lambda: load_json(db, [single])[single]),
+            (f"{args.batch} recipes",
+             lambda: encode(list(orm_documents(db, batch).values())),
+             lambda: json_array(load_json(db, batch).values())),
+        ]
+        for label, orm, sql in rows:
+            db.expunge_all()
+            orm_ms = timed(lambda: (orm(), db.expunge_all()), args.repeats)
+            sql_ms = timed(sql, args.repeats)
+            print(f"     {label}: ORM {orm_ms:.2f} ms, SQL JSON {sql_ms:.2f} ms ({orm_ms / sql_ms:.1f}x)")
+
+    checks.finish()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,246 @@
+# benchmarks/suite.py
+"""
+Endpoint benchmark suite across catalog sizes.
+
+For every scale, a template database is seeded (once, see benchmarks/seed.py)
+and copied; a fresh uvicorn is started on the copy and every endpoint in
+routers/ is called sequentially --iterations times. The copy is dropped
+afterwards, so the write cases never change the catalog the next run sees.
+Latency percentiles and the SQL statement count (from the Server-Timing
+header) are saved per scale and endpoint.
+
+    python -m benchmarks.suite --scales 1000 10000 100000 --output bench.json
+
+Comparing against a saved run exits with status 1 when an endpoint's p50 or
+p99 grew by more than --threshold, or it runs more queries or fails more
+requests than before:
+
+    python -m benchmarks.suite --scales 1000 10000 --compare bench.json
+
+--database-url-template places the databases elsewhere, e.g.
+postgresql://bench@localhost/cooknook_{scale} (the databases must exist; each
+run creates and drops <name>_run from it as a template, through the server's
+"postgres" database).
+"""
+import argparse
+import json
+import os
+import platform
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+import httpx
+
+from benchmarks.load_test import percentile, start_server
+from benchmarks.seed import CatalogGenerator, seed_catalog
+
+# GET /recipes/ returns the whole catalog; above this size only filtered listings are measured
+FULL_LIST_MAX_SCALE = 10_000
+
+_QUERIES = re.compile(r'db;dur=[\d.]+;desc="(\d+) queries"')
+
+
+def endpoint_cases(scale, generator):
+    """
+    (name, request factory) per endpoint. Factories take the iteration number
+    and the shared state dict and return (method, path, json body).
+    """
+    rng = generator.rng
+
+    def recipe_id():
+        return int(rng.integers(1, scale + 1))
+
+    def created_tag_id(state):
+        return state["tags"][-1] if state.get("tags") else 1
+
+    cases = [
+        ("GET /recipes/ filtered", lambda i, state: (
+            "GET", "/recipes/?min_total_minutes=30&max_total_minutes=30&sort=calories", None)),
+        ("GET /recipes/{id}", lambda i, state: ("GET", f"/recipes/{recipe_id()}", None)),
+        ("GET /recipes/{id}?servings", lambda i, state: ("GET", f"/recipes/{recipe_id()}?servings=8", None)),
+        ("GET /recipes/nearest-macros", lambda i, state: (
+            "GET", f"/recipes/nearest-macros?calories={300 + i % 400}&protein=30&k=10", None)),
+        ("POST /recipes/scale", lambda i, state: (
+            "POST", "/recipes/scale", {"recipes": [{"recipe_id": recipe_id(), "servings": 6} for _ in range(5)]})),
+        ("POST /recipes/", lambda i, state: ("POST", "/recipes/", generator.payload(scale + i))),
+        ("POST /shopping-list/", lambda i, state: (
+            "POST", "/shopping-list/",
+            {"recipes": [{"recipe_id": recipe_id(), "servings_multiplier": 2} for _ in range(7)], "currency": "EUR"})),
+        ("POST /meal-plans/generate", lambda i, state: (
+            "POST", "/meal-plans/generate",
+            {"days": 7, "meals_per_day": 3, "daily_targets": {"calories": 2000, "protein": 120},
+             "time_budget_ms": 200, "seed": i})),
+        ("GET /tags/", lambda i, state: ("GET", "/tags/", None)),
+        ("GET /tags/{tag_id}", lambda i, state: ("GET", f"/tags/{1 + i % 50}", None)),
+        ("POST /tags/", lambda i, state: ("POST", "/tags/", {"name": f"bench tag {time.time_ns()}"})),
+        ("PUT /tags/{tag_id}", lambda i, state: (
+            "PUT", f"/tags/{created_tag_id(state)}", {"name": f"bench tag renamed {time.time_ns()}"})),
+        ("DELETE /tags/{tag_id}", lambda i, state: ("DELETE", f"/tags/{state['tags'].pop()}", None)),
+        ("GET /health/pool", lambda i, state: ("GET", "/health/pool", None)),
+        ("GET /metrics", lambda i, state: ("GET", "/metrics", None)),
+        ("GET /ready", lambda i, state: ("GET", "/ready", None)),
+    ]
+    if scale <= FULL_LIST_MAX_SCALE:
+        cases.insert(0, ("GET /recipes/", lambda i, state: ("GET", "/recipes/", None)))
+    return cases
+
+
+def run_cases(url, cases, iterations, warmup):
+    results = {}
+    state = {"tags": []}
+    with httpx.Client(base_url=url, timeout=300) as client:
+        for name, make_request in cases:
+            latencies, queries, errors = [], [], 0
+            for i in range(warmup + iterations):
+                if name.startswith("DELETE") and not state["tags"]:
+                    break
+                method, path, body = make_request(i, state)
+                started = time.perf_counter()
+                response = client.request(method, path, json=body)
+                elapsed = time.perf_counter() - started
+                if name == "POST /tags/" and response.status_code == 201:
+                    state["tags"].append(response.json()["id"])
+                if i < warmup:
+                    continue
+                if response.status_code >= 400:
+                    errors += 1
+                latencies.append(elapsed)
+                match = _QUERIES.search(response.headers.get("server-timing", ""))
+                if match:
+                    queries.append(int(match.group(1)))
+            results[name] = {
+                "requests": len(latencies),
+                "errors": errors,
+                "p50_ms": round(percentile(latencies, 0.50) * 1000, 3) if latencies else None,
+                "p99_ms": round(percentile(latencies, 0.99) * 1000, 3) if latencies else None,
+                "queries": max(queries) if queries else None,
+            }
+    return results
+
+
+def copy_database(database_url):
+    """
+    A copy of the database at `database_url` for one run: (url of the copy, callable dropping it).
+    """
+    from sqlalchemy import create_engine, make_url, text
+
+    url = make_url(database_url)
+    if url.get_backend_name() == "sqlite":
+        directory = tempfile.mkdtemp(prefix="bench-run-")
+        path = os.path.join(directory, os.path.basename(url.database))
+        shutil.copyfile(url.database, path)
+        return str(url.set(database=path)), lambda: shutil.rmtree(directory, ignore_errors=True)
+
+    run_name = f"{url.database}_run"
+    server = create_engine(url.set(database="postgres"), isolation_level="AUTOCOMMIT")
+
+    def drop():
+        with server.connect() as connection:
+            connection.execute(text(f'DROP DATABASE IF EXISTS "{run_name}"'))
+        server.dispose()
+
+    drop()
+    with server.connect() as connection:
+        connection.execute(text(f'CREATE DATABASE "{run_name}" TEMPLATE "{url.database}"'))
+    return url.set(database=run_name).render_as_string(hide_password=False), drop
+
+
+def compare(baseline, current, threshold, query_slack):
+    """
+    List the regressions of `current` against `baseline`.
+    """
+    regressions = []
+    for scale, endpoints in current["results"].items():
+        for name, result in endpoints.items():
+            before = baseline.get("results", {}).get(scale, {}).get(name)
+            if not before:
+                continue
+            for metric in ("p50_ms", "p99_ms"):
+                if before[metric] and result[metric] and result[metric] > before[metric] * (1 + threshold):
+                    regressions.append(
+                        f"{scale} {name}: {metric} {before[metric]} -> {result[metric]} "
+                        f"(+{(result[metric] / before[metric] - 1) * 100:.0f}%)"
+                    )
+            if before["queries"] is not None and result["queries"] is not None \
+                    and result["queries"] > before["queries"] + query_slack:
+                regressions.append(f"{scale} {name}: queries {before['queries']} -> {result['queries']}")
+            if result["errors"] > before.get("errors", 0):
+                regressions.append(f"{scale} {name}: errors {before.get('errors', 0)} -> {result['errors']}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scales", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--database-url-template", default="sqlite:///./bench-{scale}.db")
+    parser.add_argument("--reseed", action="store_true", help="Seed even if the database already has recipes")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--warmup", type=int, default=5)
+    parser.add_argument("--async-db", action="store_true")
+    parser.add_argument("--output", help="Write the results as JSON to this file")
+    parser.add_argument("--compare", help="Baseline JSON from an earlier --output")
+    parser.add_argument("--threshold", type=float, default=0.25, help="Allowed relative p50/p99 growth")
+    parser.add_argument("--query-slack", type=int, default=0, help="Allowed extra statements per request")
+    args = parser.parse_args()
+
+    from sqlalchemy import create_engine, func, inspect, select, table
+
+    current = {
+        "meta": {
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "iterations": args.iterations,
+            "async_db": args.async_db,
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        },
+        "results": {},
+    }
+    for scale in args.scales:
+        database_url = args.database_url_template.format(scale=scale)
+        os.environ["DATABASE_URL"] = database_url
+        engine = create_engine(database_url)
+        existing = 0
+        if inspect(engine).has_table("recipes"):
+            with engine.connect() as connection:
+                existing = connection.execute(select(func.count()).select_from(table("recipes"))).scalar()
+        if args.reseed or existing < scale:
+            print(f"Seeding {scale - existing} recipes into {database_url}")
+            seed_catalog(engine, scale - existing, CatalogGenerator(args.seed + existing),
+                         progress=lambda line: print(f"  {line}", end="\r"))
+            print()
+        engine.dispose()
+
+        run_url, drop_copy = copy_database(database_url)
+        process, url = start_server(run_url, args.async_db)
+        try:
+            results = run_cases(url, endpoint_cases(scale, CatalogGenerator(args.seed)), args.iterations, args.warmup)
+        finally:
+            process.terminate()
+            process.wait()
+            drop_copy()
+        current["results"][str(scale)] = results
+        for name, result in results.items():
+            print(f"{scale:>9} {name:<32} p50 {result['p50_ms']:>9} ms  p99 {result['p99_ms']:>9} ms  "
+                  f"queries {result['queries']}  errors {result['errors']}")
+
+    if args.output:
+        with open(args.output, "w") as output:
+            json.dump(current, output, indent=2)
+
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            regressions = compare(json.load(baseline_file), current, args.threshold, args.query_slack)
+        if regressions:
+            print("Regressions:")
+            for line in regressions:
+                print(f"  {line}")
+            sys.exit(1)
+        print("No regressions")
+
+
+if __name__ == "__main__":
+    main()
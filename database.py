@@ -1,20 +1,87 @@
 # database.py
-from sqlalchemy import create_engine
-from sqlalchemy.orm import sessionmaker, declarative_base
-from dotenv import load_dotenv
-import os
+import time
 
-# Load environment variables
-load_dotenv()
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker, declarative_base
+
+from settings import settings
+from services.pool_stats import InstrumentedQueuePool, InstrumentedAsyncQueuePool
+from services.request_stats import record_statement
+from services.metrics import count_statement
+from services.replicas import AsyncRoutingSession, Replica, RoutingSession, replica_set
+# Registers the session events that evict cached rows after a commit
+from services import invalidation
+
+# Fail fast on inconsistent pool / thread settings
+settings.validate()
 
 # Set up the database URL from the .env file
-DATABASE_URL = os.getenv("DATABASE_URL")
+DATABASE_URL = settings.database_url
+
+# Serve the hot read endpoints through an async engine instead of the thread pool
+USE_ASYNC_DB = settings.use_async_db
+
+
+def engine_options(url: str, is_async: bool = False) -> dict:
+    """
+    Keyword arguments for create_engine / create_async_engine built from the settings.
+    """
+    options = {"echo": settings.sql_echo, "pool_pre_ping": settings.db_pool_pre_ping}
+    if ":memory:" in url or url.rstrip("/").endswith("sqlite:"):
+        # In-memory SQLite keeps its single-connection pool
+        return options
+
+    options.update(
+        poolclass=InstrumentedAsyncQueuePool if is_async else InstrumentedQueuePool,
+        pool_size=settings.db_pool_size,
+        max_overflow=settings.db_max_overflow,
+        pool_timeout=settings.db_pool_timeout,
+        pool_recycle=settings.db_pool_recycle,
+    )
+    if settings.is_postgres and settings.db_statement_timeout_ms:
+        timeout = str(settings.db_statement_timeout_ms)
+        if is_async:
+            options["connect_args"] = {"server_settings": {"statement_timeout": timeout}}
+        else:
+            options["connect_args"] = {"options": f"-c statement_timeout={timeout}"}
+    return options
+
+
+def instrument_engine(sync_engine):
+    """
+    Time every statement and add it to the current request's stats
+    (see services.request_stats), logging those slower than SLOW_QUERY_MS,
+    and count it by table for /metrics.
+    """
+    slow_query_seconds = settings.slow_query_ms / 1000
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("statement_started", []).append(time.perf_counter())
 
-# Create the engine
-engine = create_engine(DATABASE_URL, echo=True)
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def stop_statement_timer(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["statement_started"].pop()
+        record_statement(statement, parameters, time.perf_counter() - started, slow_query_seconds)
+        count_statement(statement)
 
-# Set up a session maker
-SessionLocal = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+    @event.listens_for(sync_engine, "handle_error")
+    def drop_statement_timer(exception_context):
+        timers = exception_context.connection.info.get("statement_started") if exception_context.connection else None
+        if timers:
+            timers.pop()
+
+
+# Engines are created by init_engines() (from the app lifespan, or by a CLI),
+# not at import, so importing the app, the models or a tool never connects
+engine = None
+async_engine = None
+
+# Read replicas, if any; read-only requests are routed to them by RoutingSession
+REPLICA_URLS = settings.replica_urls
+
+# Set up a session maker; bound to the engine by init_engines()
+SessionLocal = sessionmaker(autocommit=False, autoflush=False, class_=RoutingSession if REPLICA_URLS else Session)
 
 # Base class for models
 Base = declarative_base()
@@ -26,3 +93,92 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# ------------------------ Async engine ------------------------
+
+# Async drivers for the sync URLs we accept
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
+
+def async_url(url: str) -> str:
+    """
+    Swap the sync driver in a database URL for its async counterpart.
+    """
+    scheme, rest = url.split("://", 1)
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}://{rest}"
+
+
+AsyncSessionLocal = None
+
+if USE_ASYNC_DB:
+    from sqlalchemy.ext.asyncio import async_sessionmaker
+
+    # Objects stay usable after commit; async sessions cannot lazy-load expired attributes
+    AsyncSessionLocal = async_sessionmaker(
+        autoflush=False, expire_on_commit=False, sync_session_class=AsyncRoutingSession if REPLICA_URLS else Session,
+    )
+
+
+# Async dependency for session management
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
+
+
+# ------------------------ Engine lifecycle ------------------------
+
+def init_engines():
+    """
+    Create the engines and bind the session makers to them. Safe to call more
+    than once; returns the sync engine.
+    """
+    global engine, async_engine
+    if engine is None:
+        engine = create_engine(DATABASE_URL, **engine_options(DATABASE_URL))
+        instrument_engine(engine)
+        SessionLocal.configure(bind=engine)
+    if USE_ASYNC_DB and async_engine is None:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        async_engine = create_async_engine(async_url(DATABASE_URL), **engine_options(DATABASE_URL, is_async=True))
+        instrument_engine(async_engine.sync_engine)
+        AsyncSessionLocal.configure(bind=async_engine)
+    if REPLICA_URLS and not replica_set.replicas:
+        replica_set.configure(engine, [_replica(url) for url in REPLICA_URLS])
+    return engine
+
+
+def _replica(url):
+    replica_engine = create_engine(url, **engine_options(url))
+    instrument_engine(replica_engine)
+    replica_async_engine = None
+    if USE_ASYNC_DB:
+        from sqlalchemy.ext.asyncio import create_async_engine
+
+        replica_async_engine = create_async_engine(async_url(url), **engine_options(url, is_async=True))
+        instrument_engine(replica_async_engine.sync_engine)
+    return Replica(replica_engine, replica_async_engine)
+
+
+async def dispose_engines():
+    """
+    Close every pooled connection; init_engines() creates fresh engines afterwards.
+    """
+    global engine, async_engine
+    replica_set.stop()
+    for replica in replica_set.replicas:
+        if replica.async_engine is not None:
+            await replica.async_engine.dispose()
+        replica.engine.dispose()
+    replica_set.configure(None, [])
+    if async_engine is not None:
+        await async_engine.dispose()
+        async_engine = None
+    if engine is not None:
+        engine.dispose()
+        engine = None
@@ -1,55 +1,171 @@
 # main.py
-from fastapi import FastAPI, HTTPException
-from sqlalchemy import Column, Integer, String, ForeignKey, Table, Boolean
-from sqlalchemy.orm import Session
+import asyncio
+import logging
+import time
+from contextlib import asynccontextmanager
+
+from anyio import to_thread
+from fastapi import FastAPI, Request
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
 
-from typing import List, Optional
-# schemas/recipes.py
-from pydantic import BaseModel
-from schemas.ingredients import IngredientCreate
-from schemas.recipes import RecipeCreate
-from schemas.tags import TagCreate
-from schemas.nutrition import NutritionFactsCreate  
-from schemas.steps import RecipeStepCreate 
-from routers import recipes, tags
+import database
+from routers import recipes, tags, meal_plans, shopping_list, health, metrics
+from settings import settings
+from services.meal_planner import shutdown_executor
+from services.request_stats import TimedJSONResponse, StructuredFormatter, begin_request, end_request
+from services import metrics as app_metrics
+from services import invalidation
+from services.capture import capture_writer, CAPTURED_METHODS
+from services.catalog_snapshot import catalog_snapshot
+from services.memory import memory_profiler
+from services.recipe_cache import recipe_cache
+from services.replicas import replica_set, route_reads
+from services.shared_cache import shared_cache
+from services.warmup import readiness, warm_up
+
+request_logger = logging.getLogger("cooknook.requests")
+
 
+def configure_logging():
+    """
+    Structured output for the request and slow-query logs.
+    """
+    app_logger = logging.getLogger("cooknook")
+    if not app_logger.handlers:
+        log_handler = logging.StreamHandler()
+        log_handler.setFormatter(StructuredFormatter("%(asctime)s %(levelname)s %(name)s %(message)s"))
+        app_logger.addHandler(log_handler)
+    app_logger.setLevel(settings.log_level.upper())
 
 
-# Import database components
-from database import Base, engine, SessionLocal  
+# Per-request SQL count, DB time and serialization time, as a Server-Timing header and a log line,
+# plus the request metrics served on /metrics and the sampled request capture
+async def record_request_timing(request: Request, call_next):
+    stats, token = begin_request(request.scope)
+    captured = capture_writer is not None and capture_writer.sample()
+    # Read before the endpoint runs; Starlette hands the buffered body on to it
+    body = await request.body() if captured and request.method in CAPTURED_METHODS else None
+    app_metrics.http_in_flight.labels().inc()
+    try:
+        if memory_profiler.enabled:
+            response = await memory_profiler.measure(
+                request, call_next, lambda: f"{request.method} {stats.route or 'unmatched'}"
+            )
+        else:
+            response = await call_next(request)
+    finally:
+        end_request(token)
+        app_metrics.http_in_flight.labels().dec()
+
+    total = time.perf_counter() - stats.started
+    response.headers["Server-Timing"] = stats.server_timing(total)
+    request_size = request.headers.get("content-length")
+    response_size = response.headers.get("content-length")
+    app_metrics.observe_request(
+        request.method,
+        stats.route,
+        response.status_code,
+        total,
+        int(request_size) if request_size else None,
+        int(response_size) if response_size else None,
+    )
+    if captured:
+        capture_writer.record(request, body, stats.route, response.status_code, total)
+    request_logger.info(
+        "request",
+        extra={
+            "method": request.method,
+            "path": request.url.path,
+            "status": response.status_code,
+            **stats.log_fields(total),
+        },
+    )
+    return response
 
-# FastAPI setup
-app = FastAPI()
 
-# CORS middleware to allow cross-origin resource sharing
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # Allow all origins, or restrict it to your frontend origin
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# ------------------------ Lifespan ------------------------
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Connect and bring the schema up to date here rather than at import,
+    # so importing the app stays cheap and never touches the database
+    engine = database.init_engines()
+    if settings.migrate_on_startup:
+        from migrations import migrate
 
-# Create all tables
-Base.metadata.create_all(bind=engine)
+        await run_in_threadpool(migrate, engine)
+    # Probe the read replicas before serving and keep checking them
+    await run_in_threadpool(replica_set.start)
+    # Hear about writes made by the other workers
+    await run_in_threadpool(invalidation.start, engine)
+    # Map the catalog snapshot and keep it current (built in the background when missing)
+    if catalog_snapshot is not None:
+        await run_in_threadpool(catalog_snapshot.start, database.SessionLocal)
 
-# Dependency to get the session
-def get_db():
-    db = SessionLocal()
+    # Match the worker thread count for sync endpoints to the connection pool
+    to_thread.current_default_thread_limiter().total_tokens = settings.thread_limiter_size
+    # Trace allocations per route when memory profiling is on
+    if settings.memory_profiling:
+        memory_profiler.start()
+    # Share this worker's metrics with the others when running several
+    app_metrics.start_snapshot_writer()
+    # Write captured requests from a background thread
+    if capture_writer is not None:
+        capture_writer.start()
+    # Warm up in the background; /ready reports 503 until it finishes
+    warming = None
+    if settings.warmup_enabled:
+        warming = asyncio.create_task(warm_up())
+    else:
+        readiness.ready = True
     try:
-        yield db
+        yield
     finally:
-        db.close()
+        readiness.ready = False
+        if warming is not None and not warming.done():
+            warming.cancel()
+        if settings.warmup_history_path:
+            recipe_cache.save_history(settings.warmup_history_path)
+        # Stop the meal-plan worker processes with the server
+        shutdown_executor()
+        # Flush the captured requests still queued
+        if capture_writer is not None:
+            capture_writer.stop()
+        if catalog_snapshot is not None:
+            await run_in_threadpool(catalog_snapshot.stop)
+        await run_in_threadpool(invalidation.stop)
+        if shared_cache is not None:
+            shared_cache.close()
+        await database.dispose_engines()
 
 
-# ------------------------ Routes ------------------------
-# Register the API router
-# app.include_router(api_router)
-app.include_router(recipes.router, prefix="/recipes", tags=["recipes"])
+# ------------------------ App factory ------------------------
+def create_app() -> FastAPI:
+    configure_logging()
+    app = FastAPI(default_response_class=TimedJSONResponse, lifespan=lifespan)
 
-# Register the tags router
-app.include_router(tags.router, prefix="/tags", tags=["tags"])
+    # CORS middleware to allow cross-origin resource sharing
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # Allow all origins, or restrict it to your frontend origin
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+    )
+    # Send the sessions of read-only requests to the read replicas
+    if database.REPLICA_URLS:
+        app.middleware("http")(route_reads)
+    app.middleware("http")(record_request_timing)
 
+    # ------------------------ Routes ------------------------
+    app.include_router(recipes.router, prefix="/recipes", tags=["recipes"])
+    app.include_router(tags.router, prefix="/tags", tags=["tags"])
+    app.include_router(meal_plans.router, prefix="/meal-plans", tags=["meal-plans"])
+    app.include_router(shopping_list.router, prefix="/shopping-list", tags=["shopping-list"])
+    app.include_router(health.router, prefix="/health", tags=["health"])
+    app.include_router(health.ready_router, tags=["health"])
+    app.include_router(metrics.router, tags=["metrics"])
+    return app
 
 
+app = create_app()
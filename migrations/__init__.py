@@ -0,0 +1,4 @@
+# migrations/__init__.py
+
+from .runner import Migration, migrate, pending, stamp
+from .versions import MIGRATIONS
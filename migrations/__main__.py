@@ -0,0 +1,41 @@
+# migrations/__main__.py
+"""
+Apply or inspect schema migrations against DATABASE_URL.
+
+    python -m migrations upgrade
+    python -m migrations status
+    python -m migrations stamp 5    # mark an existing schema as current
+"""
+import argparse
+import logging
+
+import database
+from migrations import MIGRATIONS, migrate, pending, stamp
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("upgrade", help="Apply every pending migration")
+    commands.add_parser("status", help="List migrations and whether they are applied")
+    stamp_parser = commands.add_parser("stamp", help="Record migrations as applied without running them")
+    stamp_parser.add_argument("version", type=int)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    engine = database.init_engines()
+    if args.command == "upgrade":
+        applied = migrate(engine)
+        print(f"Applied {applied}" if applied else "Schema is up to date")
+    elif args.command == "status":
+        waiting = {migration.version for migration in pending(engine)}
+        for migration in MIGRATIONS:
+            state = "pending" if migration.version in waiting else "applied"
+            print(f"{migration.version:04d} {migration.name:<36} {state}")
+    else:
+        stamp(engine, args.version)
+        print(f"Stamped up to {args.version}")
+
+
+if __name__ == "__main__":
+    main()
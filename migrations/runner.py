@@ -0,0 +1,172 @@
+# migrations/runner.py
+"""
+Versioned schema migrations.
+
+Applied versions are recorded in schema_migrations. Every operation checks
+the live schema first (table, column or index already there), so databases
+created earlier with Base.metadata.create_all are brought up to date by
+running the whole chain. On PostgreSQL the run holds an advisory lock, so
+several workers starting together apply each migration once. Migrations
+marked non-transactional run in autocommit mode, which CREATE INDEX
+CONCURRENTLY requires.
+"""
+import logging
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from typing import Callable
+
+from sqlalchemy import Column, DateTime, Integer, MetaData, String, Table, inspect, select, text
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateColumn
+
+logger = logging.getLogger("cooknook.migrations")
+
+# Arbitrary key for pg_advisory_lock, shared by every process migrating this database
+ADVISORY_LOCK_KEY = 0x636F6F6B
+
+_metadata = MetaData()
+schema_migrations = Table(
+    "schema_migrations", _metadata,
+    Column("version", Integer, primary_key=True),
+    Column("name", String(100), nullable=False),
+    Column("applied_at", DateTime(timezone=True), nullable=False),
+)
+
+
+@dataclass(frozen=True)
+class Migration:
+    version: int
+    name: str
+    upgrade: Callable[["Operations"], None]
+    # False for migrations that must run outside a transaction (concurrent index builds)
+    transactional: bool = True
+
+
+class Operations:
+    """
+    Idempotent schema operations handed to a migration's upgrade function.
+    """
+
+    def __init__(self, connection, transactional=True):
+        self.connection = connection
+        self.dialect = connection.dialect
+        self.transactional = transactional
+
+    @property
+    def is_postgres(self) -> bool:
+        return self.dialect.name == "postgresql"
+
+    def execute(self, statement, parameters=None):
+        if isinstance(statement, str):
+            statement = text(statement)
+        return self.connection.execute(statement, parameters or {})
+
+    def _inspector(self):
+        # A fresh inspector each time; it caches what it has reflected
+        return inspect(self.connection)
+
+    def has_table(self, table_name) -> bool:
+        return self._inspector().has_table(table_name)
+
+    def has_column(self, table_name, column_name) -> bool:
+        return any(column["name"] == column_name for column in self._inspector().get_columns(table_name))
+
+    def has_index(self, table_name, index_name) -> bool:
+        return any(index["name"] == index_name for index in self._inspector().get_indexes(table_name))
+
+    def create_table(self, table: Table):
+        table.create(self.connection, checkfirst=True)
+
+    def add_column(self, table_name, column: Column):
+        if self.has_column(table_name, column.name):
+            return
+        spec = CreateColumn(column).compile(dialect=self.dialect)
+        self.execute(f"ALTER TABLE {table_name} ADD COLUMN {spec}")
+
+    def create_index(self, index_name, table_name, *columns, unique=False):
+        """
+        CREATE INDEX, concurrently on PostgreSQL (the migration must be
+        non-transactional) so writes are not blocked while it builds.
+        """
+        if self.has_index(table_name, index_name):
+            return
+        concurrently = " CONCURRENTLY" if self.is_postgres and not self.transactional else ""
+        self.execute(
+            f"CREATE {'UNIQUE ' if unique else ''}INDEX{concurrently} IF NOT EXISTS "
+            f"{index_name} ON {table_name} ({', '.join(columns)})"
+        )
+
+
+def _applied_versions(connection):
+    schema_migrations.create(connection, checkfirst=True)
+    return set(connection.execute(select(schema_migrations.c.version)).scalars())
+
+
+def _record(connection, migration):
+    connection.execute(schema_migrations.insert().values(
+        version=migration.version, name=migration.name, applied_at=datetime.now(timezone.utc),
+    ))
+
+
+def _apply(engine, migration):
+    if migration.transactional:
+        with engine.begin() as connection:
+            migration.upgrade(Operations(connection))
+            _record(connection, migration)
+        return
+    with engine.connect() as connection:
+        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+        migration.upgrade(Operations(connection, transactional=False))
+        _record(connection, migration)
+
+
+def pending(engine, migrations=None):
+    from migrations.versions import MIGRATIONS
+
+    with engine.begin() as connection:
+        applied = _applied_versions(connection)
+    return [migration for migration in (migrations or MIGRATIONS) if migration.version not in applied]
+
+
+def migrate(engine, migrations=None):
+    """
+    Apply every pending migration in version order; returns the versions applied.
+    """
+    from migrations.versions import MIGRATIONS
+
+    migrations = sorted(migrations or MIGRATIONS, key=lambda migration: migration.version)
+    lock = None
+    if engine.dialect.name == "postgresql":
+        lock = engine.connect().execution_options(isolation_level="AUTOCOMMIT")
+        lock.execute(text("SELECT pg_advisory_lock(:key)"), {"key": ADVISORY_LOCK_KEY})
+    try:
+        applied_now = []
+        for migration in pending(engine, migrations):
+            logger.info("applying migration %s %s", migration.version, migration.name, extra={"version": migration.version, "migration": migration.name})
+            try:
+                _apply(engine, migration)
+            except IntegrityError:
+                # Another process recorded it first (databases without advisory locks);
+                # the operations themselves are idempotent
+                if migration.version not in {m.version for m in pending(engine, migrations)}:
+                    continue
+                raise
+            applied_now.append(migration.version)
+        return applied_now
+    finally:
+        if lock is not None:
+            lock.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": ADVISORY_LOCK_KEY})
+            lock.close()
+
+
+def stamp(engine, version, migrations=None):
+    """
+    Record every migration up to `version` as applied without running it.
+    """
+    from migrations.versions import MIGRATIONS
+
+    with engine.begin() as connection:
+        applied = _applied_versions(connection)
+        for migration in migrations or MIGRATIONS:
+            if migration.version <= version and migration.version not in applied:
+                _record(connection, migration)
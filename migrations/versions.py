@@ -0,0 +1,210 @@
+# migrations/versions.py
+"""
+The migration chain, oldest first. Append new migrations to MIGRATIONS with
+the next version number; never edit one that has shipped.
+"""
+from sqlalchemy import BigInteger, Boolean, Column, Float, ForeignKey, Integer, LargeBinary, MetaData, String, Table, Text, text
+
+from migrations.runner import Migration
+
+# ------------------------ 0001 baseline ------------------------
+# The schema as first shipped, defined here rather than taken from the models
+# so later model changes do not rewrite history.
+_baseline = MetaData()
+
+Table(
+    "ingredients", _baseline,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("item", String(100), index=True),
+    Column("quantity", String(50)),
+    Column("notes", String(255)),
+    Column("price", Integer),
+    Column("currency", String(3)),
+)
+Table(
+    "categories", _baseline,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("name", String(50), unique=True, index=True),
+)
+Table(
+    "tags", _baseline,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("name", String(50), unique=True, index=True),
+)
+Table(
+    "recipes", _baseline,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("title", String, index=True, nullable=False),
+    Column("prep_time_value", Integer),
+    Column("prep_time_unit", String(10)),
+    Column("cook_time_value", Integer),
+    Column("cook_time_unit", String(10)),
+    Column("servings", Integer),
+    Column("image", String, nullable=True),
+    Column("deleted", Boolean, default=False),
+)
+Table(
+    "recipe_ingredients", _baseline,
+    Column("recipe_id", Integer, ForeignKey("recipes.id"), primary_key=True),
+    Column("ingredient_id", Integer, ForeignKey("ingredients.id"), primary_key=True),
+)
+Table(
+    "recipe_categories", _baseline,
+    Column("recipe_id", Integer, ForeignKey("recipes.id"), primary_key=True),
+    Column("category_id", Integer, ForeignKey("categories.id"), primary_key=True),
+)
+Table(
+    "recipe_tags", _baseline,
+    Column("recipe_id", Integer, ForeignKey("recipes.id"), primary_key=True),
+    Column("tag_id", Integer, ForeignKey("tags.id"), primary_key=True),
+)
+Table(
+    "instructions", _baseline,
+    Column("id", Integer, primary_key=True, autoincrement=True),
+    Column("recipe_id", Integer, ForeignKey("recipes.id"), nullable=False),
+    Column("step_number", Integer, nullable=False),
+    Column("instruction", String, nullable=False),
+    Column("deleted", Boolean, default=False),
+)
+Table(
+    "nutrition_facts", _baseline,
+    Column("id", Integer, primary_key=True, index=True, autoincrement=True),
+    Column("recipe_id", Integer, ForeignKey("recipes.id"), nullable=False),
+    Column("calories", Integer, nullable=True),
+    Column("fat", Integer, nullable=True),
+    Column("carbohydrates", Integer, nullable=True),
+    Column("protein", Integer, nullable=True),
+    Column("deleted", Boolean, default=False),
+)
+
+
+def baseline(op):
+    for table in _baseline.sorted_tables:
+        op.create_table(table)
+
+
+# ------------------------ 0002 normalized time and nutrition ------------------------
+def normalized_columns(op):
+    from services.units import to_minutes
+
+    op.add_column("recipes", Column("total_time_minutes", Integer, nullable=True))
+    op.add_column("nutrition_facts", Column("calories_per_serving", Float, nullable=True))
+    if op.is_postgres:
+        for name in ("calories", "fat", "carbohydrates", "protein"):
+            op.execute(f"ALTER TABLE nutrition_facts ALTER COLUMN {name} TYPE double precision")
+
+    rows = op.execute(
+        "SELECT id, prep_time_value, prep_time_unit, cook_time_value, cook_time_unit "
+        "FROM recipes WHERE total_time_minutes IS NULL"
+    ).all()
+    totals = []
+    for row in rows:
+        try:
+            total = (to_minutes(row.prep_time_value or 0, row.prep_time_unit)
+                     + to_minutes(row.cook_time_value or 0, row.cook_time_unit))
+        except ValueError:
+            # Units create_recipe would now reject stay unfiltered
+            continue
+        totals.append({"row_id": row.id, "total": round(total)})
+    if totals:
+        op.connection.execute(
+            text("UPDATE recipes SET total_time_minutes = :total WHERE id = :row_id"), totals
+        )
+
+    op.execute(
+        "UPDATE nutrition_facts SET calories_per_serving = calories * 1.0 / "
+        "(SELECT servings FROM recipes WHERE recipes.id = nutrition_facts.recipe_id) "
+        "WHERE calories IS NOT NULL AND calories_per_serving IS NULL AND "
+        "(SELECT servings FROM recipes WHERE recipes.id = nutrition_facts.recipe_id) > 0"
+    )
+
+
+# ------------------------ 0003 range filter indexes ------------------------
+def range_filter_indexes(op):
+    op.create_index("ix_recipes_deleted_total_time", "recipes", "deleted", "total_time_minutes")
+    op.create_index("ix_recipes_deleted_servings", "recipes", "deleted", "servings")
+    op.create_index(
+        "ix_nutrition_facts_calories_per_serving", "nutrition_facts", "calories_per_serving", "recipe_id"
+    )
+    op.create_index("ix_nutrition_facts_recipe_id", "nutrition_facts", "recipe_id")
+
+
+# ------------------------ 0004 per-recipe ingredient quantities ------------------------
+def recipe_ingredient_quantities(op):
+    from services.units import parse_quantity
+
+    op.add_column("recipe_ingredients", Column("quantity", String(50)))
+    op.add_column("recipe_ingredients", Column("quantity_value", Float, nullable=True))
+    op.add_column("recipe_ingredients", Column("quantity_unit", String(10), nullable=True))
+    op.add_column("recipe_ingredients", Column("notes", String(255)))
+
+    # Quantities used to live on the shared ingredient rows
+    if op.has_column("ingredients", "quantity"):
+        op.execute(
+            "UPDATE recipe_ingredients SET "
+            "quantity = (SELECT quantity FROM ingredients WHERE ingredients.id = recipe_ingredients.ingredient_id), "
+            "notes = (SELECT notes FROM ingredients WHERE ingredients.id = recipe_ingredients.ingredient_id) "
+            "WHERE quantity IS NULL"
+        )
+
+    parsed = []
+    rows = op.execute(
+        "SELECT recipe_id, ingredient_id, quantity FROM recipe_ingredients "
+        "WHERE quantity IS NOT NULL AND quantity_value IS NULL"
+    ).all()
+    for row in rows:
+        quantity = parse_quantity(row.quantity)
+        if quantity:
+            parsed.append({"rid": row.recipe_id, "iid": row.ingredient_id, "value": quantity[0], "unit": quantity[1]})
+    if parsed:
+        op.connection.execute(
+            text(
+                "UPDATE recipe_ingredients SET quantity_value = :value, quantity_unit = :unit "
+                "WHERE recipe_id = :rid AND ingredient_id = :iid"
+            ),
+            parsed,
+        )
+
+
+# ------------------------ 0005 ingredient lookup index ------------------------
+def recipe_ingredient_index(op):
+    op.create_index("ix_recipe_ingredients_ingredient_id", "recipe_ingredients", "ingredient_id")
+
+
+# ------------------------ 0006 cache generation ------------------------
+def cache_generation(op):
+    op.create_table(Table(
+        "cache_generation", MetaData(),
+        Column("id", Integer, primary_key=True, autoincrement=False),
+        Column("generation", BigInteger, nullable=False),
+    ))
+    if op.execute("SELECT COUNT(*) FROM cache_generation").scalar() == 0:
+        op.execute("INSERT INTO cache_generation (id, generation) VALUES (1, 0)")
+
+
+# ------------------------ 0007 step lookup index ------------------------
+def instruction_recipe_index(op):
+    op.create_index("ix_instructions_recipe_id", "instructions", "recipe_id")
+
+
+# ------------------------ 0008 recipe documents ------------------------
+def recipe_documents(op):
+    op.create_table(Table(
+        "recipe_documents", MetaData(),
+        Column("recipe_id", Integer, primary_key=True, autoincrement=False),
+        Column("document", Text, nullable=False),
+        Column("compressed", LargeBinary, nullable=False),
+        Column("updated_at", Float, nullable=False),
+    ))
+
+
+MIGRATIONS = [
+    Migration(1, "baseline", baseline),
+    Migration(2, "normalized_time_and_nutrition", normalized_columns),
+    Migration(3, "range_filter_indexes", range_filter_indexes, transactional=False),
+    Migration(4, "recipe_ingredient_quantities", recipe_ingredient_quantities),
+    Migration(5, "recipe_ingredient_index", recipe_ingredient_index, transactional=False),
+    Migration(6, "cache_generation", cache_generation),
+    Migration(7, "instruction_recipe_index", instruction_recipe_index, transactional=False),
+    Migration(8, "recipe_documents", recipe_documents),
+]
@@ -1,6 +1,6 @@
 # models/__init__.py
 
-from .recipes import Recipe, recipe_ingredients, recipe_categories, recipe_tags
+from .recipes import Recipe, RecipeIngredient, recipe_ingredients, recipe_categories, recipe_tags
 from .ingredients import Ingredient
 from .categories import Category
 from .tags import Tag
@@ -8,12 +8,13 @@ class Ingredient(Base):
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
     item = Column(String(100), index=True)
-    quantity = Column(String(50))
-    notes = Column(String(255))
     price = Column(Integer)
     currency = Column(String(3))
 
+    # Per-recipe quantities and notes live on the association rows
+    recipe_links = relationship("RecipeIngredient", back_populates="ingredient")
+
     # Many-to-Many relationship with Recipe
     recipes = relationship(
-        "Recipe", secondary="recipe_ingredients", back_populates="ingredients"
+        "Recipe", secondary="recipe_ingredients", back_populates="ingredients", viewonly=True
     )
@@ -1,5 +1,5 @@
 # routers/nutrition.py
-from sqlalchemy import Column, Integer, Boolean, ForeignKey
+from sqlalchemy import Column, Integer, Float, Boolean, ForeignKey, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -7,12 +7,19 @@ class NutritionFacts(Base):
     __tablename__ = "nutrition_facts"
 
     id = Column(Integer, primary_key=True, index=True, autoincrement=True)
-    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False)
-    calories = Column(Integer, nullable=True)
-    fat = Column(Integer, nullable=True)
-    carbohydrates = Column(Integer, nullable=True)
-    protein = Column(Integer, nullable=True)
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False, index=True)
+    # Whole-recipe values, parsed to kcal / grams on write
+    calories = Column(Float, nullable=True)
+    fat = Column(Float, nullable=True)
+    carbohydrates = Column(Float, nullable=True)
+    protein = Column(Float, nullable=True)
+    # calories / Recipe.servings, used for range filters and sorting
+    calories_per_serving = Column(Float, nullable=True)
     deleted = Column(Boolean, default=False)
 
+    __table_args__ = (
+        Index("ix_nutrition_facts_calories_per_serving", "calories_per_serving", "recipe_id"),
+    )
+
     # One-to-One relationship with Recipe
     recipe = relationship("Recipe", back_populates="nutrition_facts")
@@ -1,15 +1,26 @@
 # models/recipes.py
 
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, Table
+from sqlalchemy import Column, Integer, String, Float, Boolean, ForeignKey, Table, Index
 from sqlalchemy.orm import relationship
 from database import Base
 
-# Association table between recipes and ingredients
-recipe_ingredients = Table(
-    'recipe_ingredients', Base.metadata,
-    Column('recipe_id', Integer, ForeignKey('recipes.id'), primary_key=True),
-    Column('ingredient_id', Integer, ForeignKey('ingredients.id'), primary_key=True)
-)
+# Association object between recipes and ingredients, holding the per-recipe quantity
+class RecipeIngredient(Base):
+    __tablename__ = "recipe_ingredients"
+
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), primary_key=True)
+    ingredient_id = Column(Integer, ForeignKey("ingredients.id"), primary_key=True, index=True)
+    # Quantity as entered, plus its parsed amount and canonical unit (None for plain counts)
+    quantity = Column(String(50))
+    quantity_value = Column(Float, nullable=True)
+    quantity_unit = Column(String(10), nullable=True)
+    notes = Column(String(255))
+
+    recipe = relationship("Recipe", back_populates="ingredient_links")
+    ingredient = relationship("Ingredient", back_populates="recipe_links")
+
+# Table form of the association, for Core queries
+recipe_ingredients = RecipeIngredient.__table__
 
 # Association table between recipes and categories
 recipe_categories = Table(
@@ -34,10 +45,18 @@ class Recipe(Base):
     prep_time_unit = Column(String(10))
     cook_time_value = Column(Integer)
     cook_time_unit = Column(String(10))
+    # Prep + cook time in minutes, normalized from the free-text units on write
+    total_time_minutes = Column(Integer, nullable=True)
     servings = Column(Integer)
     image = Column(String, nullable=True)
     deleted = Column(Boolean, default=False)
 
+    # Composite indexes so live-recipe range filters and sorts are index range scans
+    __table_args__ = (
+        Index("ix_recipes_deleted_total_time", "deleted", "total_time_minutes"),
+        Index("ix_recipes_deleted_servings", "deleted", "servings"),
+    )
+
     # One-to-Many relationship: Instructions
     instructions = relationship(
         "RecipeStep", back_populates="recipe", cascade="all, delete-orphan"
@@ -48,9 +67,14 @@ class Recipe(Base):
         "NutritionFacts", back_populates="recipe", uselist=False, cascade="all, delete-orphan"
     )
 
-    # Many-to-Many relationships: Ingredients, Categories, Tags
+    # Per-recipe ingredient quantities; write ingredients through these links
+    ingredient_links = relationship(
+        "RecipeIngredient", back_populates="recipe", cascade="all, delete-orphan"
+    )
+
+    # Many-to-Many relationships: Ingredients (read-only view of the links), Categories, Tags
     ingredients = relationship(
-        "Ingredient", secondary=recipe_ingredients, back_populates="recipes"
+        "Ingredient", secondary=recipe_ingredients, back_populates="recipes", viewonly=True
     )
     categories = relationship(
         "Category", secondary=recipe_categories, back_populates="recipes"
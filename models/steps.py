@@ -7,7 +7,7 @@ class RecipeStep(Base):
     __tablename__ = "instructions"
 
     id = Column(Integer, primary_key=True, autoincrement=True)
-    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False)
+    recipe_id = Column(Integer, ForeignKey("recipes.id"), nullable=False, index=True)
     step_number = Column(Integer, nullable=False)
     instruction = Column(String, nullable=False)
     deleted = Column(Boolean, default=False)
@@ -8,3 +8,7 @@
 # routers/__init__.py
 from .recipes import router as recipes_router
 from .tags import router as tags_router
+from .meal_plans import router as meal_plans_router
+from .shopping_list import router as shopping_list_router
+from .health import router as health_router, ready_router
+from .metrics import router as metrics_router
@@ -0,0 +1,58 @@
+# routers/health.py
+from anyio import to_thread
+from fastapi import APIRouter, HTTPException
+from fastapi.responses import JSONResponse
+
+import database
+from services.pool_stats import pool_gauges
+from services.memory import memory_profiler
+from services.replicas import replica_set
+from services.warmup import readiness
+
+router = APIRouter()
+
+# Served at the root as /ready, for load balancer readiness checks
+ready_router = APIRouter()
+
+# ------------------------ GET Routes ------------------------
+
+@router.get("/pool")
+async def get_pool_stats():
+    """
+    Live connection pool and worker thread gauges.
+    """
+    limiter = to_thread.current_default_thread_limiter()
+    statistics = limiter.statistics()
+    return {
+        "sync_pool": pool_gauges(database.engine),
+        "async_pool": pool_gauges(database.async_engine),
+        "replicas": [
+            {**replica.status(), "pool": pool_gauges(replica.engine)} for replica in replica_set.replicas
+        ],
+        "thread_pool": {
+            "size": int(limiter.total_tokens),
+            "busy": statistics.borrowed_tokens,
+            "waiting": statistics.tasks_waiting,
+            "saturation": round(statistics.borrowed_tokens / limiter.total_tokens, 3),
+        },
+    }
+
+
+@router.get("/memory")
+async def get_memory_stats():
+    """
+    Peak allocation per route and the largest live allocation sites.
+    Only available with MEMORY_PROFILING on.
+    """
+    if not memory_profiler.enabled:
+        raise HTTPException(status_code=404, detail="Memory profiling is off; set MEMORY_PROFILING=1")
+    return memory_profiler.report()
+
+
+@ready_router.get("/ready")
+async def get_readiness():
+    """
+    200 once this worker has finished its warm-up, 503 while it is still warming
+    up or shutting down.
+    """
+    return JSONResponse(readiness.as_dict(), status_code=200 if readiness.ready else 503)
@@ -0,0 +1,121 @@
+# routers/meal_plans.py
+import asyncio
+import time
+
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from models import Recipe, NutritionFacts, Tag, Category
+from schemas.meal_plans import MealPlanRequest
+from database import get_db
+from services.meal_planner import get_executor, plan_meals
+
+router = APIRouter()
+
+# Extra time allowed for process start-up and result transfer beyond the search budget
+GRACE_SECONDS = 5.0
+
+MACROS = ("calories", "protein", "fat", "carbohydrates")
+
+
+def _normalize(names):
+    return [name.strip().capitalize() for name in names]
+
+
+def _lowered(names):
+    # Compared against lower(name), so exclusions match whatever case the vocabulary was stored in
+    return [name.strip().lower() for name in names]
+
+
+def load_candidates(db: Session, request: MealPlanRequest, macros):
+    """
+    Load id, title and per-serving macros for every recipe allowed by the request's
+    tag and category constraints.
+    """
+    columns = [getattr(NutritionFacts, name) for name in macros]
+    query = (
+        db.query(Recipe.id, Recipe.title, Recipe.servings, *columns)
+        .join(NutritionFacts, NutritionFacts.recipe_id == Recipe.id)
+        .filter(Recipe.deleted.is_(False), NutritionFacts.deleted.is_(False))
+        .filter(*[column.isnot(None) for column in columns])
+    )
+    for name in _normalize(request.include_tags):
+        query = query.filter(Recipe.tags.any(Tag.name.ilike(name)))
+    for name in _normalize(request.include_categories):
+        query = query.filter(Recipe.categories.any(Category.name.ilike(name)))
+    if request.exclude_tags:
+        query = query.filter(
+            ~Recipe.tags.any(func.lower(Tag.name).in_(_lowered(request.exclude_tags)))
+        )
+    if request.exclude_categories:
+        query = query.filter(
+            ~Recipe.categories.any(func.lower(Category.name).in_(_lowered(request.exclude_categories)))
+        )
+    return query.all()
+
+
+# ------------------------ POST Route ------------------------
+
+@router.post("/generate")
+async def generate_meal_plan(request: MealPlanRequest, db: Session = Depends(get_db)):
+    """
+    Pick distinct recipes for each day so daily totals land close to the calorie and macro targets.
+    The search runs in a worker process within the request's time budget.
+    """
+    targets = request.daily_targets.model_dump()
+    macros = [name for name in MACROS if targets.get(name) is not None]
+
+    rows = await run_in_threadpool(load_candidates, db, request, macros)
+    slots = request.days * request.meals_per_day
+    if len(rows) < slots:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Only {len(rows)} recipes match the constraints, {slots} are needed",
+        )
+
+    import numpy as np
+
+    servings = np.array([max(row.servings or 1, 1) for row in rows], dtype=np.float64)
+    per_serving = np.array([row[3:] for row in rows], dtype=np.float64) / servings[:, None]
+    goal = np.array([targets[name] for name in macros], dtype=np.float64)
+
+    budget = request.time_budget_ms / 1000
+    future = get_executor().submit(
+        plan_meals, per_serving, goal, request.days, request.meals_per_day,
+        time.time() + budget, request.seed,
+    )
+    try:
+        # Cancelling the awaitable (timeout or client disconnect) cancels the queued job too
+        plan, score, iterations, timed_out = await asyncio.wait_for(
+            asyncio.wrap_future(future), timeout=budget + GRACE_SECONDS
+        )
+    except asyncio.TimeoutError:
+        raise HTTPException(status_code=503, detail="Meal plan workers are busy, try again")
+
+    days = []
+    for day, picks in enumerate(plan, start=1):
+        totals = per_serving[picks].sum(axis=0)
+        days.append({
+            "day": day,
+            "recipes": [
+                {
+                    "id": rows[pick].id,
+                    "title": rows[pick].title,
+                    "per_serving": {
+                        name: round(float(value), 2)
+                        for name, value in zip(macros, per_serving[pick])
+                    },
+                }
+                for pick in picks
+            ],
+            "totals": {name: round(float(value), 2) for name, value in zip(macros, totals)},
+        })
+
+    return {
+        "days": days,
+        "score": round(score, 6),
+        "iterations": iterations,
+        "timed_out": timed_out,
+    }
@@ -0,0 +1,171 @@
+# routers/metrics.py
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+import database
+from services import document_table, invalidation, metrics
+from services.card_index import card_index
+from services.catalog_snapshot import catalog_snapshot
+from services.currency import load_rates
+from services.pool_stats import pool_gauges
+from services.recipe_cache import recipe_cache
+from services.request_stats import normalize_sql
+from services.shared_cache import shared_cache
+from services.single_flight import recipe_flights, tag_flights
+from services.units import parse_measure, parse_quantity
+from settings import settings
+
+router = APIRouter()
+
+# Hit ratios of the in-process parse / lookup caches
+metrics.register_lru_cache("parse_quantity", parse_quantity)
+metrics.register_lru_cache("parse_measure", parse_measure)
+metrics.register_lru_cache("normalize_sql", normalize_sql)
+metrics.register_lru_cache("currency_rates", load_rates)
+metrics.register_cache("recipe_documents", lambda: (recipe_cache.hits, recipe_cache.misses))
+if shared_cache is not None:
+    metrics.register_cache("recipe_documents_shared", lambda: (shared_cache.hits, shared_cache.misses))
+if settings.recipe_document_table:
+    metrics.register_cache(
+        "recipe_document_table", lambda: (document_table.stats["hits"], document_table.stats["misses"]),
+    )
+
+POOL_GAUGES = (
+    ("db_pool_size", "gauge", "Connections kept in the pool", "size", 1),
+    ("db_pool_checked_out", "gauge", "Connections in use", "checked_out", 1),
+    ("db_pool_idle", "gauge", "Connections idle in the pool", "idle", 1),
+    ("db_pool_overflow", "gauge", "Connections open beyond the pool size", "overflow", 1),
+    ("db_pool_checkouts_total", "counter", "Connection checkouts", "checkouts", 1),
+    ("db_pool_checkout_timeouts_total", "counter", "Checkouts that timed out", "checkout_timeouts", 1),
+    ("db_pool_checkout_errors_total", "counter", "Checkouts that failed to connect", "checkout_errors", 1),
+    ("db_pool_checkout_wait_seconds_total", "counter", "Time spent waiting for a connection", "checkout_wait_ms_total", 0.001),
+)
+
+
+def collect_pools():
+    gauges = {"sync": pool_gauges(database.engine), "async": pool_gauges(database.async_engine)}
+    families = []
+    for name, kind, help, key, scale in POOL_GAUGES:
+        values = [
+            ({"engine": engine_name}, pool[key] * scale)
+            for engine_name, pool in gauges.items()
+            if pool is not None and key in pool
+        ]
+        families.append((name, kind, help, values))
+    return families
+
+
+metrics.registry.add_collector(collect_pools)
+
+
+def collect_invalidation():
+    return [
+        ("cache_invalidation_messages_total", "counter", "Invalidation messages sent to / received from other workers", [
+            ({"direction": "published"}, invalidation.stats["published"]),
+            ({"direction": "received"}, invalidation.stats["received"]),
+        ]),
+        ("cache_invalidation_gaps_total", "counter", "Lost invalidation messages that cleared the caches", [
+            ({}, invalidation.stats["gaps"]),
+        ]),
+    ]
+
+
+metrics.registry.add_collector(collect_invalidation)
+
+
+def collect_shared_cache():
+    return [
+        ("recipe_shared_cache_errors_total", "counter", "Shared cache calls that failed and fell back to the database", [
+            ({}, shared_cache.errors),
+        ]),
+        ("recipe_shared_cache_lock_waits_total", "counter", "Loads that waited for another request loading the same recipe", [
+            ({}, shared_cache.lock_waits),
+        ]),
+        ("recipe_shared_cache_compressed_total", "counter", "Documents stored compressed in the shared cache", [
+            ({}, shared_cache.compressed),
+        ]),
+        ("recipe_shared_cache_stale_total", "counter", "Shared entries skipped as loaded before a write committed", [
+            ({}, shared_cache.stale),
+        ]),
+        ("recipe_shared_cache_available", "gauge", "Whether the shared cache is in use (0 while skipped after a failure)", [
+            ({}, int(shared_cache.available)),
+        ]),
+    ]
+
+
+if shared_cache is not None:
+    metrics.registry.add_collector(collect_shared_cache)
+
+
+SINGLE_FLIGHT_COUNTERS = (
+    ("single_flight_loads_total", "Loads run (one per group of identical concurrent reads)", "loads"),
+    ("single_flight_collapsed_total", "Reads served by waiting for an identical read already running", "collapsed"),
+    ("single_flight_timeouts_total", "Reads that gave up waiting for an identical read", "timeouts"),
+    ("single_flight_errors_total", "Loads that failed (the error goes to every waiting read)", "errors"),
+)
+
+
+def collect_single_flight():
+    flights = (recipe_flights, tag_flights)
+    return [
+        (name, "counter", help, [({"flight": flight.name}, getattr(flight, attribute)) for flight in flights])
+        for name, help, attribute in SINGLE_FLIGHT_COUNTERS
+    ]
+
+
+metrics.registry.add_collector(collect_single_flight)
+
+
+def collect_catalog_snapshot():
+    snapshot = catalog_snapshot.snapshot
+    status = catalog_snapshot.status()
+    families = [
+        ("catalog_snapshot_hits_total", "counter", "Requests served from the catalog snapshot", [
+            ({}, catalog_snapshot.hits),
+        ]),
+        ("catalog_snapshot_builds_total", "counter", "Catalog snapshots built by this worker", [
+            ({"kind": kind}, count) for kind, count in status["builds"].items()
+        ]),
+        ("catalog_snapshot_dirty_recipes", "gauge", "Changed recipes not served from the snapshot yet (-1: all)", [
+            ({}, -1 if status["dirty_recipes"] == "all" else status["dirty_recipes"]),
+        ]),
+    ]
+    if snapshot is not None:
+        families += [
+            ("catalog_snapshot_recipes", "gauge", "Recipes in the mapped catalog snapshot", [({}, snapshot.count)]),
+            ("catalog_snapshot_bytes", "gauge", "Size of the mapped catalog snapshot", [({}, snapshot.size)]),
+            ("catalog_snapshot_age_seconds", "gauge", "Time since the mapped snapshot was built", [
+                ({}, time.time() - snapshot.built_at),
+            ]),
+        ]
+    return families
+
+
+if catalog_snapshot is not None:
+    metrics.registry.add_collector(collect_catalog_snapshot)
+
+
+def collect_card_index():
+    status = card_index.status()
+    return [
+        ("recipe_card_index_recipes", "gauge", "Recipes in the in-memory card index", [({}, status["recipes"])]),
+        ("recipe_card_index_bytes", "gauge", "Memory held by the card index arrays and strings", [({}, status["bytes"])]),
+        ("recipe_card_index_bytes_per_recipe", "gauge", "Card index memory per recipe", [
+            ({}, status["bytes_per_recipe"] or 0),
+        ]),
+    ]
+
+
+if card_index is not None:
+    metrics.registry.add_collector(collect_card_index)
+
+# ------------------------ GET Routes ------------------------
+
+@router.get("/metrics", response_class=PlainTextResponse)
+async def get_metrics():
+    """
+    Request, database and cache metrics in the Prometheus text format.
+    """
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
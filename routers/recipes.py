@@ -14,102 +14,392 @@ router = APIRouter()
 # ------------------------ GET Routes ------------------------
 
 # routers/recipes.py
-from fastapi import APIRouter, Depends, HTTPException
+import json
+
+from fastapi import APIRouter, Depends, Header, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import and_, select
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
+
+from models import Recipe, RecipeIngredient, Ingredient, Category, Tag, RecipeStep, NutritionFacts
+from schemas.recipes import RecipeCreate, RecipeUpdate, RecipeScaleRequest
+from database import get_db, get_async_db, USE_ASYNC_DB, SessionLocal, AsyncSessionLocal
+from services.scaling import scale_recipe
+from services.serializers import RECIPE_DOCUMENT_OPTIONS, recipe_card
+from services.units import to_minutes, parse_grams, parse_kcal, parse_quantity
+from services.profiling import ProfilingRoute
+from services.request_stats import TimedJSONResponse
+from services.card_index import card_index
+from services.catalog_snapshot import catalog_snapshot
+from services.document_loader import load_document, load_document_async, load_documents, load_documents_async
+from services.document_table import accepts_gzip, load_stored, load_stored_async
+from services.sql_documents import json_array, load_json, load_json_async
+from services.vocabulary import category_vocabulary, tag_vocabulary
+from services.streaming import count_statement, exceeds_memory_ceiling, stream_recipe_list, stream_recipe_list_async
+from settings import settings
+
+# Requests sending the profile token header run under the profiler
+router = APIRouter(route_class=ProfilingRoute)
 
-from models import Recipe, Ingredient, Category, Tag, RecipeStep, NutritionFacts
-from schemas.recipes import RecipeCreate, RecipeUpdate
-from database import get_db
+# ------------------------ GET Routes ------------------------
 
-router = APIRouter()
+# Sort keys accepted by GET /recipes/, mapped to indexed columns
+RECIPE_SORT_KEYS = {
+    "id": Recipe.id,
+    "title": Recipe.title,
+    "total_time": Recipe.total_time_minutes,
+    "servings": Recipe.servings,
+    "calories": NutritionFacts.calories_per_serving,
+}
+
+class RecipeListFilters:
+    """
+    Range filters and sort keys accepted by GET /recipes/.
+    """
+
+    def __init__(
+        self,
+        min_total_minutes: Optional[int] = Query(None, ge=0),
+        max_total_minutes: Optional[int] = Query(None, ge=0),
+        min_servings: Optional[int] = Query(None, ge=0),
+        max_servings: Optional[int] = Query(None, ge=0),
+        min_calories: Optional[float] = Query(None, ge=0, description="Per serving"),
+        max_calories: Optional[float] = Query(None, ge=0, description="Per serving"),
+        sort: Literal["id", "title", "total_time", "servings", "calories"] = "id",
+        order: Literal["asc", "desc"] = "asc",
+    ):
+        self.min_total_minutes = min_total_minutes
+        self.max_total_minutes = max_total_minutes
+        self.min_servings = min_servings
+        self.max_servings = max_servings
+        self.min_calories = min_calories
+        self.max_calories = max_calories
+        self.sort = sort
+        self.order = order
+
+
+def recipe_list_statement(filters: RecipeListFilters):
+    """
+    Build the SELECT for GET /recipes/. Optional range filters and sort keys run
+    against the normalized, indexed columns.
+    """
+    return filter_recipe_list(select(Recipe).options(*RECIPE_DOCUMENT_OPTIONS), filters)
+
+
+def recipe_list_ids_statement(filters: RecipeListFilters):
+    """
+    The ids GET /recipes/ lists, in order; their documents come through the caches.
+    """
+    return filter_recipe_list(select(Recipe.id), filters)
+
+
+def filter_recipe_list(stmt, filters: RecipeListFilters):
+    stmt = stmt.where(Recipe.deleted.is_(False))
+
+    if filters.min_total_minutes is not None:
+        stmt = stmt.where(Recipe.total_time_minutes >= filters.min_total_minutes)
+    if filters.max_total_minutes is not None:
+        stmt = stmt.where(Recipe.total_time_minutes <= filters.max_total_minutes)
+    if filters.min_servings is not None:
+        stmt = stmt.where(Recipe.servings >= filters.min_servings)
+    if filters.max_servings is not None:
+        stmt = stmt.where(Recipe.servings <= filters.max_servings)
+
+    # Only join nutrition facts when the request filters or sorts on them
+    if filters.min_calories is not None or filters.max_calories is not None or filters.sort == "calories":
+        stmt = stmt.join(NutritionFacts, NutritionFacts.recipe_id == Recipe.id).where(
+            NutritionFacts.deleted.is_(False)
+        )
+        if filters.min_calories is not None:
+            stmt = stmt.where(NutritionFacts.calories_per_serving >= filters.min_calories)
+        if filters.max_calories is not None:
+            stmt = stmt.where(NutritionFacts.calories_per_serving <= filters.max_calories)
+
+    sort_column = RECIPE_SORT_KEYS[filters.sort]
+    if filters.order == "desc":
+        return stmt.order_by(sort_column.desc(), Recipe.id.desc())
+    return stmt.order_by(sort_column.asc(), Recipe.id.asc())
+
+
+def encoded_recipe_list(documents: dict, recipe_ids):
+    # Documents encoded by the database, joined in listing order
+    body = json_array([documents[recipe_id] for recipe_id in recipe_ids if recipe_id in documents])
+    return Response(b'{"recipes":' + body + b"}", media_type="application/json")
+
+
+def get_recipes(filters: RecipeListFilters = Depends(), db: Session = Depends(get_db)):
+    """
+    Retrieve all recipes, including their details. Listings estimated above
+    RESPONSE_MEMORY_CEILING_MB are streamed in batches instead of built whole.
+    """
+    stmt = recipe_list_statement(filters)
+    recipe_ids = None
+    if card_index is not None:
+        # Filter and sort in memory; only the documents come from the caches or the database
+        card_index.ensure_current()
+        recipe_ids = card_index.ordered_ids(filters)
+    if settings.response_memory_ceiling_mb and exceeds_memory_ceiling(
+        len(recipe_ids) if recipe_ids is not None else db.scalar(count_statement(stmt))
+    ):
+        return stream_recipe_list(stmt, SessionLocal)
+    if recipe_ids is None:
+        recipe_ids = db.scalars(recipe_list_ids_statement(filters)).all()
+    if "list" in settings.sql_json_endpoint_names:
+        return encoded_recipe_list(load_json(db, recipe_ids), recipe_ids)
+    return {"recipes": load_documents(db, recipe_ids)}
+
+async def get_recipes_async(filters: RecipeListFilters = Depends(), db: AsyncSession = Depends(get_async_db)):
+    """
+    Retrieve all recipes, including their details. Listings estimated above
+    RESPONSE_MEMORY_CEILING_MB are streamed in batches instead of built whole.
+    """
+    stmt = recipe_list_statement(filters)
+    recipe_ids = None
+    if card_index is not None:
+        if not card_index.current:
+            await run_in_threadpool(card_index.ensure_current)
+        recipe_ids = card_index.ordered_ids(filters)
+    if settings.response_memory_ceiling_mb and exceeds_memory_ceiling(
+        len(recipe_ids) if recipe_ids is not None else await db.scalar(count_statement(stmt))
+    ):
+        return stream_recipe_list_async(stmt, AsyncSessionLocal)
+    if recipe_ids is None:
+        recipe_ids = (await db.scalars(recipe_list_ids_statement(filters))).all()
+    if "list" in settings.sql_json_endpoint_names:
+        return encoded_recipe_list(await load_json_async(db, recipe_ids), recipe_ids)
+    return {"recipes": await load_documents_async(db, recipe_ids)}
+
+router.add_api_route("/", get_recipes_async if USE_ASYNC_DB else get_recipes, methods=["GET"])
+
+
+def recipe_cards_statement(offset: int, limit: int):
+    return (
+        select(
+            Recipe.id, Recipe.title, Recipe.image, Recipe.total_time_minutes, Recipe.servings,
+            NutritionFacts.calories_per_serving,
+        )
+        .outerjoin(NutritionFacts, and_(NutritionFacts.recipe_id == Recipe.id, NutritionFacts.deleted.is_(False)))
+        .where(Recipe.deleted.is_(False))
+        .order_by(Recipe.id)
+        .offset(offset)
+        .limit(limit)
+    )
 
-# ------------------------ GET Routes ------------------------
 
-@router.get("/")
-def get_recipes(db: Session = Depends(get_db)):
+def snapshot_cards(offset: int, limit: int):
+    # Cards from the catalog snapshot, already encoded, when it is current
+    cards = catalog_snapshot.cards(offset, limit) if catalog_snapshot is not None else None
+    if cards is None:
+        return None
+    return Response(b'{"cards":' + cards + b"}", media_type="application/json")
+
+
+def get_recipe_cards(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    db: Session = Depends(get_db),
+):
+    """
+    Recipe summaries for listing pages, in id order.
+    """
+    response = snapshot_cards(offset, limit)
+    if response is not None:
+        return response
+    if card_index is not None:
+        card_index.ensure_current()
+        return {"cards": [card.as_dict() for card in card_index.page(offset, limit)]}
+    return {"cards": [recipe_card(*row) for row in db.execute(recipe_cards_statement(offset, limit))]}
+
+async def get_recipe_cards_async(
+    offset: int = Query(0, ge=0),
+    limit: int = Query(50, ge=1, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
     """
-    Retrieve all recipes, including their details.
+    Recipe summaries for listing pages, in id order.
     """
-    recipes = db.query(Recipe).filter(Recipe.deleted.is_(False)).all()
+    response = snapshot_cards(offset, limit)
+    if response is not None:
+        return response
+    if card_index is not None:
+        if not card_index.current:
+            await run_in_threadpool(card_index.ensure_current)
+        return {"cards": [card.as_dict() for card in card_index.page(offset, limit)]}
+    return {"cards": [recipe_card(*row) for row in await db.execute(recipe_cards_statement(offset, limit))]}
+
+router.add_api_route("/cards", get_recipe_cards_async if USE_ASYNC_DB else get_recipe_cards, methods=["GET"])
+
+@router.get("/nearest-macros")
+def get_nearest_macros(
+    calories: Optional[float] = Query(None, ge=0),
+    protein: Optional[float] = Query(None, ge=0),
+    fat: Optional[float] = Query(None, ge=0),
+    carbohydrates: Optional[float] = Query(None, ge=0),
+    k: int = Query(5, ge=1, le=100),
+    db: Session = Depends(get_db),
+):
+    """
+    Find the k recipes whose per-serving macros are closest to the target profile.
+    Only the macros given in the query are compared.
+    """
+    target = {
+        "calories": calories,
+        "protein": protein,
+        "fat": fat,
+        "carbohydrates": carbohydrates,
+    }
+    if all(value is None for value in target.values()):
+        raise HTTPException(
+            status_code=400,
+            detail="Provide at least one of calories, protein, fat or carbohydrates",
+        )
+
+    # NumPy is only loaded once the macro index is needed
+    from services.nutrition_index import nutrition_index
+
+    matches = nutrition_index.nearest(db, target, k)
+    recipes = {
+        recipe.id: recipe
+        for recipe in db.query(Recipe).filter(Recipe.id.in_([m[0] for m in matches])).all()
+    }
     return {
         "recipes": [
             {
-                "id": recipe.id,
-                "title": recipe.title,
-                "prep_time_value": recipe.prep_time_value,
-                "prep_time_unit": recipe.prep_time_unit,
-                "cook_time_value": recipe.cook_time_value,
-                "cook_time_unit": recipe.cook_time_unit,
-                "servings": recipe.servings,
-                "image": recipe.image,
-                "instructions": [
-                    {"step_number": step.step_number, "instruction": step.instruction}
-                    for step in recipe.instructions if not step.deleted
-                ],
-                "nutrition_facts": {
-                    "calories": recipe.nutrition_facts.calories,
-                    "fat": recipe.nutrition_facts.fat,
-                    "carbohydrates": recipe.nutrition_facts.carbohydrates,
-                    "protein": recipe.nutrition_facts.protein,
-                } if recipe.nutrition_facts else None,
-                "ingredients": [
-                    {
-                        "item": ingredient.item,
-                        "quantity": ingredient.quantity,
-                        "notes": ingredient.notes,
-                        "price": ingredient.price,
-                        "currency": ingredient.currency,
-                    }
-                    for ingredient in recipe.ingredients
-                ],
-                "categories": [category.name for category in recipe.categories],
-                "tags": [tag.name for tag in recipe.tags],
+                "id": recipe_id,
+                "title": recipes[recipe_id].title,
+                "servings": recipes[recipe_id].servings,
+                "image": recipes[recipe_id].image,
+                "per_serving": per_serving,
+                "distance": round(distance, 4),
             }
-            for recipe in recipes
+            for recipe_id, per_serving, distance in matches
+            if recipe_id in recipes
         ]
     }
 
-@router.get("/{id}")
-def get_recipe_by_id(id: int, db: Session = Depends(get_db)):
+def recipe_document(document: Optional[dict], servings: Optional[int]):
     """
-    Retrieve a single recipe by its ID.
+    Render a recipe for GET /recipes/{id}, optionally rescaled to a number of servings.
     """
-    recipe = db.query(Recipe).filter(Recipe.id == id, Recipe.deleted.is_(False)).first()
-    if not recipe:
+    if not document:
         raise HTTPException(status_code=404, detail="Recipe not found")
 
+    if servings is None:
+        return document
+    try:
+        return scale_recipe(document, servings)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+def encoded_document(document: Optional[bytes], servings: Optional[int]):
+    """
+    Like recipe_document, for a recipe already encoded as JSON: sent as it is unless rescaled.
+    """
+    if document is not None and servings is None:
+        return Response(document, media_type="application/json")
+    return recipe_document(json.loads(document) if document is not None else None, servings)
+
+
+def snapshot_document(id: int, servings: Optional[int]):
+    # The recipe from the catalog snapshot, already encoded, when it is current there
+    document = catalog_snapshot.document(id) if catalog_snapshot is not None else None
+    if document is None:
+        return None
+    return encoded_document(document, servings)
+
+
+def stored_document(document: Optional[bytes], compressed: bool, servings: Optional[int]):
+    # The recipe from the recipe_documents table; None when it has no row there yet.
+    # Every response says it varies, so a cache never hands the gzip copy to a client that did not ask for it
+    if document is None:
+        return None
+    vary = {"Vary": "Accept-Encoding"}
+    if compressed:
+        return Response(document, media_type="application/json", headers={"Content-Encoding": "gzip", **vary})
+    if servings is None:
+        return Response(document, media_type="application/json", headers=vary)
+    return TimedJSONResponse(recipe_document(json.loads(document), servings), headers=vary)
+
+
+def recipe_by_id_statement(id: int):
+    return (
+        select(Recipe)
+        .options(*RECIPE_DOCUMENT_OPTIONS)
+        .where(Recipe.id == id, Recipe.deleted.is_(False))
+    )
+
+
+def get_recipe_by_id(
+    id: int,
+    servings: Optional[int] = Query(None, gt=0, le=1000),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: Session = Depends(get_db),
+):
+    """
+    Retrieve a single recipe by its ID, optionally rescaled to a number of servings.
+    """
+    response = snapshot_document(id, servings)
+    if response is not None:
+        return response
+    if settings.recipe_document_table:
+        # The gzip copy goes out as it is when the client takes gzip and nothing is rescaled
+        compressed = servings is None and accepts_gzip(accept_encoding)
+        response = stored_document(load_stored(db, id, compressed), compressed, servings)
+        if response is not None:
+            return response
+    if "recipe" in settings.sql_json_endpoint_names:
+        return encoded_document(load_json(db, [id]).get(id), servings)
+    document = load_document(db, id, recipe_by_id_statement(id))
+    return recipe_document(document, servings)
+
+async def get_recipe_by_id_async(
+    id: int,
+    servings: Optional[int] = Query(None, gt=0, le=1000),
+    accept_encoding: Optional[str] = Header(None, include_in_schema=False),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve a single recipe by its ID, optionally rescaled to a number of servings.
+    """
+    response = snapshot_document(id, servings)
+    if response is not None:
+        return response
+    if settings.recipe_document_table:
+        # The gzip copy goes out as it is when the client takes gzip and nothing is rescaled
+        compressed = servings is None and accepts_gzip(accept_encoding)
+        response = stored_document(await load_stored_async(db, id, compressed), compressed, servings)
+        if response is not None:
+            return response
+    if "recipe" in settings.sql_json_endpoint_names:
+        return encoded_document((await load_json_async(db, [id])).get(id), servings)
+    document = await load_document_async(id, recipe_by_id_statement(id))
+    return recipe_document(document, servings)
+
+router.add_api_route("/{id}", get_recipe_by_id_async if USE_ASYNC_DB else get_recipe_by_id, methods=["GET"])
+
+@router.post("/scale")
+def scale_recipes(request: RecipeScaleRequest, db: Session = Depends(get_db)):
+    """
+    Rescale several recipes at once; each entry gives a recipe ID and target servings.
+    """
+    ids = {entry.recipe_id for entry in request.recipes}
+    documents = {document["id"]: document for document in load_documents(db, sorted(ids))}
+    scaled = []
+    for entry in request.recipes:
+        document = documents.get(entry.recipe_id)
+        if document is None:
+            continue
+        try:
+            scaled.append(scale_recipe(document, entry.servings))
+        except ValueError as exc:
+            raise HTTPException(status_code=400, detail=f"Recipe {entry.recipe_id}: {exc}")
+
     return {
-        "id": recipe.id,
-        "title": recipe.title,
-        "prep_time_value": recipe.prep_time_value,
-        "prep_time_unit": recipe.prep_time_unit,
-        "cook_time_value": recipe.cook_time_value,
-        "cook_time_unit": recipe.cook_time_unit,
-        "servings": recipe.servings,
-        "image": recipe.image,
-        "instructions": [
-            {"step_number": step.step_number, "instruction": step.instruction}
-            for step in recipe.instructions if not step.deleted
-        ],
-        "nutrition_facts": {
-            "calories": recipe.nutrition_facts.calories,
-            "fat": recipe.nutrition_facts.fat,
-            "carbohydrates": recipe.nutrition_facts.carbohydrates,
-            "protein": recipe.nutrition_facts.protein,
-        } if recipe.nutrition_facts else None,
-        "ingredients": [
-            {
-                "item": ingredient.item,
-                "quantity": ingredient.quantity,
-                "notes": ingredient.notes,
-                "price": ingredient.price,
-                "currency": ingredient.currency,
-            }
-            for ingredient in recipe.ingredients
-        ],
-        "categories": [category.name for category in recipe.categories],
-        "tags": [tag.name for tag in recipe.tags],
+        "recipes": scaled,
+        "missing_recipe_ids": sorted(ids - set(documents)),
     }
 
 
@@ -125,6 +415,18 @@ def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db)):
     if existing_recipe:
         raise HTTPException(status_code=400, detail="Recipe already exists")
 
+    # Parse times and nutrition values into numbers once, at write time
+    try:
+        total_time = to_minutes(recipe.prep_time_value, recipe.prep_time_unit) + to_minutes(
+            recipe.cook_time_value, recipe.cook_time_unit
+        )
+        calories = parse_kcal(recipe.nutrition_facts.calories)
+        fat = parse_grams(recipe.nutrition_facts.fat)
+        carbohydrates = parse_grams(recipe.nutrition_facts.carbohydrates)
+        protein = parse_grams(recipe.nutrition_facts.protein)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
     # Create a new recipe instance with the normalized title
     new_recipe = Recipe(
         title=normalized_title,
@@ -132,16 +434,20 @@ def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db)):
         prep_time_unit=recipe.prep_time_unit,
         cook_time_value=recipe.cook_time_value,
         cook_time_unit=recipe.cook_time_unit,
+        total_time_minutes=round(total_time),
         servings=recipe.servings,
         image=recipe.image,
     )
 
     # Add nutrition facts
     new_nutrition_facts = NutritionFacts(
-        calories=recipe.nutrition_facts.calories,
-        fat=recipe.nutrition_facts.fat,
-        carbohydrates=recipe.nutrition_facts.carbohydrates,
-        protein=recipe.nutrition_facts.protein,
+        calories=calories,
+        fat=fat,
+        carbohydrates=carbohydrates,
+        protein=protein,
+        calories_per_serving=(
+            calories / recipe.servings if calories is not None and recipe.servings > 0 else None
+        ),
         recipe=new_recipe
     )
     new_recipe.nutrition_facts = new_nutrition_facts
@@ -155,31 +461,42 @@ def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db)):
         )
         new_recipe.instructions.append(new_step)
 
-    # Normalize and add ingredients with checks
+    # Normalize and add ingredients with checks. The ingredient row is shared
+    # vocabulary; quantity and notes are stored per recipe on the link.
+    linked_items = set()
     for ingredient_data in recipe.ingredients:
         normalized_item = ingredient_data.item.strip().capitalize()
-        existing_ingredient = db.query(Ingredient).filter(
+        if normalized_item.lower() in linked_items:
+            raise HTTPException(
+                status_code=400, detail=f"Ingredient '{normalized_item}' is listed more than once"
+            )
+        linked_items.add(normalized_item.lower())
+
+        ingredient = db.query(Ingredient).filter(
             Ingredient.item.ilike(normalized_item)
         ).first()
-        if existing_ingredient:
-            new_recipe.ingredients.append(existing_ingredient)
-        else:
-            new_ingredient = Ingredient(
+        if not ingredient:
+            ingredient = Ingredient(
                 item=normalized_item,
-                quantity=ingredient_data.quantity,
-                notes=ingredient_data.notes,
                 price=ingredient_data.price,
                 currency=ingredient_data.currency
             )
-            db.add(new_ingredient)
-            new_recipe.ingredients.append(new_ingredient)
+            db.add(ingredient)
+
+        # Parse the quantity once here so reads and aggregations never re-parse it
+        parsed = parse_quantity(ingredient_data.quantity)
+        new_recipe.ingredient_links.append(RecipeIngredient(
+            ingredient=ingredient,
+            quantity=ingredient_data.quantity,
+            quantity_value=parsed[0] if parsed else None,
+            quantity_unit=parsed[1] if parsed else None,
+            notes=ingredient_data.notes,
+        ))
 
     # Normalize and add categories with checks
     for category_data in recipe.categories:
         normalized_category = category_data.name.strip().capitalize()
-        existing_category = db.query(Category).filter(
-            Category.name.ilike(normalized_category)
-        ).first()
+        existing_category = category_vocabulary.find(db, normalized_category)
         if existing_category:
             new_recipe.categories.append(existing_category)
         else:
@@ -190,7 +507,7 @@ def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db)):
     # Normalize and add tags with checks
     for tag_data in recipe.tags:
         normalized_tag = tag_data.name.strip().capitalize()
-        existing_tag = db.query(Tag).filter(Tag.name.ilike(normalized_tag)).first()
+        existing_tag = tag_vocabulary.find(db, normalized_tag)
         if existing_tag:
             new_recipe.tags.append(existing_tag)
         else:
@@ -202,94 +519,14 @@ def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db)):
     db.add(new_recipe)
     db.commit()
     db.refresh(new_recipe)
+    for category in new_recipe.categories:
+        category_vocabulary.remember(category)
+    for tag in new_recipe.tags:
+        tag_vocabulary.remember(tag)
 
-    return {"message": f"Recipe added: {new_recipe.title}"}
-
+    # Keep the in-memory macro index in step with the database
+    from services.nutrition_index import nutrition_index
 
-# ------------------------ PUT Route ------------------------
-
-@router.post("/")
-def create_recipe(recipe: RecipeCreate, db: Session = Depends(get_db)):
-    # Check if the recipe already exists
-    existing_recipe = db.query(Recipe).filter(Recipe.title.ilike(recipe.title)).first()
-    if existing_recipe:
-        raise HTTPException(status_code=400, detail="Recipe already exists")
-
-    # Create a new recipe instance
-    new_recipe = Recipe(
-        title=recipe.title,
-        prep_time_value=recipe.prep_time_value,
-        prep_time_unit=recipe.prep_time_unit,
-        cook_time_value=recipe.cook_time_value,
-        cook_time_unit=recipe.cook_time_unit,
-        servings=recipe.servings,
-        image=recipe.image,
-    )
-
-    # Add nutrition facts
-    new_nutrition_facts = NutritionFacts(
-        calories=recipe.nutrition_facts.calories,
-        fat=recipe.nutrition_facts.fat,
-        carbohydrates=recipe.nutrition_facts.carbohydrates,
-        protein=recipe.nutrition_facts.protein,
-        recipe=new_recipe
-    )
-    new_recipe.nutrition_facts = new_nutrition_facts
-
-    # Add instructions
-    for step in recipe.instructions:
-        new_step = RecipeStep(
-            step_number=step.step_number, 
-            instruction=step.instruction, 
-            recipe=new_recipe
-        )
-        new_recipe.instructions.append(new_step)
-
-    # Add ingredients with checks
-    for ingredient_data in recipe.ingredients:
-        existing_ingredient = db.query(Ingredient).filter(
-            Ingredient.item == ingredient_data.item
-        ).first()
-        if existing_ingredient:
-            new_recipe.ingredients.append(existing_ingredient)
-        else:
-            new_ingredient = Ingredient(
-                item=ingredient_data.item,
-                quantity=ingredient_data.quantity,
-                notes=ingredient_data.notes,
-                price=ingredient_data.price,
-                currency=ingredient_data.currency
-            )
-            db.add(new_ingredient)
-            new_recipe.ingredients.append(new_ingredient)
-
-    # Add categories with checks
-    for category_data in recipe.categories:
-        existing_category = db.query(Category).filter(
-            Category.name == category_data.name
-        ).first()
-        if existing_category:
-            new_recipe.categories.append(existing_category)
-        else:
-            new_category = Category(name=category_data.name)
-            db.add(new_category)
-            new_recipe.categories.append(new_category)
-
-    # Add tags with checks
-    for tag_data in recipe.tags:
-        existing_tag = db.query(Tag).filter(
-            Tag.name == tag_data.name
-        ).first()
-        if existing_tag:
-            new_recipe.tags.append(existing_tag)
-        else:
-            new_tag = Tag(name=tag_data.name)
-            db.add(new_tag)
-            new_recipe.tags.append(new_tag)
-
-    # Add the new recipe to the session and commit
-    db.add(new_recipe)
-    db.commit()
-    db.refresh(new_recipe)
+    nutrition_index.upsert(new_recipe)
 
     return {"message": f"Recipe added: {new_recipe.title}"}
@@ -0,0 +1,110 @@
+# routers/shopping_list.py
+from collections import defaultdict
+
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import case, func
+from sqlalchemy.orm import Session
+
+from models import Recipe, Ingredient, RecipeIngredient
+from schemas.shopping_list import ShoppingListRequest
+from database import get_db
+from services.currency import convert
+
+router = APIRouter()
+
+# ------------------------ POST Route ------------------------
+
+@router.post("/")
+def create_shopping_list(request: ShoppingListRequest, db: Session = Depends(get_db)):
+    """
+    Merge the ingredients of several recipes, scaled by each recipe's serving multiplier,
+    with quantities summed per unit and the total cost in the requested currency.
+    """
+    currency = request.currency.upper()
+    multipliers = defaultdict(float)
+    for entry in request.recipes:
+        multipliers[entry.recipe_id] += entry.servings_multiplier
+
+    # One grouped query: amounts summed per ingredient and unit, with the
+    # multiplier total kept alongside for the cost roll-up
+    multiplier = case(multipliers, value=RecipeIngredient.recipe_id, else_=0.0)
+    parsed = RecipeIngredient.quantity_value.isnot(None)
+    rows = (
+        db.query(
+            Ingredient.id,
+            Ingredient.item,
+            Ingredient.price,
+            Ingredient.currency,
+            RecipeIngredient.quantity_unit,
+            parsed.label("parsed"),
+            func.sum(RecipeIngredient.quantity_value * multiplier).label("amount"),
+            func.sum(multiplier).label("multiplier"),
+        )
+        .join(RecipeIngredient, RecipeIngredient.ingredient_id == Ingredient.id)
+        .join(Recipe, Recipe.id == RecipeIngredient.recipe_id)
+        .filter(Recipe.id.in_(multipliers), Recipe.deleted.is_(False))
+        .group_by(
+            Ingredient.id, Ingredient.item, Ingredient.price, Ingredient.currency,
+            RecipeIngredient.quantity_unit, parsed,
+        )
+        .order_by(Ingredient.item)
+        .all()
+    )
+
+    # Quantities that could not be parsed on write are passed through as text
+    unparsed = defaultdict(list)
+    if any(not row.parsed for row in rows):
+        for item, quantity, recipe_multiplier in (
+            db.query(Ingredient.item, RecipeIngredient.quantity, multiplier)
+            .join(RecipeIngredient, RecipeIngredient.ingredient_id == Ingredient.id)
+            .join(Recipe, Recipe.id == RecipeIngredient.recipe_id)
+            .filter(Recipe.id.in_(multipliers), Recipe.deleted.is_(False), ~parsed)
+        ):
+            if quantity:
+                unparsed[item].append({"quantity": quantity, "multiplier": recipe_multiplier})
+
+    found = {
+        recipe_id for (recipe_id,) in
+        db.query(Recipe.id).filter(Recipe.id.in_(multipliers), Recipe.deleted.is_(False))
+    }
+    missing = sorted(set(multipliers) - found)
+    if len(missing) == len(multipliers):
+        raise HTTPException(status_code=404, detail="Recipes not found")
+
+    items = {}
+    total_cost = 0.0
+    unpriced = []
+    for row in rows:
+        entry = items.setdefault(
+            row.item, {"item": row.item, "quantities": {}, "unparsed": unparsed[row.item], "cost": None}
+        )
+        if row.parsed:
+            entry["quantities"][row.quantity_unit] = row.amount
+
+        if row.price is not None:
+            cost = convert(row.price * row.multiplier, row.currency, currency)
+            if cost is None:
+                if row.item not in unpriced:
+                    unpriced.append(row.item)
+            else:
+                entry["cost"] = round((entry["cost"] or 0.0) + cost, 2)
+                total_cost += cost
+
+    return {
+        "currency": currency,
+        "items": [
+            {
+                "item": entry["item"],
+                "quantities": [
+                    {"amount": round(amount, 3), "unit": unit}
+                    for unit, amount in entry["quantities"].items()
+                ],
+                "unparsed": entry["unparsed"],
+                "cost": entry["cost"],
+            }
+            for entry in items.values()
+        ],
+        "total_cost": round(total_cost, 2),
+        "unpriced_items": unpriced,
+        "missing_recipe_ids": missing,
+    }
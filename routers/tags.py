@@ -1,37 +1,82 @@
 from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from typing import List
 
 # Import necessary models and schemas
 from models import Tag
 from schemas.tags import TagCreate, TagUpdate, TagResponse
-from database import get_db
+from database import get_db, USE_ASYNC_DB, AsyncSessionLocal
+from services.profiling import ProfilingRoute
+from services.single_flight import tag_flights
+from services.vocabulary import tag_vocabulary
 
-# Define the APIRouter instance
-router = APIRouter()
+# Define the APIRouter instance; requests sending the profile token header run under the profiler
+router = APIRouter(route_class=ProfilingRoute)
 
 # ------------------------ GET All Tags ------------------------
 
-@router.get("/", response_model=List[TagResponse])
+def tag_dict(tag):
+    # Plain values, since results shared between requests outlive the loading session
+    return {"id": tag.id, "name": tag.name}
+
+
 def get_all_tags(db: Session = Depends(get_db)):
     """
     Retrieve all tags.
     """
-    tags = db.query(Tag).all()
-    return tags
+    return tag_flights.do(tag_flights.key("all"), lambda: [tag_dict(tag) for tag in db.query(Tag).all()])
+
+async def get_all_tags_async():
+    """
+    Retrieve all tags.
+    """
+    async def load():
+        # A session of its own: the flight outlives a cancelled leader, whose session would be closed
+        async with AsyncSessionLocal() as db:
+            return [tag_dict(tag) for tag in (await db.scalars(select(Tag))).all()]
+
+    return await tag_flights.do_async(tag_flights.key("all"), load)
+
+router.add_api_route(
+    "/", get_all_tags_async if USE_ASYNC_DB else get_all_tags,
+    methods=["GET"], response_model=List[TagResponse],
+)
 
 # ------------------------ GET Tag by ID ------------------------
 
-@router.get("/{tag_id}", response_model=TagResponse)
 def get_tag_by_id(tag_id: int, db: Session = Depends(get_db)):
     """
     Retrieve a specific tag by ID.
     """
-    tag = db.query(Tag).filter(Tag.id == tag_id).first()
+    def load():
+        tag = db.query(Tag).filter(Tag.id == tag_id).first()
+        return tag_dict(tag) if tag else None
+
+    tag = tag_flights.do(tag_flights.key(tag_id), load)
     if not tag:
         raise HTTPException(status_code=404, detail="Tag not found")
     return tag
 
+async def get_tag_by_id_async(tag_id: int):
+    """
+    Retrieve a specific tag by ID.
+    """
+    async def load():
+        async with AsyncSessionLocal() as db:
+            tag = await db.get(Tag, tag_id)
+        return tag_dict(tag) if tag else None
+
+    tag = await tag_flights.do_async(tag_flights.key(tag_id), load)
+    if not tag:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return tag
+
+router.add_api_route(
+    "/{tag_id}", get_tag_by_id_async if USE_ASYNC_DB else get_tag_by_id,
+    methods=["GET"], response_model=TagResponse,
+)
+
 # ------------------------ POST Route ------------------------
 
 @router.post("/", response_model=TagResponse, status_code=201)
@@ -43,7 +88,7 @@ def create_tag(tag: TagCreate, db: Session = Depends(get_db)):
     normalized_name = tag.name.strip().capitalize()
 
     # Check if the tag already exists (case-insensitive search)
-    existing_tag = db.query(Tag).filter(Tag.name.ilike(normalized_name)).first()
+    existing_tag = tag_vocabulary.find(db, normalized_name)
     if existing_tag:
         return existing_tag
 
@@ -52,6 +97,7 @@ def create_tag(tag: TagCreate, db: Session = Depends(get_db)):
     db.add(new_tag)
     db.commit()
     db.refresh(new_tag)
+    tag_vocabulary.remember(new_tag)
 
     return new_tag
 
@@ -80,8 +126,11 @@ def update_tag(tag_id: int, tag_update: TagUpdate, db: Session = Depends(get_db)
 
         existing_tag.name = normalized_name
 
+    # Committing evicts the old name from the caches here and in the other
+    # workers (services/invalidation.py)
     db.commit()
     db.refresh(existing_tag)
+    tag_vocabulary.remember(existing_tag)
     return existing_tag
 
 # ------------------------ DELETE Route ------------------------
@@ -0,0 +1,23 @@
+# schemas/meal_plans.py
+from pydantic import BaseModel, Field
+from typing import List, Optional
+
+# Daily targets; macros left out are not optimized for
+class MealPlanTargets(BaseModel):
+    calories: float = Field(..., gt=0, example=2000)
+    protein: Optional[float] = Field(None, gt=0, example=120)
+    fat: Optional[float] = Field(None, gt=0, example=70)
+    carbohydrates: Optional[float] = Field(None, gt=0, example=220)
+
+# Schema for generating a meal plan
+class MealPlanRequest(BaseModel):
+    days: int = Field(7, ge=1, le=31)
+    meals_per_day: int = Field(3, ge=1, le=8)
+    daily_targets: MealPlanTargets
+    # Every recipe must carry all include_* names and none of the exclude_* names
+    include_tags: List[str] = []
+    exclude_tags: List[str] = []
+    include_categories: List[str] = []
+    exclude_categories: List[str] = []
+    time_budget_ms: int = Field(2000, ge=50, le=30000)
+    seed: Optional[int] = None
@@ -1,8 +1,11 @@
 # schemas/nutrition.py
 from pydantic import BaseModel, Field
+from typing import Union
 
+# Values may be plain numbers or strings with a unit ("10g", "500 mg", "250 kcal");
+# they are parsed to kcal / grams when the recipe is written.
 class NutritionFactsCreate(BaseModel):
-    calories: str = Field(..., example="250")
-    fat: str = Field(..., example="10g")
-    carbohydrates: str = Field(..., example="30g")
-    protein: str = Field(..., example="5g")
+    calories: Union[float, str] = Field(..., example="250")
+    fat: Union[float, str] = Field(..., example="10g")
+    carbohydrates: Union[float, str] = Field(..., example="30g")
+    protein: Union[float, str] = Field(..., example="5g")
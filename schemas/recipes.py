@@ -1,5 +1,5 @@
 # schemas/recipes.py
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from typing import List, Optional
 from schemas.ingredients import IngredientCreate
 from schemas.categories import CategoryCreate
@@ -36,3 +36,11 @@ class RecipeUpdate(BaseModel):
     ingredients: Optional[List[IngredientCreate]] = None
     categories: Optional[List[CategoryCreate]] = None
     tags: Optional[List[TagCreate]] = None
+
+# Schema for rescaling several recipes in one call
+class RecipeScaleItem(BaseModel):
+    recipe_id: int
+    servings: int = Field(..., gt=0, le=1000)
+
+class RecipeScaleRequest(BaseModel):
+    recipes: List[RecipeScaleItem] = Field(..., min_length=1, max_length=100)
@@ -0,0 +1,12 @@
+# schemas/shopping_list.py
+from pydantic import BaseModel, Field
+from typing import List
+
+class ShoppingListRecipe(BaseModel):
+    recipe_id: int = Field(..., example=1)
+    servings_multiplier: float = Field(1.0, gt=0, example=2)
+
+# Schema for building a shopping list across recipes
+class ShoppingListRequest(BaseModel):
+    recipes: List[ShoppingListRecipe] = Field(..., min_length=1)
+    currency: str = Field("USD", min_length=3, max_length=3, example="USD")
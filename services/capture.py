@@ -0,0 +1,120 @@
+# services/capture.py
+"""
+Sampled capture of live requests to JSONL, for replay with benchmarks/replay.py.
+
+Each line holds the request's time, method, route template, path, query
+parameters and JSON body, plus the response status and duration. Values under
+sensitive keys and anything that looks like an email address, phone number or
+card number are replaced before the line is written. Headers are not captured.
+Lines are written by a background thread so the event loop never blocks on
+the file.
+"""
+import atexit
+import json
+import os
+import queue
+import random
+import re
+import threading
+import time
+
+from settings import settings
+
+REDACTED = "[redacted]"
+
+# Keys whose values are always dropped, matched case-insensitively as substrings
+SENSITIVE_KEYS = ("password", "token", "secret", "email", "phone", "address", "authorization", "card", "ssn")
+
+_EMAIL = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+")
+_PHONE = re.compile(r"\+?\d[\d\s().-]{8,}\d")
+_CARD = re.compile(r"\b(?:\d[ -]?){13,19}\b")
+
+CAPTURED_METHODS = ("POST", "PUT", "PATCH", "DELETE")
+
+
+def _sensitive(key) -> bool:
+    key = str(key).lower()
+    return any(word in key for word in SENSITIVE_KEYS)
+
+
+def scrub(value):
+    """
+    Return a copy of a JSON-like value with personal data replaced.
+    """
+    if isinstance(value, dict):
+        return {key: REDACTED if _sensitive(key) else scrub(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [scrub(item) for item in value]
+    if isinstance(value, str):
+        value = _EMAIL.sub(REDACTED, value)
+        value = _CARD.sub(REDACTED, value)
+        return _PHONE.sub(REDACTED, value)
+    return value
+
+
+class CaptureWriter:
+    """
+    Appends scrubbed request records to a JSONL file from a background thread.
+    """
+
+    def __init__(self, path, sample_rate=1.0, max_body_bytes=65536):
+        self.path = path
+        self.sample_rate = sample_rate
+        self.max_body_bytes = max_body_bytes
+        self._queue = queue.SimpleQueue()
+        self._thread = None
+
+    def sample(self) -> bool:
+        return random.random() < self.sample_rate
+
+    def start(self):
+        if self._thread is not None:
+            return
+        directory = os.path.dirname(self.path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._thread = threading.Thread(target=self._write_forever, name="request-capture", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    def _write_forever(self):
+        with open(self.path, "a", buffering=1) as capture_file:
+            while True:
+                record = self._queue.get()
+                if record is None:
+                    return
+                capture_file.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def record(self, request, body: bytes, route, status, seconds):
+        """
+        Queue one finished request. `body` is the raw request body, or None.
+        """
+        payload = None
+        if body and len(body) <= self.max_body_bytes:
+            try:
+                payload = scrub(json.loads(body))
+            except ValueError:
+                payload = None
+        self._queue.put({
+            "ts": round(time.time(), 6),
+            "method": request.method,
+            "route": route,
+            "path": request.url.path,
+            "query": [[key, REDACTED if _sensitive(key) else scrub(value)]
+                      for key, value in request.query_params.multi_items()],
+            "body": payload,
+            "status": status,
+            "duration_ms": round(seconds * 1000, 3),
+        })
+
+
+capture_writer = CaptureWriter(
+    settings.capture_path, settings.capture_sample_rate, settings.capture_max_body_bytes,
+) if settings.capture_path else None
@@ -0,0 +1,364 @@
+# services/card_index.py
+"""
+Compact in-memory read model of recipe cards, for listings that never touch
+the database.
+
+ORM Recipe instances with their instance state cost kilobytes each. This
+keeps the columns GET /recipes/ filters and sorts on as parallel typed
+arrays sorted by id: id, total time, servings and calories per serving. The
+titles and image URLs are indexes into one table of interned strings. A
+recipe costs a few dozen bytes plus its text, and each distinct image URL is
+stored once. RecipeCard is a __slots__ record built from one row on demand.
+
+GET /recipes/ takes its ordered ids from here and fetches the documents
+through the caches (services/document_loader.py); GET /recipes/cards pages
+through the cards. The index is loaded on first use, and
+services/invalidation.py marks changed recipes stale; those are reloaded by
+id before the next query. Loads read from the primary, so a lagging replica
+cannot put old rows back.
+
+Titles sort by code point, as SQLite's default collation does; on PostgreSQL
+the database collation may order some titles differently. NULLs sort as the
+database sorts them.
+
+The index is on with RECIPE_CARD_INDEX=1. With several workers it needs
+INVALIDATION_BACKEND, since nothing else tells a worker about the recipes
+another one wrote.
+"""
+import math
+import sys
+import threading
+
+from sqlalchemy import and_, select
+
+import database
+from models import NutritionFacts, Recipe
+from services import invalidation
+from services.serializers import recipe_card
+from settings import settings
+
+# Stands for NULL in the integer columns, whose values are never negative
+MISSING = -1
+# Stale recipes reloaded per query
+RELOAD_BATCH_SIZE = 500
+
+# (attribute, dtype) of the parallel arrays, all indexed by row
+COLUMNS = (
+    ("_ids", "int64"),
+    ("_total_time", "int32"),
+    ("_servings", "int32"),
+    ("_calories", "float64"),
+    ("_has_facts", "bool"),
+    ("_titles", "int32"),
+    ("_images", "int32"),
+)
+
+
+def card_rows_statement(recipe_ids=None):
+    """
+    One row per live recipe: its card columns and whether it has live nutrition facts.
+    """
+    stmt = (
+        select(
+            Recipe.id, Recipe.title, Recipe.image, Recipe.total_time_minutes, Recipe.servings,
+            NutritionFacts.calories_per_serving, NutritionFacts.id.is_not(None),
+        )
+        .outerjoin(NutritionFacts, and_(NutritionFacts.recipe_id == Recipe.id, NutritionFacts.deleted.is_(False)))
+        .where(Recipe.deleted.is_(False))
+        .order_by(Recipe.id)
+    )
+    if recipe_ids is not None:
+        stmt = stmt.where(Recipe.id.in_(recipe_ids))
+    return stmt
+
+
+class RecipeCard:
+    """
+    One recipe's card, read from a row of the index.
+    """
+    __slots__ = ("id", "title", "image", "total_time_minutes", "servings", "calories_per_serving")
+
+    def __init__(self, id, title, image, total_time_minutes, servings, calories_per_serving):
+        self.id = id
+        self.title = title
+        self.image = image
+        self.total_time_minutes = total_time_minutes
+        self.servings = servings
+        self.calories_per_serving = calories_per_serving
+
+    def as_dict(self):
+        return recipe_card(
+            self.id, self.title, self.image, self.total_time_minutes, self.servings, self.calories_per_serving,
+        )
+
+
+class CardIndex:
+    """
+    Cards of every live recipe in parallel arrays, sorted by id.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        # Serializes loads, so concurrent first requests run one query
+        self._load_lock = threading.Lock()
+        self._loaded = False
+        self._epoch = 0
+        self._stale = set()
+        self._size = 0
+        # The arrays are created by the first load, so NumPy loads on first use
+        for name, _ in COLUMNS:
+            setattr(self, name, None)
+        self._strings = []
+        self._string_ids = {}
+        self._title_ranks = None
+        # Where NULLs go in an ascending sort: first on SQLite, last on PostgreSQL
+        self._null_key = math.inf if settings.is_postgres else -math.inf
+
+    # ------------------------ Loading ------------------------
+
+    @property
+    def current(self):
+        return self._loaded and not self._stale
+
+    def ensure_current(self):
+        """
+        Load the index, or reload the recipes changed since the last query.
+        """
+        if self.current:
+            return
+        with self._load_lock:
+            if not self._loaded:
+                self._load()
+            elif self._stale:
+                self._reload()
+
+    def _load(self):
+        with self._lock:
+            self._stale.clear()
+            epoch = self._epoch
+        with database.engine.connect() as connection:
+            rows = connection.execute(card_rows_statement()).all()
+        with self._lock:
+            self._strings, self._string_ids, self._title_ranks = [], {}, None
+            unique = []
+            for row in rows:
+                # An extra live nutrition facts row would repeat the recipe
+                if not unique or unique[-1][0] != row[0]:
+                    unique.append(row)
+            self._size = 0
+            self._reserve(len(unique))
+            for row in unique:
+                self._set(self._size, row)
+                self._size += 1
+            # Invalidated while loading: serve these rows, but load again on the next query
+            self._loaded = self._epoch == epoch
+
+    def _reload(self):
+        with self._lock:
+            stale, self._stale = sorted(self._stale), set()
+            epoch = self._epoch
+        rows = []
+        with database.engine.connect() as connection:
+            for start in range(0, len(stale), RELOAD_BATCH_SIZE):
+                rows += connection.execute(card_rows_statement(stale[start:start + RELOAD_BATCH_SIZE])).all()
+        with self._lock:
+            if self._epoch != epoch:
+                return
+            found = {}
+            for row in rows:
+                found.setdefault(row[0], row)
+            for recipe_id in stale:
+                if recipe_id in found:
+                    self._upsert(found[recipe_id])
+                else:
+                    self._remove(recipe_id)
+
+    def invalidate(self):
+        """
+        Drop the index so the next query loads it from the database.
+        """
+        with self._lock:
+            self._loaded = False
+            self._epoch += 1
+
+    def mark_stale(self, recipe_ids):
+        with self._lock:
+            self._stale.update(recipe_ids)
+
+    # ------------------------ Rows ------------------------
+
+    def _intern(self, value):
+        if value is None:
+            return MISSING
+        index = self._string_ids.get(value)
+        if index is None:
+            index = self._string_ids[value] = len(self._strings)
+            self._strings.append(sys.intern(value))
+            self._title_ranks = None
+        return index
+
+    def _set(self, row, values):
+        recipe_id, title, image, total_time, servings, calories, has_facts = values
+        self._ids[row] = recipe_id
+        self._titles[row] = self._intern(title)
+        self._images[row] = self._intern(image)
+        self._total_time[row] = MISSING if total_time is None else total_time
+        self._servings[row] = MISSING if servings is None else servings
+        self._calories[row] = math.nan if calories is None else calories
+        self._has_facts[row] = bool(has_facts)
+
+    def _reserve(self, capacity):
+        import numpy as np
+
+        current = 0 if self._ids is None else len(self._ids)
+        # An empty catalog still gets (empty) arrays, so queries and upserts can slice them
+        if capacity <= current and self._ids is not None:
+            return
+        capacity = max(16, capacity, current * 2)
+        for name, dtype in COLUMNS:
+            grown = np.empty(capacity, dtype=dtype)
+            if current:
+                grown[:self._size] = getattr(self, name)[:self._size]
+            setattr(self, name, grown)
+
+    def _find(self, recipe_id):
+        import numpy as np
+
+        row = int(np.searchsorted(self._ids[:self._size], recipe_id))
+        return row, row < self._size and self._ids[row] == recipe_id
+
+    def _upsert(self, values):
+        row, present = self._find(values[0])
+        if not present:
+            self._reserve(self._size + 1)
+            # Shift the rows after it to keep the arrays sorted by id
+            for name, _ in COLUMNS:
+                column = getattr(self, name)
+                column[row + 1:self._size + 1] = column[row:self._size]
+            self._size += 1
+        self._set(row, values)
+
+    def _remove(self, recipe_id):
+        row, present = self._find(recipe_id)
+        if not present:
+            return
+        for name, _ in COLUMNS:
+            column = getattr(self, name)
+            column[row:self._size - 1] = column[row + 1:self._size]
+        self._size -= 1
+
+    def _card(self, row):
+        total_time, servings, calories = int(self._total_time[row]), int(self._servings[row]), self._calories[row]
+        title, image = int(self._titles[row]), int(self._images[row])
+        return RecipeCard(
+            int(self._ids[row]),
+            None if title == MISSING else self._strings[title],
+            None if image == MISSING else self._strings[image],
+            None if total_time == MISSING else total_time,
+            None if servings == MISSING else servings,
+            None if math.isnan(calories) else float(calories),
+        )
+
+    # ------------------------ Queries ------------------------
+
+    def ordered_ids(self, filters):
+        """
+        The ids GET /recipes/ lists for `filters` (routers/recipes.py RecipeListFilters), in order.
+        """
+        import numpy as np
+
+        with self._lock:
+            size = self._size
+            total_time, servings = self._total_time[:size], self._servings[:size]
+            calories = self._calories[:size]
+            keep = np.ones(size, dtype=bool)
+            # MISSING and NaN fail every comparison below, as NULL does in SQL
+            if filters.min_total_minutes is not None:
+                keep &= total_time >= filters.min_total_minutes
+            if filters.max_total_minutes is not None:
+                keep &= (total_time != MISSING) & (total_time <= filters.max_total_minutes)
+            if filters.min_servings is not None:
+                keep &= servings >= filters.min_servings
+            if filters.max_servings is not None:
+                keep &= (servings != MISSING) & (servings <= filters.max_servings)
+            # The database listing joins nutrition facts only when it needs them
+            if filters.min_calories is not None or filters.max_calories is not None or filters.sort == "calories":
+                keep &= self._has_facts[:size]
+            if filters.min_calories is not None:
+                keep &= calories >= filters.min_calories
+            if filters.max_calories is not None:
+                keep &= calories <= filters.max_calories
+
+            rows = np.flatnonzero(keep)
+            ids = self._ids[rows]
+            key = self._sort_key(filters.sort, rows)
+        if filters.order == "desc":
+            order = np.lexsort((-ids, -key))
+        else:
+            order = np.lexsort((ids, key))
+        return ids[order].tolist()
+
+    def _sort_key(self, sort, rows):
+        import numpy as np
+
+        if sort == "id":
+            return self._ids[rows].astype(np.float64)
+        if sort == "title":
+            titles = self._titles[rows]
+            return np.where(titles == MISSING, self._null_key, self._ranks()[titles])
+        if sort == "calories":
+            calories = self._calories[rows]
+            return np.where(np.isnan(calories), self._null_key, calories)
+        column = self._total_time if sort == "total_time" else self._servings
+        values = column[rows]
+        return np.where(values == MISSING, self._null_key, values.astype(np.float64))
+
+    def _ranks(self):
+        import numpy as np
+
+        # Position of each string in sorted order, recomputed after new strings
+        if self._title_ranks is None or len(self._title_ranks) != len(self._strings):
+            order = sorted(range(len(self._strings)), key=self._strings.__getitem__)
+            ranks = np.empty(len(self._strings), dtype=np.float64)
+            ranks[order] = np.arange(len(order), dtype=np.float64)
+            self._title_ranks = ranks
+        return self._title_ranks
+
+    def page(self, offset, limit):
+        """
+        Cards of the recipes at positions offset..offset+limit in id order.
+        """
+        with self._lock:
+            return [self._card(row) for row in range(offset, min(offset + limit, self._size))]
+
+    def __len__(self):
+        return self._size
+
+    def nbytes(self):
+        """
+        Memory held by the arrays and the string table.
+        """
+        arrays = sum(getattr(self, name).nbytes for name, _ in COLUMNS if getattr(self, name) is not None)
+        strings = sum(sys.getsizeof(value) for value in self._strings)
+        return arrays + strings + sys.getsizeof(self._strings) + sys.getsizeof(self._string_ids)
+
+    def status(self):
+        nbytes = self.nbytes()
+        return {
+            "recipes": self._size,
+            "strings": len(self._strings),
+            "bytes": nbytes,
+            "bytes_per_recipe": round(nbytes / self._size, 1) if self._size else None,
+        }
+
+
+card_index = None
+if settings.recipe_card_index:
+    card_index = CardIndex()
+
+    @invalidation.subscribe
+    def _reload_changed_cards(change):
+        if change.everything:
+            card_index.invalidate()
+        elif change.recipes:
+            card_index.mark_stale(change.recipes)
@@ -0,0 +1,446 @@
+# services/catalog_snapshot.py
+"""
+Memory-mapped snapshot of the live catalog, shared by every worker on a host.
+
+With CATALOG_SNAPSHOT_PATH set, one file holds every live recipe already
+encoded as the JSON body of GET /recipes/{id}, plus its card for
+GET /recipes/cards. Workers map it read-only, so the operating system keeps
+one copy in the page cache however many workers there are, and serve those
+endpoints by slicing bytes out of the mapping: no query and no encoding.
+
+Layout (little-endian, every section 8-byte aligned):
+
+    header         magic, recipe count, refreshed count, built at, full build at
+    ids            int64 per recipe, ascending
+    doc offsets    uint64 per recipe + 1, into the data region
+    card offsets   uint64 per recipe + 1, into the data region
+    refreshed      int64 ids and float64 times of the recipes reloaded by
+                   incremental builds since the last full build
+    data           the documents, then the cards
+
+Writes reach the snapshot through services/invalidation.py. The changed
+recipes are marked dirty at once, so requests for them go through the
+caches and the database, and a background thread rebuilds the file: the
+changed recipes are reloaded and everything else is copied from the current
+file. A tag or category change, or a lost invalidation message, triggers a
+full rebuild. Builds are serialized across workers with a lock file, written
+to a temporary file and swapped in with os.replace; workers notice the new
+file within CATALOG_SNAPSHOT_POLL_INTERVAL_S and remap it. A worker only
+uses the new file for a dirty recipe once the file was built after the
+change committed.
+
+The file is built when missing. Writes made outside the app (bulk imports,
+manual SQL) need a full rebuild:
+
+    python -m services.catalog_snapshot
+"""
+import bisect
+import fcntl
+import json
+import logging
+import mmap
+import os
+import shutil
+import struct
+import tempfile
+import threading
+import time
+from array import array
+
+from services import invalidation
+from services.serializers import recipe_card, recipe_to_dict
+from settings import settings
+
+logger = logging.getLogger("cooknook.catalog_snapshot")
+
+MAGIC = b"CNCATLG1"
+HEADER = struct.Struct("<8sIIdd")
+# Past this many refreshed recipes the next build is a full one
+MAX_REFRESHED = 50000
+
+
+def _encode(value):
+    # Same encoder settings as JSONResponse.render
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":")).encode("utf-8")
+
+
+def _card(recipe):
+    facts = recipe.nutrition_facts
+    return recipe_card(
+        recipe.id, recipe.title, recipe.image, recipe.total_time_minutes, recipe.servings,
+        facts.calories_per_serving if facts is not None and not facts.deleted else None,
+    )
+
+
+class Snapshot:
+    """
+    A read-only mapping of one snapshot file.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as snapshot_file:
+            stat = os.fstat(snapshot_file.fileno())
+            self.identity = (stat.st_ino, stat.st_mtime_ns)
+            self.size = stat.st_size
+            self._map = mmap.mmap(snapshot_file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, refreshed, self.built_at, self.full_built_at = HEADER.unpack_from(self._map)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a catalog snapshot")
+        view = memoryview(self._map)
+        position = HEADER.size
+        self.ids = view[position:position + 8 * self.count].cast("q")
+        position += 8 * self.count
+        self._doc_offsets = view[position:position + 8 * (self.count + 1)].cast("Q")
+        position += 8 * (self.count + 1)
+        self._card_offsets = view[position:position + 8 * (self.count + 1)].cast("Q")
+        position += 8 * (self.count + 1)
+        refreshed_ids = view[position:position + 8 * refreshed].cast("q")
+        position += 8 * refreshed
+        refreshed_at = view[position:position + 8 * refreshed].cast("d")
+        position += 8 * refreshed
+        self.refreshed = dict(zip(refreshed_ids, refreshed_at))
+        self._data = position
+
+    def covers(self, recipe_id, changed_at):
+        """
+        Whether this snapshot reloaded `recipe_id` after a change at `changed_at`.
+        """
+        return self.full_built_at > changed_at or self.refreshed.get(recipe_id, 0.0) > changed_at
+
+    def _index(self, recipe_id):
+        index = bisect.bisect_left(self.ids, recipe_id)
+        return index if index < self.count and self.ids[index] == recipe_id else None
+
+    def document(self, recipe_id):
+        index = self._index(recipe_id)
+        if index is None:
+            return None
+        return self._map[self._data + self._doc_offsets[index]:self._data + self._doc_offsets[index + 1]]
+
+    def cards(self, offset, limit):
+        """
+        The cards of the recipes at positions offset..offset+limit, as a JSON array.
+        """
+        stop = min(offset + limit, self.count)
+        if offset >= stop:
+            return b"[]"
+        data = self._data
+        cards = [
+            self._map[data + self._card_offsets[index]:data + self._card_offsets[index + 1]]
+            for index in range(offset, stop)
+        ]
+        return b"[" + b",".join(cards) + b"]"
+
+    def records(self):
+        """
+        (id, document bytes, card bytes) for every recipe, as views into the mapping.
+        """
+        view, data = memoryview(self._map), self._data
+        for index in range(self.count):
+            yield (
+                self.ids[index],
+                view[data + self._doc_offsets[index]:data + self._doc_offsets[index + 1]],
+                view[data + self._card_offsets[index]:data + self._card_offsets[index + 1]],
+            )
+
+
+def _open(path):
+    try:
+        return Snapshot(path)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError, struct.error):
+        logger.exception("ignoring unreadable catalog snapshot", extra={"path": path})
+        return None
+
+
+# ------------------------ Building ------------------------
+
+def _write(path, records, built_at, full_built_at, refreshed):
+    """
+    Write `records` ((id, document, card), ascending ids) to a new file and swap it in.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    ids, doc_offsets, cards = array("q"), array("Q", [0]), []
+    with tempfile.TemporaryFile(dir=directory) as documents:
+        for recipe_id, document, card in records:
+            documents.write(document)
+            ids.append(recipe_id)
+            doc_offsets.append(doc_offsets[-1] + len(document))
+            cards.append(card)
+        card_offsets = array("Q", [doc_offsets[-1]])
+        for card in cards:
+            card_offsets.append(card_offsets[-1] + len(card))
+
+        descriptor, tmp_path = tempfile.mkstemp(dir=directory, prefix=".catalog-", suffix=".tmp")
+        try:
+            with os.fdopen(descriptor, "wb") as snapshot_file:
+                snapshot_file.write(HEADER.pack(MAGIC, len(ids), len(refreshed), built_at, full_built_at))
+                snapshot_file.write(ids.tobytes())
+                snapshot_file.write(doc_offsets.tobytes())
+                snapshot_file.write(card_offsets.tobytes())
+                snapshot_file.write(array("q", refreshed).tobytes())
+                snapshot_file.write(array("d", refreshed.values()).tobytes())
+                documents.seek(0)
+                shutil.copyfileobj(documents, snapshot_file)
+                for card in cards:
+                    snapshot_file.write(card)
+                snapshot_file.flush()
+                os.fsync(snapshot_file.fileno())
+            os.chmod(tmp_path, 0o644)
+            os.replace(tmp_path, path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+    return len(ids)
+
+
+def _loaded_records(recipes):
+    for recipe in recipes:
+        yield recipe.id, _encode(recipe_to_dict(recipe)), _encode(_card(recipe))
+
+
+def build_full(path, session_factory):
+    """
+    Rebuild the snapshot from every live recipe.
+    """
+    from sqlalchemy import select
+
+    from models import Recipe
+    from services.serializers import RECIPE_DOCUMENT_OPTIONS
+
+    built_at = time.time()
+    statement = (
+        select(Recipe)
+        .options(*RECIPE_DOCUMENT_OPTIONS)
+        .where(Recipe.deleted.is_(False))
+        .order_by(Recipe.id)
+        .execution_options(yield_per=settings.stream_batch_size)
+    )
+
+    def records():
+        with session_factory() as db:
+            for recipes in db.scalars(statement).partitions():
+                yield from _loaded_records(recipes)
+                db.expunge_all()
+
+    return _write(path, records(), built_at, built_at, {})
+
+
+def build_incremental(path, session_factory, current, recipe_ids):
+    """
+    Rebuild the snapshot from `current`, reloading only `recipe_ids`.
+    """
+    from services.document_loader import recipes_by_id_statement
+
+    built_at = time.time()
+    with session_factory() as db:
+        loaded = {
+            recipe_id: (recipe_id, document, card)
+            for recipe_id, document, card in _loaded_records(db.scalars(recipes_by_id_statement(sorted(recipe_ids))))
+        }
+
+    def records():
+        # Merge the reloaded recipes into the current ones, by id
+        pending = sorted(loaded)
+        position = 0
+        for record in current.records():
+            while position < len(pending) and pending[position] < record[0]:
+                yield loaded[pending[position]]
+                position += 1
+            if record[0] not in recipe_ids:
+                yield record
+        for recipe_id in pending[position:]:
+            yield loaded[recipe_id]
+
+    refreshed = dict(current.refreshed)
+    refreshed.update(dict.fromkeys(recipe_ids, built_at))
+    return _write(path, records(), built_at, current.full_built_at, refreshed)
+
+
+# ------------------------ Serving ------------------------
+
+class CatalogSnapshots:
+    """
+    The snapshot a worker serves from, and the thread that keeps it current.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.snapshot = None
+        self.hits = 0
+        self.builds = {"full": 0, "incremental": 0}
+        self.last_error = None
+        # Changes not yet in the mapped snapshot: recipe id -> time seen; None or a time for "everything"
+        self._dirty = {}
+        self._dirty_all = None
+        # Changes this worker still has to make sure a build covers
+        self._pending = {}
+        self._pending_all = None
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+
+    # ------------------------ Requests ------------------------
+
+    def document(self, recipe_id):
+        """
+        The encoded GET /recipes/{id} body, or None to serve it the usual way.
+        """
+        snapshot = self.snapshot
+        if snapshot is None or self._dirty_all is not None or recipe_id in self._dirty:
+            return None
+        document = snapshot.document(recipe_id)
+        if document is not None:
+            self.hits += 1
+        return document
+
+    def cards(self, offset, limit):
+        """
+        A JSON array of cards in id order, or None while any recipe is dirty.
+        """
+        snapshot = self.snapshot
+        if snapshot is None or self._dirty_all is not None or self._dirty:
+            return None
+        self.hits += 1
+        return snapshot.cards(offset, limit)
+
+    # ------------------------ Changes ------------------------
+
+    def changed(self, change):
+        now = time.time()
+        with self._lock:
+            if change.everything or change.tags or change.categories:
+                self._dirty_all = self._pending_all = now
+            else:
+                for recipe_id in change.recipes:
+                    self._dirty[recipe_id] = self._pending[recipe_id] = now
+        self._wake.set()
+
+    def _map(self, snapshot):
+        with self._lock:
+            self.snapshot = snapshot
+            if self._dirty_all is not None and snapshot.full_built_at > self._dirty_all:
+                self._dirty_all = None
+            self._dirty = {
+                recipe_id: changed_at for recipe_id, changed_at in self._dirty.items()
+                if not snapshot.covers(recipe_id, changed_at)
+            }
+
+    def _refresh(self):
+        """
+        Map the file on disk if it is not the one mapped.
+        """
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if self.snapshot is None or self.snapshot.identity != (stat.st_ino, stat.st_mtime_ns):
+            snapshot = _open(self.path)
+            if snapshot is not None:
+                self._map(snapshot)
+
+    # ------------------------ Builder thread ------------------------
+
+    def build(self, session_factory):
+        """
+        Make sure the file on disk covers this worker's pending changes, building if needed.
+        """
+        with self._lock:
+            pending, pending_all = self._pending, self._pending_all
+            self._pending, self._pending_all = {}, None
+        lock_path = f"{self.path}.lock"
+        with open(lock_path, "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                current = _open(self.path)
+                if current is not None and pending_all is not None and current.full_built_at > pending_all:
+                    pending_all = None
+                if current is not None:
+                    pending = {
+                        recipe_id: changed_at for recipe_id, changed_at in pending.items()
+                        if not current.covers(recipe_id, changed_at)
+                    }
+                if current is None or pending_all is not None or len(current.refreshed) + len(pending) > MAX_REFRESHED:
+                    count = build_full(self.path, session_factory)
+                    self.builds["full"] += 1
+                    logger.info("catalog snapshot built", extra={"recipes": count})
+                elif pending:
+                    build_incremental(self.path, session_factory, current, set(pending))
+                    self.builds["incremental"] += 1
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+        self._refresh()
+
+    def _run(self, session_factory):
+        while not self._stop.is_set():
+            if self._wake.wait(settings.catalog_snapshot_poll_interval_s):
+                # Let a burst of writes settle into one build
+                self._stop.wait(settings.catalog_snapshot_debounce_s)
+                self._wake.clear()
+                try:
+                    self.build(session_factory)
+                    self.last_error = None
+                except Exception as exc:
+                    self.last_error = f"{type(exc).__name__}: {exc}"
+                    logger.exception("catalog snapshot build failed")
+                    # Try again after the next poll interval
+                    with self._lock:
+                        self._pending_all = self._pending_all or time.time()
+                    self._stop.wait(settings.catalog_snapshot_poll_interval_s)
+                    self._wake.set()
+            else:
+                self._refresh()
+
+    def start(self, session_factory):
+        self._refresh()
+        if self.snapshot is None:
+            with self._lock:
+                self._pending_all = time.time()
+            self._wake.set()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._run, args=(session_factory,), name="catalog-snapshot", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._wake.set()
+            self._thread.join()
+            self._thread = None
+
+    def rebuild(self, session_factory):
+        """
+        Build a full snapshot now, e.g. after writes made outside the app.
+        """
+        with self._lock:
+            self._pending_all = time.time()
+        self.build(session_factory)
+
+    def status(self):
+        snapshot = self.snapshot
+        return {
+            "recipes": snapshot.count if snapshot else None,
+            "bytes": snapshot.size if snapshot else None,
+            "age_seconds": round(time.time() - snapshot.built_at, 1) if snapshot else None,
+            "dirty_recipes": "all" if self._dirty_all is not None else len(self._dirty),
+            "builds": dict(self.builds),
+            "error": self.last_error,
+        }
+
+
+catalog_snapshot = None
+if settings.catalog_snapshot_path:
+    catalog_snapshot = CatalogSnapshots(settings.catalog_snapshot_path)
+    invalidation.subscribe(catalog_snapshot.changed)
+
+
+if __name__ == "__main__":
+    import database
+
+    if not settings.catalog_snapshot_path:
+        raise SystemExit("Set CATALOG_SNAPSHOT_PATH")
+    database.init_engines()
+    catalog_snapshot.rebuild(database.SessionLocal)
+    print(catalog_snapshot.status())
@@ -0,0 +1,31 @@
+# services/currency.py
+import json
+import os
+from functools import lru_cache
+from typing import Optional
+
+# Local conversion table: "rates" gives the value of one unit of each currency in "base"
+DEFAULT_RATES_PATH = os.path.join(os.path.dirname(os.path.dirname(__file__)), "data", "currency_rates.json")
+
+
+@lru_cache(maxsize=1)
+def load_rates(path: Optional[str] = None) -> dict:
+    """
+    Read the conversion table once per process. Set CURRENCY_RATES_PATH to use a
+    different file; call `load_rates.cache_clear()` after replacing it.
+    """
+    with open(path or os.getenv("CURRENCY_RATES_PATH", DEFAULT_RATES_PATH)) as rates_file:
+        table = json.load(rates_file)
+    return {code.upper(): float(rate) for code, rate in table["rates"].items()}
+
+
+def convert(amount: float, from_currency: str, to_currency: str) -> Optional[float]:
+    """
+    Convert an amount between currencies, or return None if either is not in the table.
+    """
+    rates = load_rates()
+    source = rates.get((from_currency or "").upper())
+    target = rates.get((to_currency or "").upper())
+    if source is None or target is None:
+        return None
+    return amount * source / target
@@ -0,0 +1,197 @@
+# services/document_loader.py
+"""
+Serialized recipes through the cache tiers: the per-worker LRU
+(services/recipe_cache.py), then the shared tier if configured
+(services/shared_cache.py), then the database.
+
+Concurrent misses for one recipe in this worker share one load
+(services/single_flight.py). A single recipe missing from both tiers is loaded by one request at a time
+across all workers: the others wait up to RECIPE_SHARED_CACHE_LOCK_WAIT_S for
+it to appear in the shared tier, then load it themselves. Batches (listings,
+multi-get) look up their misses with one MGET and load the rest with one query;
+they add at most a quarter of RECIPE_CACHE_SIZE to the per-worker LRU, so a
+long listing does not push out the recipes requested one by one.
+
+Documents go into the shared tier with the fill tokens of the lookup that
+missed them, so one loaded before a concurrent write committed is not served
+after it, and only when they were read from the primary.
+"""
+import asyncio
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+import database
+from models import Recipe
+from services.recipe_cache import recipe_cache
+from services.replicas import read_from_replica
+from services.serializers import RECIPE_DOCUMENT_OPTIONS, recipe_to_dict
+from services.shared_cache import LOCK_POLL_SECONDS, shared_cache
+from services.single_flight import recipe_flights
+from settings import settings
+
+
+def recipes_by_id_statement(recipe_ids):
+    return (
+        select(Recipe)
+        .options(*RECIPE_DOCUMENT_OPTIONS)
+        .where(Recipe.id.in_(recipe_ids), Recipe.deleted.is_(False))
+    )
+
+
+async def _shared(method, *args):
+    # Network stores are called from the thread pool to keep the event loop free
+    if shared_cache.blocking:
+        return await run_in_threadpool(method, *args)
+    return method(*args)
+
+
+# ------------------------ One recipe ------------------------
+
+def load_document(db, recipe_id, statement):
+    """
+    The document for `recipe_id`, or None; `statement` loads it from the database.
+    """
+    document = recipe_cache.get(recipe_id)
+    if document is not None:
+        return document
+    return recipe_flights.do(recipe_flights.key(recipe_id), lambda: _load(db, recipe_id, statement))
+
+
+def _load(db, recipe_id, statement):
+    epoch = recipe_cache.epoch
+    if shared_cache is None:
+        document = _from_database(db, statement)
+    else:
+        document = shared_cache.get(recipe_id)
+        if document is None:
+            if shared_cache.lock(recipe_id):
+                try:
+                    # Another loader may have finished between the miss and the lock
+                    found, tokens = shared_cache.lookup([recipe_id], count=False)
+                    document = found.get(recipe_id)
+                    if document is None:
+                        document = _from_database(db, statement)
+                        if document is not None and not read_from_replica(db):
+                            shared_cache.put(recipe_id, document, tokens)
+                finally:
+                    shared_cache.unlock(recipe_id)
+            else:
+                document = shared_cache.wait_for(recipe_id, settings.recipe_shared_cache_lock_wait_s)
+                if document is None:
+                    document = _from_database(db, statement)
+    if document is not None:
+        recipe_cache.put(recipe_id, document, epoch=epoch)
+    return document
+
+
+async def load_document_async(recipe_id, statement):
+    """
+    Like load_document. The load runs in a session of its own, since it finishes even
+    if the request that started it is cancelled and its session closed.
+    """
+    document = recipe_cache.get(recipe_id)
+    if document is not None:
+        return document
+    return await recipe_flights.do_async(recipe_flights.key(recipe_id), lambda: _load_in_session(recipe_id, statement))
+
+
+async def _load_in_session(recipe_id, statement):
+    async with database.AsyncSessionLocal() as db:
+        return await _load_async(db, recipe_id, statement)
+
+
+async def _load_async(db, recipe_id, statement):
+    epoch = recipe_cache.epoch
+    if shared_cache is None:
+        document = await _from_database_async(db, statement)
+    else:
+        document = await _shared(shared_cache.get, recipe_id)
+        if document is None:
+            if await _shared(shared_cache.lock, recipe_id):
+                try:
+                    # Another loader may have finished between the miss and the lock
+                    found, tokens = await _shared(shared_cache.lookup, [recipe_id], False)
+                    document = found.get(recipe_id)
+                    if document is None:
+                        document = await _from_database_async(db, statement)
+                        if document is not None and not read_from_replica(db):
+                            await _shared(shared_cache.put, recipe_id, document, tokens)
+                finally:
+                    await _shared(shared_cache.unlock, recipe_id)
+            else:
+                document = await _wait_for_async(recipe_id)
+                if document is None:
+                    document = await _from_database_async(db, statement)
+    if document is not None:
+        recipe_cache.put(recipe_id, document, epoch=epoch)
+    return document
+
+
+def _from_database(db, statement):
+    recipe = db.scalars(statement).first()
+    return recipe_to_dict(recipe) if recipe else None
+
+
+async def _from_database_async(db, statement):
+    recipe = (await db.scalars(statement)).first()
+    return recipe_to_dict(recipe) if recipe else None
+
+
+async def _wait_for_async(recipe_id):
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + settings.recipe_shared_cache_lock_wait_s
+    while loop.time() < deadline:
+        await asyncio.sleep(LOCK_POLL_SECONDS)
+        document = await _shared(shared_cache.get, recipe_id, False)
+        if document is not None:
+            return document
+    return None
+
+
+# ------------------------ Batches ------------------------
+
+def load_documents(db, recipe_ids):
+    """
+    Documents for `recipe_ids` in the same order, skipping missing or deleted recipes.
+    """
+    epoch = recipe_cache.epoch
+    documents = recipe_cache.get_many(recipe_ids)
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in documents]
+    if missing and shared_cache is not None:
+        shared, tokens = shared_cache.lookup(missing)
+        _keep(documents, shared, epoch)
+        missing = [recipe_id for recipe_id in missing if recipe_id not in shared]
+    if missing:
+        loaded = {recipe.id: recipe_to_dict(recipe) for recipe in db.scalars(recipes_by_id_statement(missing))}
+        if shared_cache is not None and not read_from_replica(db):
+            shared_cache.put_many(loaded, tokens)
+        _keep(documents, loaded, epoch)
+    return [documents[recipe_id] for recipe_id in recipe_ids if recipe_id in documents]
+
+
+async def load_documents_async(db, recipe_ids):
+    epoch = recipe_cache.epoch
+    documents = recipe_cache.get_many(recipe_ids)
+    missing = [recipe_id for recipe_id in recipe_ids if recipe_id not in documents]
+    if missing and shared_cache is not None:
+        shared, tokens = await _shared(shared_cache.lookup, missing)
+        _keep(documents, shared, epoch)
+        missing = [recipe_id for recipe_id in missing if recipe_id not in shared]
+    if missing:
+        loaded = {
+            recipe.id: recipe_to_dict(recipe)
+            for recipe in (await db.scalars(recipes_by_id_statement(missing))).all()
+        }
+        if shared_cache is not None and not read_from_replica(db):
+            await _shared(shared_cache.put_many, loaded, tokens)
+        _keep(documents, loaded, epoch)
+    return [documents[recipe_id] for recipe_id in recipe_ids if recipe_id in documents]
+
+
+def _keep(documents, found, epoch):
+    documents.update(found)
+    if len(documents) > recipe_cache.max_size // 4:
+        return
+    for recipe_id, document in found.items():
+        recipe_cache.put(recipe_id, document, requested=False, epoch=epoch)
@@ -0,0 +1,256 @@
+# services/document_table.py
+"""
+Rendered recipe documents stored in the database, rewritten on every write.
+
+With RECIPE_DOCUMENT_TABLE on, the recipe_documents table holds the JSON body
+of GET /recipes/{id} for each live recipe, and a gzip copy of it. The
+transaction that changes a recipe rewrites its row before it commits:
+creating a recipe, editing it or its steps, nutrition facts and ingredient
+links, soft-deleting it, and renaming, merging or deleting a tag, category or
+ingredient it embeds. Readers therefore see the document and the recipe
+change together, on the primary and on every replica, and GET /recipes/{id}
+is one primary-key lookup with no joins and no encoding.
+
+Session hooks find the recipes a transaction touched: recipe rows and their
+children after each flush, and the recipes linked to a changed or deleted
+tag, category or ingredient before the flush removes the links. Just before
+the commit they are rendered with the statement in services/sql_documents.py
+and upserted; recipes that no longer render (deleted) lose their row.
+
+A recipe without a row is read the usual way, so the table can be filled
+after the migration, or after writes made outside the app (bulk imports,
+manual SQL), with:
+
+    python -m services.document_table              # every live recipe
+    python -m services.document_table 12 40        # these recipes
+"""
+import gzip
+import time
+
+from sqlalchemy import Column, Float, Integer, LargeBinary, MetaData, Table, Text, bindparam, delete, event, select
+from sqlalchemy.orm import Session
+
+from services.sql_documents import documents_statement
+from settings import settings
+
+# Recipes rendered per statement
+BATCH_SIZE = 500
+
+_metadata = MetaData()
+recipe_documents = Table(
+    "recipe_documents", _metadata,
+    # No foreign key: the row of a hard-deleted recipe is removed after the recipe, in the same transaction
+    Column("recipe_id", Integer, primary_key=True, autoincrement=False),
+    Column("document", Text, nullable=False),
+    Column("compressed", LargeBinary, nullable=False),
+    Column("updated_at", Float, nullable=False),
+)
+
+_document_statements = {
+    compressed: select(recipe_documents.c.compressed if compressed else recipe_documents.c.document)
+    .where(recipe_documents.c.recipe_id == bindparam("recipe_id"))
+    for compressed in (False, True)
+}
+
+stats = {"hits": 0, "misses": 0, "written": 0, "removed": 0}
+
+
+# ------------------------ Reading ------------------------
+
+def accepts_gzip(accept_encoding):
+    """
+    True when an Accept-Encoding header allows gzip.
+    """
+    for coding in (accept_encoding or "").split(","):
+        name, *params = coding.split(";")
+        if name.strip().lower() not in ("gzip", "*"):
+            continue
+        for param in params:
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    return float(value) > 0
+                except ValueError:
+                    return False
+        return True
+    return False
+
+
+def stored_statement(compressed=False):
+    """
+    The primary-key lookup of one recipe's document, with the parameter "recipe_id".
+    """
+    return _document_statements[compressed]
+
+
+def _stored(value):
+    stats["hits" if value is not None else "misses"] += 1
+    if value is None:
+        return None
+    # Text comes back as str; psycopg2 returns bytea as a memoryview
+    return value.encode("utf-8") if isinstance(value, str) else bytes(value)
+
+
+def load_stored(db, recipe_id, compressed=False):
+    """
+    The stored document of a recipe as bytes, gzip-compressed if asked; None without a row.
+    """
+    return _stored(db.scalar(_document_statements[compressed], {"recipe_id": recipe_id}))
+
+
+async def load_stored_async(db, recipe_id, compressed=False):
+    return _stored(await db.scalar(_document_statements[compressed], {"recipe_id": recipe_id}))
+
+
+# ------------------------ Writing ------------------------
+
+def _upsert(connection):
+    if connection.dialect.name == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    statement = insert(recipe_documents)
+    # An upsert rather than delete + insert, so concurrent rewrites of one recipe do not collide
+    return statement.on_conflict_do_update(
+        index_elements=[recipe_documents.c.recipe_id],
+        set_={name: statement.excluded[name] for name in ("document", "compressed", "updated_at")},
+    )
+
+
+def write_documents(connection, recipe_ids):
+    """
+    Render the recipes in `recipe_ids` into the table, and drop the rows of those that are not live.
+    """
+    recipe_ids = sorted(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        batch = recipe_ids[start:start + BATCH_SIZE]
+        rows = connection.execute(documents_statement(), {"ids": batch}).all()
+        now = time.time()
+        if rows:
+            connection.execute(_upsert(connection), [
+                {
+                    "recipe_id": recipe_id,
+                    "document": document,
+                    # mtime=0 keeps the bytes the same for the same document
+                    "compressed": gzip.compress(document.encode("utf-8"), mtime=0),
+                    "updated_at": now,
+                }
+                for recipe_id, document in rows
+            ])
+        gone = set(batch).difference(recipe_id for recipe_id, _ in rows)
+        if gone:
+            connection.execute(delete(recipe_documents).where(recipe_documents.c.recipe_id.in_(gone)))
+        stats["written"] += len(rows)
+        stats["removed"] += len(gone)
+
+
+def rebuild(engine, recipe_ids=None, progress=print):
+    """
+    Rewrite the rows of `recipe_ids`, or of every live recipe and drop the rest. One transaction per batch.
+    """
+    from models import Recipe
+
+    live = select(Recipe.id).where(Recipe.deleted.is_(False))
+    if recipe_ids is None:
+        with engine.connect() as connection:
+            recipe_ids = connection.scalars(live.order_by(Recipe.id)).all()
+        with engine.begin() as connection:
+            removed = connection.execute(
+                delete(recipe_documents).where(recipe_documents.c.recipe_id.not_in(live))
+            ).rowcount
+        progress(f"removed {removed} rows of deleted recipes")
+    recipe_ids = sorted(recipe_ids)
+    for start in range(0, len(recipe_ids), BATCH_SIZE):
+        with engine.begin() as connection:
+            write_documents(connection, recipe_ids[start:start + BATCH_SIZE])
+        progress(f"rendered {min(start + BATCH_SIZE, len(recipe_ids))}/{len(recipe_ids)} recipes")
+
+
+# ------------------------ Collecting writes ------------------------
+
+def _pending(session):
+    return session.info.setdefault("recipe_documents", set())
+
+
+def _linked_recipes(session):
+    from models import Category, Ingredient, Tag
+    from models.recipes import recipe_categories, recipe_ingredients, recipe_tags
+
+    links = (
+        (Tag, recipe_tags.c.tag_id, recipe_tags.c.recipe_id),
+        (Category, recipe_categories.c.category_id, recipe_categories.c.recipe_id),
+        (Ingredient, recipe_ingredients.c.ingredient_id, recipe_ingredients.c.recipe_id),
+    )
+    changed = {model: set() for model, _, _ in links}
+    for state, rows in (("dirty", session.dirty), ("deleted", session.deleted)):
+        for row in rows:
+            model = type(row)
+            if model in changed and (state == "deleted" or session.is_modified(row)):
+                changed[model].add(row.id)
+    statements = [
+        select(recipe_column).where(key_column.in_(changed[model]))
+        for model, key_column, recipe_column in links if changed[model]
+    ]
+    if not statements:
+        return set()
+    connection = session.connection()
+    return {recipe_id for statement in statements for recipe_id in connection.scalars(statement)}
+
+
+def _touched_recipes(session):
+    from models import NutritionFacts, Recipe, RecipeIngredient, RecipeStep
+
+    recipe_ids = set()
+    for state, rows in (("new", session.new), ("dirty", session.dirty), ("deleted", session.deleted)):
+        for row in rows:
+            if state == "dirty" and not session.is_modified(row):
+                continue
+            if isinstance(row, Recipe):
+                recipe_ids.add(row.id)
+            elif isinstance(row, (RecipeStep, NutritionFacts, RecipeIngredient)):
+                recipe_ids.add(row.recipe_id)
+    recipe_ids.discard(None)
+    return recipe_ids
+
+
+def _collect_links(session, flush_context, instances):
+    # The links of a renamed or deleted tag, category or ingredient, while they still exist
+    recipe_ids = _linked_recipes(session)
+    if recipe_ids:
+        _pending(session).update(recipe_ids)
+
+
+def _collect_rows(session, flush_context):
+    recipe_ids = _touched_recipes(session)
+    if recipe_ids:
+        _pending(session).update(recipe_ids)
+
+
+def _render(session):
+    # The commit flushes after this hook; flush now so every change is collected and visible
+    session.flush()
+    recipe_ids = session.info.pop("recipe_documents", None)
+    if recipe_ids:
+        write_documents(session.connection(), recipe_ids)
+
+
+def _discard(session):
+    session.info.pop("recipe_documents", None)
+
+
+if settings.recipe_document_table:
+    event.listen(Session, "before_flush", _collect_links)
+    event.listen(Session, "after_flush", _collect_rows)
+    event.listen(Session, "before_commit", _render)
+    event.listen(Session, "after_rollback", _discard)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    import database
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("recipe_ids", type=int, nargs="*", help="Recipes to rewrite; all live recipes if omitted")
+    args = parser.parse_args()
+    rebuild(database.init_engines(), args.recipe_ids or None)
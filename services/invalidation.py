@@ -0,0 +1,438 @@
+# services/invalidation.py
+"""
+Cross-worker invalidation of the in-process caches.
+
+Committed session writes to recipes (and the rows they are built from),
+tags and categories are collected by session events. The affected caches in
+this process are evicted at commit, before the response is sent, and the
+change is published to the other workers through INVALIDATION_BACKEND:
+
+    postgres  NOTIFY sent inside the writing transaction, so it is delivered
+              exactly when the write commits; each worker LISTENs on its own
+              connection. Works across hosts.
+    unix      a datagram to every worker's socket in INVALIDATION_SOCKET_DIR.
+              Single host, and for local testing.
+    (unset)   one worker: local eviction only.
+
+Each published transaction also bumps the shared counter in cache_generation
+and its message carries the new value. Every worker tracks the generations
+it has seen and polls the counter every INVALIDATION_POLL_INTERVAL_S; a
+generation that stays missing (a dropped datagram, a listener reconnecting,
+a worker that crashed between commit and publish) makes it clear all its
+caches rather than serve stale entries.
+
+Caches register with subscribe(handler); handler(change) receives a Change.
+"""
+import json
+import logging
+import os
+import select
+import socket
+import threading
+import time
+
+from sqlalchemy import BigInteger, Column, Integer, MetaData, Table, event, func, select as sql_select, update
+from sqlalchemy.orm import Session
+
+from settings import settings
+
+logger = logging.getLogger("cooknook.invalidation")
+
+CHANNEL = "cooknook_invalidation"
+# NOTIFY payloads are limited to 8000 bytes; larger changes are sent as "everything changed"
+MAX_PAYLOAD_BYTES = 7900
+# A generation missing for this many poll intervals is treated as lost
+GAP_GRACE_INTERVALS = 2
+
+_metadata = MetaData()
+cache_generation = Table(
+    "cache_generation", _metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    Column("generation", BigInteger, nullable=False),
+)
+
+
+class Change:
+    """
+    Ids changed by one transaction; `everything` asks subscribers to drop all
+    entries. `remote` is set for changes made by other workers (or lost in transit).
+    """
+    __slots__ = ("recipes", "tags", "categories", "everything", "generation", "remote")
+
+    def __init__(self, recipes=(), tags=(), categories=(), everything=False, generation=None, remote=False):
+        self.recipes = set(recipes)
+        self.tags = set(tags)
+        self.categories = set(categories)
+        self.everything = everything
+        self.generation = generation
+        self.remote = remote
+
+    def __bool__(self):
+        return bool(self.recipes or self.tags or self.categories or self.everything)
+
+    def merge(self, other):
+        self.recipes |= other.recipes
+        self.tags |= other.tags
+        self.categories |= other.categories
+        self.everything = self.everything or other.everything
+
+    def encode(self):
+        payload = json.dumps({
+            "g": self.generation,
+            "r": sorted(self.recipes),
+            "t": sorted(self.tags),
+            "c": sorted(self.categories),
+            "all": self.everything,
+        }, separators=(",", ":"))
+        if len(payload) > MAX_PAYLOAD_BYTES:
+            payload = json.dumps({"g": self.generation, "all": True})
+        return payload
+
+    @classmethod
+    def decode(cls, payload):
+        message = json.loads(payload)
+        return cls(
+            message.get("r", ()), message.get("t", ()), message.get("c", ()),
+            message.get("all", False), message.get("g"), remote=True,
+        )
+
+
+# ------------------------ Subscribers ------------------------
+
+_handlers = []
+stats = {"published": 0, "received": 0, "gaps": 0, "applied": 0}
+
+
+def subscribe(handler):
+    _handlers.append(handler)
+    return handler
+
+
+def apply(change):
+    """
+    Evict what `change` touched from every registered cache in this process.
+    """
+    stats["applied"] += 1
+    for handler in _handlers:
+        try:
+            handler(change)
+        except Exception:
+            logger.exception("invalidation handler failed")
+
+
+class GenerationTracker:
+    """
+    Which shared generations this worker has seen, to spot lost messages.
+    """
+
+    def __init__(self):
+        self.low = None  # every generation up to here has been seen
+        self._seen = set()
+        self._missing_since = None
+        self._lock = threading.Lock()
+
+    def start(self, generation):
+        with self._lock:
+            self.low = generation
+            self._seen = set()
+            self._missing_since = None
+
+    def seen(self, generation):
+        with self._lock:
+            if self.low is None or generation is None or generation <= self.low:
+                return
+            self._seen.add(generation)
+            while self.low + 1 in self._seen:
+                self.low += 1
+                self._seen.remove(self.low)
+
+    def lost(self, current, grace_seconds):
+        """
+        True (and resynchronized to `current`) when a generation up to
+        `current` has been missing for longer than `grace_seconds`.
+        """
+        with self._lock:
+            if self.low is None or current <= self.low:
+                self._missing_since = None
+                return False
+            now = time.monotonic()
+            if self._missing_since is None:
+                self._missing_since = now
+                return False
+            if now - self._missing_since < grace_seconds:
+                return False
+            self.low = current
+            self._seen = {generation for generation in self._seen if generation > current}
+            self._missing_since = None
+            return True
+
+
+tracker = GenerationTracker()
+
+
+def receive(payload):
+    """
+    Handle a message published by another worker.
+    """
+    try:
+        change = Change.decode(payload)
+    except ValueError:
+        logger.warning("ignoring malformed invalidation message")
+        return
+    stats["received"] += 1
+    tracker.seen(change.generation)
+    apply(change)
+
+
+# ------------------------ Collecting writes ------------------------
+
+def _changed_rows(session):
+    from models import Category, Ingredient, NutritionFacts, Recipe, RecipeIngredient, RecipeStep, Tag
+
+    change = Change()
+    for state, rows in (("new", session.new), ("dirty", session.dirty), ("deleted", session.deleted)):
+        for row in rows:
+            if state == "dirty" and not session.is_modified(row):
+                continue
+            if isinstance(row, Recipe):
+                change.recipes.add(row.id)
+            elif isinstance(row, (RecipeStep, NutritionFacts, RecipeIngredient)):
+                change.recipes.add(row.recipe_id)
+            elif isinstance(row, Tag) and state != "new":
+                change.tags.add(row.id)
+            elif isinstance(row, Category) and state != "new":
+                change.categories.add(row.id)
+            elif isinstance(row, Ingredient) and state != "new":
+                # Shared by many recipes; no reverse lookup
+                change.everything = True
+    change.recipes.discard(None)
+    return change
+
+
+@event.listens_for(Session, "after_flush")
+def _collect(session, flush_context):
+    change = _changed_rows(session)
+    if not change:
+        return
+    pending = session.info.setdefault("invalidation", Change())
+    pending.merge(change)
+    if bus is None:
+        return
+    connection = session.connection()
+    if pending.generation is None:
+        pending.generation = connection.execute(
+            update(cache_generation)
+            .where(cache_generation.c.id == 1)
+            .values(generation=cache_generation.c.generation + 1)
+            .returning(cache_generation.c.generation)
+        ).scalar()
+    bus.publish_in_transaction(connection, Change(
+        change.recipes, change.tags, change.categories, change.everything, pending.generation,
+    ))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish(session):
+    change = session.info.pop("invalidation", None)
+    if not change:
+        return
+    apply(change)
+    if bus is not None:
+        tracker.seen(change.generation)
+        bus.publish_after_commit(change)
+        stats["published"] += 1
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard(session):
+    session.info.pop("invalidation", None)
+
+
+# ------------------------ Backends ------------------------
+
+class Bus:
+    """
+    Base for the backends: a listener thread that also polls the shared generation.
+    """
+    name = None
+
+    def __init__(self, engine):
+        self.engine = engine
+        self._stop = threading.Event()
+        self._thread = None
+
+    def publish_in_transaction(self, connection, change):
+        pass
+
+    def publish_after_commit(self, change):
+        pass
+
+    def current_generation(self):
+        with self.engine.connect() as connection:
+            return connection.scalar(sql_select(cache_generation.c.generation).where(cache_generation.c.id == 1))
+
+    def check_generation(self):
+        grace = settings.invalidation_poll_interval_s * GAP_GRACE_INTERVALS
+        if tracker.lost(self.current_generation(), grace):
+            stats["gaps"] += 1
+            logger.warning("invalidation messages lost; clearing caches")
+            apply(Change(everything=True, remote=True))
+
+    def start(self):
+        tracker.start(self.current_generation())
+        self._thread = threading.Thread(target=self._run, name=f"invalidation-{self.name}", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is not None:
+            self._stop.set()
+            self._thread.join()
+            self._thread = None
+
+    def _run(self):
+        last_check = time.monotonic()
+        while not self._stop.is_set():
+            try:
+                self.listen(settings.invalidation_poll_interval_s)
+            except Exception:
+                logger.exception("invalidation listener failed; clearing caches and reconnecting")
+                self.reset()
+                apply(Change(everything=True, remote=True))
+                self._stop.wait(settings.invalidation_poll_interval_s)
+            if time.monotonic() - last_check >= settings.invalidation_poll_interval_s:
+                last_check = time.monotonic()
+                try:
+                    self.check_generation()
+                except Exception:
+                    logger.exception("cache generation check failed")
+        self.reset()
+
+    def listen(self, timeout):
+        """
+        Wait up to `timeout` seconds and hand any messages to receive().
+        """
+        raise NotImplementedError
+
+    def reset(self):
+        """
+        Drop the listening connection; listen() opens a new one.
+        """
+
+
+class PostgresBus(Bus):
+    name = "postgres"
+
+    def __init__(self, engine):
+        super().__init__(engine)
+        self._connection = None
+
+    def publish_in_transaction(self, connection, change):
+        # Delivered by PostgreSQL only if (and when) the transaction commits
+        connection.execute(sql_select(func.pg_notify(CHANNEL, change.encode())))
+
+    def listen(self, timeout):
+        if self._connection is None:
+            self._connection = self.engine.raw_connection()
+            driver_connection = self._connection.driver_connection
+            driver_connection.autocommit = True
+            with driver_connection.cursor() as cursor:
+                cursor.execute(f"LISTEN {CHANNEL}")
+        driver_connection = self._connection.driver_connection
+        if select.select([driver_connection], [], [], timeout) == ([], [], []):
+            return
+        driver_connection.poll()
+        while driver_connection.notifies:
+            receive(driver_connection.notifies.pop(0).payload)
+
+    def reset(self):
+        if self._connection is not None:
+            try:
+                self._connection.invalidate()
+            except Exception:
+                pass
+            self._connection = None
+
+
+class UnixSocketBus(Bus):
+    name = "unix"
+
+    def __init__(self, engine, directory):
+        super().__init__(engine)
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self._socket = None
+
+    def publish_after_commit(self, change):
+        payload = change.encode().encode()
+        sender = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        try:
+            for name in os.listdir(self.directory):
+                path = os.path.join(self.directory, name)
+                if not name.endswith(".sock") or path == self.path:
+                    continue
+                try:
+                    sender.sendto(payload, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    # Left behind by a worker that is gone
+                    _remove(path)
+                except OSError:
+                    logger.warning("invalidation message not delivered", extra={"socket": path})
+        finally:
+            sender.close()
+
+    def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        self._bind()
+        super().start()
+
+    def _bind(self):
+        _remove(self.path)
+        self._socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self._socket.bind(self.path)
+
+    def listen(self, timeout):
+        if self._socket is None:
+            self._bind()
+        self._socket.settimeout(timeout)
+        try:
+            payload = self._socket.recv(65536)
+        except socket.timeout:
+            return
+        receive(payload.decode())
+
+    def reset(self):
+        if self._socket is not None:
+            self._socket.close()
+            self._socket = None
+            _remove(self.path)
+
+
+def _remove(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+bus = None
+
+
+def start(engine):
+    """
+    Start listening with the configured backend; called from the app lifespan.
+    """
+    global bus
+    if bus is not None or not settings.invalidation_backend:
+        return
+    if settings.invalidation_backend == "postgres":
+        bus = PostgresBus(engine)
+    else:
+        bus = UnixSocketBus(engine, settings.invalidation_socket_dir)
+    bus.start()
+
+
+def stop():
+    global bus
+    if bus is not None:
+        bus.stop()
+        bus = None
@@ -0,0 +1,116 @@
+# services/meal_planner.py
+#
+# Meal-plan search. This module only depends on NumPy so it can be imported
+# cheaply by the process-pool workers that run `plan_meals`; NumPy itself is
+# imported on the first plan so the web workers start without it.
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+# Stop the local search after this many attempts in a row without improvement
+STALE_LIMIT = 2000
+
+_executor = None
+
+
+def get_executor() -> ProcessPoolExecutor:
+    """
+    Process pool shared by meal-plan requests, created on first use.
+    """
+    global _executor
+    if _executor is None:
+        # Imported here, so the pool workers importing this module do not read the configuration
+        from settings import settings
+
+        workers = settings.meal_plan_workers or None
+        _executor = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+        )
+    return _executor
+
+
+def shutdown_executor():
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
+
+
+def _day_cost(totals, goal):
+    return ((totals - goal) ** 2).sum(axis=-1)
+
+
+def plan_meals(per_serving, targets, days, meals_per_day, deadline, seed=None):
+    """
+    Choose days * meals_per_day distinct recipes whose daily totals best match
+    the targets.
+
+    `per_serving` is an (n, m) array of macros per serving and `targets` the m
+    daily goals. Each macro is expressed as a fraction of its target so they
+    weigh equally. A greedy pass fills the plan slot by slot, then a local search
+    replaces or swaps single meals until no move helps or `deadline`
+    (a time.time() value) passes.
+
+    Returns (plan, score, iterations, timed_out) where plan holds row indices
+    into `per_serving`, shaped (days, meals_per_day).
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    values = np.asarray(per_serving, dtype=np.float64) / targets
+    goal = np.ones(values.shape[1])
+    used = np.zeros(len(values), dtype=bool)
+    plan = np.empty((days, meals_per_day), dtype=np.int64)
+    totals = np.zeros((days, values.shape[1]))
+
+    # Greedy seed: aim each meal at an even share of what is left for the day
+    for day in range(days):
+        for meal in range(meals_per_day):
+            share = (goal - totals[day]) / (meals_per_day - meal)
+            distance = ((values - share) ** 2).sum(axis=1)
+            distance[used] = np.inf
+            pick = int(np.argmin(distance))
+            plan[day, meal] = pick
+            used[pick] = True
+            totals[day] += values[pick]
+
+    # Local search: replace one meal with the best unused recipe, or swap meals between days
+    iterations = 0
+    stale = 0
+    timed_out = False
+    while stale < STALE_LIMIT:
+        if time.time() >= deadline:
+            timed_out = True
+            break
+        iterations += 1
+        day = int(rng.integers(days))
+        meal = int(rng.integers(meals_per_day))
+        current = plan[day, meal]
+        base = totals[day] - values[current]
+
+        costs = _day_cost(base + values, goal)
+        costs[used] = np.inf
+        best = int(np.argmin(costs))
+        if costs[best] < _day_cost(totals[day], goal) - 1e-12:
+            used[current] = False
+            used[best] = True
+            plan[day, meal] = best
+            totals[day] = base + values[best]
+            stale = 0
+            continue
+
+        other_day = int(rng.integers(days))
+        if other_day != day:
+            other_meal = int(rng.integers(meals_per_day))
+            other = plan[other_day, other_meal]
+            new_day = base + values[other]
+            new_other_day = totals[other_day] - values[other] + values[current]
+            before = _day_cost(totals[day], goal) + _day_cost(totals[other_day], goal)
+            if _day_cost(new_day, goal) + _day_cost(new_other_day, goal) < before - 1e-12:
+                plan[day, meal], plan[other_day, other_meal] = other, current
+                totals[day], totals[other_day] = new_day, new_other_day
+                stale = 0
+                continue
+        stale += 1
+
+    return plan, float(_day_cost(totals, goal).sum()), iterations, timed_out
@@ -0,0 +1,118 @@
+# services/memory.py
+"""
+Peak memory per route, measured with tracemalloc.
+
+tracemalloc's peak is process-wide, so while MEMORY_PROFILING is on requests
+are handled one at a time and each request's peak above the memory in use
+when it started is charged to its route. This is a diagnostic mode for a
+local or staging instance, not for serving traffic.
+"""
+import asyncio
+import threading
+import tracemalloc
+import weakref
+
+
+class RouteMemoryStats:
+    __slots__ = ("requests", "peak_bytes_max", "peak_bytes_total", "peak_bytes_last")
+
+    def __init__(self):
+        self.requests = 0
+        self.peak_bytes_max = 0
+        self.peak_bytes_total = 0
+        self.peak_bytes_last = 0
+
+    def add(self, peak_bytes):
+        self.requests += 1
+        self.peak_bytes_max = max(self.peak_bytes_max, peak_bytes)
+        self.peak_bytes_total += peak_bytes
+        self.peak_bytes_last = peak_bytes
+
+    def as_dict(self):
+        return {
+            "requests": self.requests,
+            "peak_kib_max": round(self.peak_bytes_max / 1024, 1),
+            "peak_kib_avg": round(self.peak_bytes_total / 1024 / max(self.requests, 1), 1),
+            "peak_kib_last": round(self.peak_bytes_last / 1024, 1),
+        }
+
+
+class MemoryProfiler:
+    def __init__(self, frames=1):
+        self.frames = frames
+        self.routes = {}
+        self._lock = threading.Lock()
+        self._serial = None
+
+    @property
+    def enabled(self):
+        return self._serial is not None
+
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(self.frames)
+        self._serial = asyncio.Lock()
+
+    def _finish(self, route_key, before):
+        _, peak = tracemalloc.get_traced_memory()
+        with self._lock:
+            self.routes.setdefault(route_key(), RouteMemoryStats()).add(max(peak - before, 0))
+        self._serial.release()
+
+    async def measure(self, request, call_next, route_key):
+        """
+        Run one request alone and charge its peak allocation to `route_key()`.
+        The measurement ends when the body has been sent, so streamed
+        responses are counted in full, or when the response is dropped
+        unsent (a client that disconnected first).
+        """
+        await self._serial.acquire()
+        tracemalloc.reset_peak()
+        before, _ = tracemalloc.get_traced_memory()
+        try:
+            response = await call_next(request)
+        except BaseException:
+            self._finish(route_key, before)
+            raise
+
+        body_iterator = response.body_iterator
+        finished = False
+
+        def finish():
+            nonlocal finished
+            if not finished:
+                finished = True
+                self._finish(route_key, before)
+
+        async def measured_body():
+            try:
+                async for chunk in body_iterator:
+                    yield chunk
+            finally:
+                finish()
+
+        response.body_iterator = measured_body()
+        # A body never iterated never enters the try above; release the lock when it is collected
+        weakref.finalize(response.body_iterator, finish)
+        return response
+
+    def report(self, top=10):
+        current, peak = tracemalloc.get_traced_memory()
+        snapshot = tracemalloc.take_snapshot().filter_traces((
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        ))
+        with self._lock:
+            routes = {key: stats.as_dict() for key, stats in sorted(self.routes.items())}
+        return {
+            "traced_kib": round(current / 1024, 1),
+            "traced_peak_kib": round(peak / 1024, 1),
+            "routes": routes,
+            "top_allocations": [
+                {"location": str(stat.traceback[0]), "kib": round(stat.size / 1024, 1), "blocks": stat.count}
+                for stat in snapshot.statistics("lineno")[:top]
+            ],
+        }
+
+
+memory_profiler = MemoryProfiler()
@@ -0,0 +1,381 @@
+# services/metrics.py
+"""
+Prometheus-style metrics with per-thread counter shards.
+
+Each thread increments its own list of floats, so the hot path takes no lock;
+the shards are only summed when /metrics is scraped. With
+METRICS_MULTIPROC_DIR set, every worker process also writes a snapshot to that
+directory once a second and the scrape merges all of them: counters and
+histograms from every worker that ever ran, summed, and gauges only from live
+ones. A gauge is reported per worker with a `pid` label (a hit ratio or a
+file size does not add up across workers), unless it was registered with
+merge="sum". Clear the directory when the server is (re)started.
+"""
+import atexit
+import json
+import math
+import os
+import re
+import threading
+from bisect import bisect_left
+from functools import lru_cache
+
+from settings import settings
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+SIZE_BUCKETS = (100, 1_000, 10_000, 100_000, 1_000_000, 10_000_000)
+
+
+class _Shards:
+    """
+    A fixed-size vector of floats with one copy per thread.
+    """
+
+    __slots__ = ("_local", "_all", "_lock", "_size")
+
+    def __init__(self, size):
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+        self._size = size
+
+    def mine(self) -> list:
+        try:
+            return self._local.values
+        except AttributeError:
+            values = [0.0] * self._size
+            with self._lock:
+                self._all.append(values)
+            self._local.values = values
+            return values
+
+    def total(self) -> list:
+        with self._lock:
+            shards = list(self._all)
+        return [sum(column) for column in zip(*shards)] if shards else [0.0] * self._size
+
+
+class _CounterChild:
+    __slots__ = ("_shards",)
+
+    def __init__(self):
+        self._shards = _Shards(1)
+
+    def inc(self, amount=1.0):
+        self._shards.mine()[0] += amount
+
+    def dec(self, amount=1.0):
+        self._shards.mine()[0] -= amount
+
+    def samples(self, name, labels):
+        return [(name, labels, self._shards.total()[0])]
+
+
+class _HistogramChild:
+    __slots__ = ("_buckets", "_shards")
+
+    def __init__(self, buckets):
+        self._buckets = buckets
+        # One slot per bucket plus +Inf, then the sum
+        self._shards = _Shards(len(buckets) + 2)
+
+    def observe(self, value):
+        values = self._shards.mine()
+        values[bisect_left(self._buckets, value)] += 1
+        values[-1] += value
+
+    def samples(self, name, labels):
+        totals = self._shards.total()
+        samples = []
+        cumulative = 0.0
+        for bound, count in zip(self._buckets + (float("inf"),), totals):
+            cumulative += count
+            le = "+Inf" if bound == float("inf") else repr(float(bound))
+            samples.append((f"{name}_bucket", labels + (("le", le),), cumulative))
+        samples.append((f"{name}_count", labels, cumulative))
+        samples.append((f"{name}_sum", labels, totals[-1]))
+        return samples
+
+
+class Metric:
+    """
+    A metric family. Label combinations are created on first use under a lock;
+    after that `labels()` is a dict lookup.
+    """
+
+    def __init__(self, name, help, kind, labelnames=(), buckets=DEFAULT_BUCKETS, merge=None):
+        self.name = name
+        self.help = help
+        self.kind = kind
+        # How a gauge combines across workers: "worker" (one sample per pid) or "sum"
+        self.merge = merge
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.get(values)
+                if child is None:
+                    child = _HistogramChild(self.buckets) if self.kind == "histogram" else _CounterChild()
+                    self._children[values] = child
+        return child
+
+    def collect(self):
+        samples = []
+        for values, child in list(self._children.items()):
+            samples.extend(child.samples(self.name, tuple(zip(self.labelnames, values))))
+        return samples
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._collectors = []
+
+    def counter(self, name, help, labelnames=()):
+        return self._register(Metric(name, help, "counter", labelnames))
+
+    def gauge(self, name, help, labelnames=(), merge="worker"):
+        return self._register(Metric(name, help, "gauge", labelnames, merge=merge))
+
+    def histogram(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        return self._register(Metric(name, help, "histogram", labelnames, buckets))
+
+    def _register(self, metric):
+        self._metrics[metric.name] = metric
+        return metric
+
+    def add_collector(self, collect):
+        """
+        Register a callable run at scrape time that returns
+        [(name, kind, help, [(labels_dict, value), ...]), ...] for values read on demand.
+        """
+        self._collectors.append(collect)
+
+    def snapshot(self) -> dict:
+        families = {}
+        for metric in self._metrics.values():
+            families[metric.name] = {
+                "kind": metric.kind,
+                "help": metric.help,
+                "merge": metric.merge,
+                "samples": [[name, list(labels), value] for name, labels, value in metric.collect()],
+            }
+        for collect in self._collectors:
+            for name, kind, help, values in collect():
+                family = families.setdefault(name, {"kind": kind, "help": help, "samples": []})
+                family["samples"].extend(
+                    [name, sorted(labels.items()), value] for labels, value in values
+                )
+        return families
+
+
+registry = Registry()
+
+
+# ------------------------ Application metrics ------------------------
+
+http_requests = registry.counter(
+    "http_requests_total", "HTTP requests by route template and status", ("method", "route", "status"))
+http_duration = registry.histogram(
+    "http_request_duration_seconds", "HTTP request latency", ("method", "route"))
+http_request_size = registry.histogram(
+    "http_request_size_bytes", "HTTP request body size", ("route",), SIZE_BUCKETS)
+http_response_size = registry.histogram(
+    "http_response_size_bytes", "HTTP response body size", ("route",), SIZE_BUCKETS)
+http_in_flight = registry.gauge(
+    "http_requests_in_flight", "HTTP requests being handled", merge="sum")
+db_statements = registry.counter(
+    "db_statements_total", "SQL statements executed by operation and main table", ("operation", "table"))
+
+_STATEMENT_TARGET = re.compile(
+    r"\b(?:FROM|INTO|UPDATE|TABLE(?:\s+IF\s+(?:NOT\s+)?EXISTS)?)\s+\"?(\w+)"
+    r"|\bINDEX\b.*?\bON\s+\"?(\w+)",
+    re.IGNORECASE | re.DOTALL,
+)
+
+
+@lru_cache(maxsize=2048)
+def _statement_labels(statement: str):
+    operation = statement.lstrip().split(None, 1)[0].upper() if statement.strip() else "UNKNOWN"
+    match = _STATEMENT_TARGET.search(statement)
+    return operation, (match.group(1) or match.group(2)).lower() if match else "none"
+
+
+def count_statement(statement: str):
+    db_statements.labels(*_statement_labels(statement)).inc()
+
+
+def observe_request(method, route, status, seconds, request_bytes, response_bytes):
+    route = route or "unmatched"
+    http_requests.labels(method, route, str(status)).inc()
+    http_duration.labels(method, route).observe(seconds)
+    if request_bytes is not None:
+        http_request_size.labels(route).observe(request_bytes)
+    if response_bytes is not None:
+        http_response_size.labels(route).observe(response_bytes)
+
+
+# Caches reporting hit ratios: name -> callable returning (hits, misses)
+_caches = {}
+
+
+def register_cache(name, info):
+    _caches[name] = info
+
+
+def register_lru_cache(name, function):
+    register_cache(name, lambda: (function.cache_info().hits, function.cache_info().misses))
+
+
+def _collect_caches():
+    hits, misses, ratios = [], [], []
+    for name, info in list(_caches.items()):
+        cache_hits, cache_misses = info()
+        hits.append(({"cache": name}, cache_hits))
+        misses.append(({"cache": name}, cache_misses))
+        ratios.append(({"cache": name}, cache_hits / (cache_hits + cache_misses) if cache_hits + cache_misses else 0.0))
+    return [
+        ("cache_hits_total", "counter", "Cache hits", hits),
+        ("cache_misses_total", "counter", "Cache misses", misses),
+        ("cache_hit_ratio", "gauge", "Cache hits / lookups", ratios),
+    ]
+
+
+registry.add_collector(_collect_caches)
+
+
+# ------------------------ Multi-process support ------------------------
+
+def _snapshot_path(pid):
+    return os.path.join(settings.metrics_multiproc_dir, f"metrics-{pid}.json")
+
+
+def write_snapshot():
+    """
+    Write this process's current values for other workers' scrapes.
+    """
+    path = _snapshot_path(os.getpid())
+    temporary = f"{path}.{threading.get_ident()}.tmp"
+    with open(temporary, "w") as snapshot_file:
+        json.dump({"pid": os.getpid(), "families": registry.snapshot()}, snapshot_file)
+    os.replace(temporary, path)
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_flusher = None
+_stop_flushing = threading.Event()
+
+
+def start_snapshot_writer(interval=1.0):
+    """
+    Start the background thread that keeps this worker's snapshot file fresh.
+    """
+    global _flusher
+    if not settings.metrics_multiproc_dir or _flusher is not None:
+        return
+    os.makedirs(settings.metrics_multiproc_dir, exist_ok=True)
+
+    def flush_until_stopped():
+        while not _stop_flushing.wait(interval):
+            try:
+                write_snapshot()
+            except OSError:
+                pass
+
+    def final_flush():
+        _stop_flushing.set()
+        _flusher.join()
+        write_snapshot()
+
+    _flusher = threading.Thread(target=flush_until_stopped, name="metrics-snapshot", daemon=True)
+    _flusher.start()
+    atexit.register(final_flush)
+
+
+def _all_snapshots():
+    """
+    (pid, families) for this process and every other worker's snapshot.
+    """
+    yield os.getpid(), registry.snapshot()
+    directory = settings.metrics_multiproc_dir
+    if not directory or not os.path.isdir(directory):
+        return
+    for file_name in os.listdir(directory):
+        match = re.fullmatch(r"metrics-(\d+)\.json", file_name)
+        if not match or int(match.group(1)) == os.getpid():
+            continue
+        try:
+            with open(os.path.join(directory, file_name)) as snapshot_file:
+                snapshot = json.load(snapshot_file)
+        except (OSError, ValueError):
+            continue
+        families = snapshot["families"]
+        if not _pid_alive(snapshot["pid"]):
+            # Gauges of exited workers no longer describe anything
+            families = {name: family for name, family in families.items() if family["kind"] != "gauge"}
+        yield snapshot["pid"], families
+
+
+# ------------------------ Exposition ------------------------
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    escaped = (
+        f'{key}="{str(value).replace(chr(92), chr(92) * 2).replace(chr(10), "").replace(chr(34), chr(92) + chr(34))}"'
+        for key, value in labels
+    )
+    return "{" + ",".join(escaped) + "}"
+
+
+def _format_value(value):
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    # Every digit: counters and sums keep growing, and rate() needs them exact
+    if value.is_integer() and abs(value) < 2 ** 53:
+        return str(int(value))
+    return repr(value)
+
+
+def render() -> str:
+    """
+    Render every worker's metrics in the Prometheus text format.
+    """
+    multiprocess = bool(settings.metrics_multiproc_dir)
+    merged = {}
+    for pid, families in _all_snapshots():
+        for name, family in families.items():
+            target = merged.setdefault(name, {"kind": family["kind"], "help": family["help"], "samples": {}})
+            # Collector gauges carry no merge mode and are kept per worker
+            per_worker = multiprocess and family["kind"] == "gauge" and family.get("merge") != "sum"
+            for sample_name, labels, value in family["samples"]:
+                labels = tuple(tuple(pair) for pair in labels)
+                if per_worker:
+                    labels += (("pid", str(pid)),)
+                key = (sample_name, labels)
+                target["samples"][key] = target["samples"].get(key, 0.0) + value
+
+    lines = []
+    for name, family in sorted(merged.items()):
+        lines.append(f"# HELP {name} {family['help']}")
+        lines.append(f"# TYPE {name} {family['kind']}")
+        for (sample_name, labels), value in family["samples"].items():
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,196 @@
+# services/nutrition_index.py
+import threading
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from models import Recipe, NutritionFacts
+from services import invalidation
+
+# Column order of the macro matrix
+MACROS = ("calories", "protein", "fat", "carbohydrates")
+
+# Rows compared per step of the brute-force search
+BLOCK_SIZE = 4096
+
+
+def _to_float(value):
+    """
+    Coerce a stored nutrition value to a float, or NaN when it is missing or not numeric.
+    """
+    if value is None:
+        return np.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return np.nan
+
+
+class NutritionIndex:
+    """
+    In-memory matrix of per-serving macros for every live recipe.
+
+    The matrix is built from the database on first use and then kept current by
+    the write paths calling `upsert` / `remove`, so queries never scan the tables.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._ids = np.empty(0, dtype=np.int64)
+        self._matrix = np.empty((0, len(MACROS)), dtype=np.float64)
+        self._size = 0
+        self._rows = {}  # recipe id -> row in the matrix
+
+    # ------------------------ Loading ------------------------
+
+    def ensure_loaded(self, db: Session):
+        if self._loaded:
+            return
+        rows = (
+            db.query(
+                Recipe.id,
+                Recipe.servings,
+                NutritionFacts.calories,
+                NutritionFacts.protein,
+                NutritionFacts.fat,
+                NutritionFacts.carbohydrates,
+            )
+            .join(NutritionFacts, NutritionFacts.recipe_id == Recipe.id)
+            .filter(Recipe.deleted.is_(False), NutritionFacts.deleted.is_(False))
+            .all()
+        )
+        with self._lock:
+            if self._loaded:
+                return
+            self._ids = np.empty(max(len(rows), 16), dtype=np.int64)
+            self._matrix = np.empty((len(self._ids), len(MACROS)), dtype=np.float64)
+            self._size = 0
+            self._rows = {}
+            for recipe_id, servings, *macros in rows:
+                self._put(recipe_id, servings, macros)
+            self._loaded = True
+
+    def invalidate(self):
+        """
+        Drop the matrix so the next query rebuilds it from the database.
+        """
+        with self._lock:
+            self._loaded = False
+
+    # ------------------------ Incremental updates ------------------------
+
+    def upsert(self, recipe: Recipe):
+        """
+        Add or refresh a recipe after it has been written.
+        """
+        facts = recipe.nutrition_facts
+        if recipe.deleted or facts is None or facts.deleted:
+            self.remove(recipe.id)
+            return
+        macros = [getattr(facts, name) for name in MACROS]
+        with self._lock:
+            if self._loaded:
+                self._put(recipe.id, recipe.servings, macros)
+
+    def remove(self, recipe_id: int):
+        with self._lock:
+            row = self._rows.pop(recipe_id, None)
+            if row is None:
+                return
+            # Move the last row into the freed slot to keep the matrix dense
+            last = self._size - 1
+            if row != last:
+                moved_id = int(self._ids[last])
+                self._ids[row] = moved_id
+                self._matrix[row] = self._matrix[last]
+                self._rows[moved_id] = row
+            self._size = last
+
+    def _put(self, recipe_id, servings, macros):
+        values = np.array([_to_float(value) for value in macros], dtype=np.float64)
+        values /= servings if servings and servings > 0 else 1
+        row = self._rows.get(recipe_id)
+        if row is None:
+            if self._size == len(self._ids):
+                self._grow()
+            row = self._size
+            self._size += 1
+            self._rows[recipe_id] = row
+            self._ids[row] = recipe_id
+        self._matrix[row] = values
+
+    def _grow(self):
+        capacity = max(16, len(self._ids) * 2)
+        ids = np.empty(capacity, dtype=np.int64)
+        matrix = np.empty((capacity, len(MACROS)), dtype=np.float64)
+        ids[:self._size] = self._ids[:self._size]
+        matrix[:self._size] = self._matrix[:self._size]
+        self._ids, self._matrix = ids, matrix
+
+    # ------------------------ Queries ------------------------
+
+    def nearest(self, db: Session, target: dict, k: int):
+        """
+        Return up to k (recipe_id, per_serving_macros, distance) tuples closest to the
+        target, comparing only the macros present in `target`.
+
+        Each macro is divided by its spread across the catalog so that calories do
+        not drown out grams of protein.
+        """
+        self.ensure_loaded(db)
+        columns = [i for i, name in enumerate(MACROS) if target.get(name) is not None]
+        goal = np.array([target[MACROS[i]] for i in columns], dtype=np.float64)
+
+        with self._lock:
+            return self._search(columns, goal, k)
+
+    def _search(self, columns, goal, k):
+        ids = self._ids[:self._size]
+        matrix = self._matrix[:self._size]
+        candidates = ~np.isnan(matrix[:, columns]).any(axis=1)
+        if not candidates.any():
+            return []
+
+        scale = matrix[candidates][:, columns].std(axis=0)
+        scale[scale == 0] = 1.0
+        goal = goal / scale
+
+        best_rows = np.empty(0, dtype=np.int64)
+        best_dist = np.empty(0, dtype=np.float64)
+        for start in range(0, len(ids), BLOCK_SIZE):
+            block = matrix[start:start + BLOCK_SIZE, columns] / scale
+            dist = ((block - goal) ** 2).sum(axis=1)
+            rows = np.arange(start, start + len(block))
+            usable = candidates[start:start + BLOCK_SIZE]
+            dist, rows = dist[usable], rows[usable]
+            if len(dist) > k:
+                keep = np.argpartition(dist, k)[:k]
+                dist, rows = dist[keep], rows[keep]
+            best_rows = np.concatenate([best_rows, rows])
+            best_dist = np.concatenate([best_dist, dist])
+            if len(best_dist) > k:
+                keep = np.argpartition(best_dist, k)[:k]
+                best_rows, best_dist = best_rows[keep], best_dist[keep]
+
+        order = np.argsort(best_dist, kind="stable")
+        return [
+            (
+                int(ids[row]),
+                {name: (None if np.isnan(value) else round(float(value), 2))
+                 for name, value in zip(MACROS, matrix[row])},
+                float(np.sqrt(distance)),
+            )
+            for row, distance in zip(best_rows[order], best_dist[order])
+        ]
+
+
+# Shared per-process index used by the recipe routes
+nutrition_index = NutritionIndex()
+
+
+@invalidation.subscribe
+def _rebuild_after_remote_writes(change):
+    # Local writes upsert directly; other workers' writes are only known by id
+    if change.remote and (change.recipes or change.everything):
+        nutrition_index.invalidate()
@@ -0,0 +1,118 @@
+# services/pool_stats.py
+import threading
+import time
+
+from sqlalchemy.exc import TimeoutError as PoolTimeoutError
+from sqlalchemy.pool import QueuePool, AsyncAdaptedQueuePool
+
+
+class CheckoutStats:
+    """
+    Running totals of how long requests waited to check out a pooled connection.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.wait_seconds_total = 0.0
+        self.wait_seconds_max = 0.0
+
+    def record(self, seconds: float, timed_out: bool = False):
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.wait_seconds_total += seconds
+            self.wait_seconds_max = max(self.wait_seconds_max, seconds)
+
+    def record_error(self):
+        # A checkout that failed while connecting: not a wait for the pool
+        with self._lock:
+            self.errors += 1
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "checkouts": self.checkouts,
+                "checkout_timeouts": self.timeouts,
+                "checkout_errors": self.errors,
+                "checkout_wait_ms_total": round(self.wait_seconds_total * 1000, 3),
+                "checkout_wait_ms_avg": round(
+                    self.wait_seconds_total * 1000 / max(self.checkouts + self.timeouts, 1), 3
+                ),
+                "checkout_wait_ms_max": round(self.wait_seconds_max * 1000, 3),
+            }
+
+
+def _timed_get(pool, get):
+    started = time.perf_counter()
+    try:
+        connection = get()
+    except PoolTimeoutError:
+        pool.checkout_stats.record(time.perf_counter() - started, timed_out=True)
+        raise
+    except Exception:
+        pool.checkout_stats.record_error()
+        raise
+    pool.checkout_stats.record(time.perf_counter() - started)
+    return connection
+
+
+class InstrumentedQueuePool(QueuePool):
+    """
+    QueuePool that records the time spent waiting for each checkout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def _do_get(self):
+        return _timed_get(self, super()._do_get)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+
+class InstrumentedAsyncQueuePool(AsyncAdaptedQueuePool):
+    """
+    Async-adapted variant of InstrumentedQueuePool for the async engine.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.checkout_stats = CheckoutStats()
+
+    def _do_get(self):
+        return _timed_get(self, super()._do_get)
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.checkout_stats = self.checkout_stats
+        return pool
+
+
+def pool_gauges(engine) -> dict:
+    """
+    Current occupancy of an engine's pool plus its checkout wait totals.
+    """
+    if engine is None:
+        return None
+    pool = engine.pool
+    gauges = {"pool_class": type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        gauges.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            idle=pool.checkedin(),
+            overflow=max(pool.overflow(), 0),
+        )
+    stats = getattr(pool, "checkout_stats", None)
+    if stats is not None:
+        gauges.update(stats.snapshot())
+    return gauges
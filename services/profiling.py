@@ -0,0 +1,220 @@
+# services/profiling.py
+"""
+Opt-in profiling of single requests.
+
+A request carrying an X-Profile-Token header equal to PROFILE_TOKEN (and
+picked by PROFILE_SAMPLE_RATE) runs its endpoint under cProfile and a stack
+sampler, in whichever thread executes it. Three files land in PROFILE_DIR:
+
+    <id>.prof       pstats data (python -m pstats, snakeviz)
+    <id>.collapsed  sampled stacks for flamegraph.pl / speedscope
+    <id>.sql.json   every statement the request ran, with its duration
+
+The profile id is returned in the X-Profile-Id response header. For async
+endpoints the event loop thread is shared, so other requests running at the
+same moment show up in the profile too.
+
+One request is profiled at a time per process: cProfile hooks the whole
+interpreter (sys.monitoring on Python 3.12+, the thread's profile hook
+before), so a second profiler would fail or corrupt the first. A request
+that asks while another is being profiled runs unprofiled, without the
+X-Profile-Id header.
+"""
+import cProfile
+import hmac
+import inspect
+import json
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from functools import wraps
+
+from fastapi.routing import APIRoute
+from starlette.concurrency import run_in_threadpool
+
+from settings import settings
+from services.request_stats import current_stats, normalize_sql
+
+PROFILE_HEADER = "x-profile-token"
+
+_session = ContextVar("profile_session", default=None)
+# Held while a request is profiled; see the module docstring
+_profile_lock = threading.Lock()
+
+
+class StackSampler:
+    """
+    Samples one thread's Python stack at a fixed interval and counts the
+    collapsed stacks.
+    """
+
+    def __init__(self, thread_id, interval=0.001):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="profile-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._thread.join()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            names = []
+            while frame is not None:
+                code = frame.f_code
+                names.append(f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})")
+                frame = frame.f_back
+            self.stacks[";".join(reversed(names))] += 1
+
+    def collapsed(self) -> str:
+        return "".join(f"{stack} {count}\n" for stack, count in self.stacks.most_common())
+
+
+class ProfileSession:
+    """
+    Profiling state for one request.
+    """
+
+    def __init__(self, request):
+        self.method = request.method
+        self.path = request.url.path
+        self.profile_id = f"{time.strftime('%Y%m%d-%H%M%S')}-{uuid.uuid4().hex[:8]}"
+        self.profiler = cProfile.Profile()
+        self.sampler = None
+        self.seconds = 0.0
+        self.statements = []
+        stats = current_stats()
+        if stats is not None:
+            stats.statement_log = self.statements
+
+    def start(self):
+        # Enabled before the sampler starts, so a failure leaves no thread behind
+        try:
+            self.profiler.enable()
+        except ValueError:
+            # Another profiling tool (a debugger, coverage) holds sys.monitoring: sample only
+            self.profiler = None
+        self.sampler = StackSampler(threading.get_ident())
+        self.sampler.start()
+        self._started = time.perf_counter()
+
+    def stop(self):
+        if self.profiler is not None:
+            self.profiler.disable()
+        self.seconds = time.perf_counter() - self._started
+        self.sampler.stop()
+
+    def write(self, directory):
+        """
+        Write the profile files and return the profile id.
+        """
+        os.makedirs(directory, exist_ok=True)
+        base = os.path.join(directory, self.profile_id)
+        if self.profiler is not None:
+            self.profiler.dump_stats(f"{base}.prof")
+        if self.sampler is not None:
+            with open(f"{base}.collapsed", "w") as collapsed_file:
+                collapsed_file.write(self.sampler.collapsed())
+        with open(f"{base}.sql.json", "w") as sql_file:
+            json.dump({
+                "method": self.method,
+                "path": self.path,
+                "endpoint_ms": round(self.seconds * 1000, 3),
+                "statements": [
+                    {"sql": statement, "shape": normalize_sql(statement), "parameters": repr(parameters)[:1000],
+                     "duration_ms": round(seconds * 1000, 3)}
+                    for statement, parameters, seconds in self.statements
+                ],
+            }, sql_file, indent=2)
+        return self.profile_id
+
+
+def should_profile(request) -> bool:
+    token = request.headers.get(PROFILE_HEADER)
+    if not settings.profile_token or not token:
+        return False
+    if not hmac.compare_digest(token.encode(), settings.profile_token.encode()):
+        return False
+    return random.random() < settings.profile_sample_rate
+
+
+def profiled(endpoint):
+    """
+    Wrap an endpoint so it runs under the current request's profiler, if any.
+    The wrapper keeps the endpoint's signature, so FastAPI sees the same
+    parameters and dependencies. Wrapping a wrapped endpoint returns it as it
+    is: include_router rebuilds each route with its (already wrapped) endpoint.
+    """
+    if getattr(endpoint, "__profiled__", False):
+        return endpoint
+    if inspect.iscoroutinefunction(endpoint):
+        @wraps(endpoint)
+        async def profiled_endpoint(*args, **kwargs):
+            session = _session.get()
+            if session is None:
+                return await endpoint(*args, **kwargs)
+            session.start()
+            try:
+                return await endpoint(*args, **kwargs)
+            finally:
+                session.stop()
+    else:
+        @wraps(endpoint)
+        def profiled_endpoint(*args, **kwargs):
+            session = _session.get()
+            if session is None:
+                return endpoint(*args, **kwargs)
+            session.start()
+            try:
+                return endpoint(*args, **kwargs)
+            finally:
+                session.stop()
+    profiled_endpoint.__profiled__ = True
+    return profiled_endpoint
+
+
+class ProfilingRoute(APIRoute):
+    """
+    APIRoute that profiles requests opted in with the profile token header.
+    Use it as a router's route_class.
+    """
+
+    def __init__(self, path, endpoint, **kwargs):
+        super().__init__(path, profiled(endpoint), **kwargs)
+
+    def get_route_handler(self):
+        handler = super().get_route_handler()
+
+        async def profiling_route_handler(request):
+            if not should_profile(request) or not _profile_lock.acquire(blocking=False):
+                return await handler(request)
+            try:
+                session = ProfileSession(request)
+                token = _session.set(session)
+                try:
+                    response = await handler(request)
+                except Exception:
+                    # Keep the profile of failing requests too (e.g. a 404 raised as HTTPException)
+                    await run_in_threadpool(session.write, settings.profile_dir)
+                    raise
+                finally:
+                    _session.reset(token)
+                response.headers["X-Profile-Id"] = await run_in_threadpool(session.write, settings.profile_dir)
+                return response
+            finally:
+                _profile_lock.release()
+
+        return profiling_route_handler
@@ -0,0 +1,142 @@
+# services/recipe_cache.py
+"""
+In-process cache of serialized recipes for the recipe read endpoints, in
+front of the shared tier (services/shared_cache.py).
+
+Documents are stored unscaled, as built by recipe_to_dict, and evicted least
+recently used past RECIPE_CACHE_SIZE. Request counts per recipe are kept
+alongside so the warm-up (services/warmup.py) can preload the recipes asked
+for most often after a restart.
+"""
+import json
+import os
+import threading
+from collections import Counter, OrderedDict
+
+from services import invalidation
+from settings import settings
+
+# Request counts kept for at most this many recipes
+MAX_TRACKED = 10000
+
+
+class RecipeDocumentCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        # Bumped by every invalidation; a document loaded before one is not cached
+        self.epoch = 0
+        self._documents = OrderedDict()
+        self._requests = Counter()
+        self._lock = threading.Lock()
+
+    def _count_request(self, recipe_id):
+        self._requests[recipe_id] += 1
+        if len(self._requests) > MAX_TRACKED:
+            # Keep the busier half
+            self._requests = Counter(dict(self._requests.most_common(MAX_TRACKED // 2)))
+
+    def get(self, recipe_id):
+        with self._lock:
+            document = self._documents.get(recipe_id)
+            if document is None:
+                self.misses += 1
+                return None
+            self._documents.move_to_end(recipe_id)
+            self.hits += 1
+            self._count_request(recipe_id)
+            return document
+
+    def get_many(self, recipe_ids):
+        """
+        {recipe id: document} for the cached ones; not counted as requests, for listings.
+        """
+        documents = {}
+        with self._lock:
+            for recipe_id in recipe_ids:
+                document = self._documents.get(recipe_id)
+                if document is not None:
+                    self._documents.move_to_end(recipe_id)
+                    documents[recipe_id] = document
+            self.hits += len(documents)
+            self.misses += len(recipe_ids) - len(documents)
+        return documents
+
+    def put(self, recipe_id, document, requested=True, epoch=None):
+        """
+        Cache a document; `requested` counts it as a request (a miss that was then
+        loaded). Pass the `epoch` read before loading it so a document that an
+        invalidation may have made stale is not cached.
+        """
+        with self._lock:
+            if requested:
+                self._count_request(recipe_id)
+            if not self.max_size or (epoch is not None and epoch != self.epoch):
+                return
+            self._documents[recipe_id] = document
+            self._documents.move_to_end(recipe_id)
+            while len(self._documents) > self.max_size:
+                self._documents.popitem(last=False)
+
+    def invalidate(self, recipe_id=None):
+        """
+        Drop one recipe, or every recipe (after a write to shared vocabulary such as a tag rename).
+        """
+        with self._lock:
+            self.epoch += 1
+            if recipe_id is None:
+                self._documents.clear()
+            else:
+                self._documents.pop(recipe_id, None)
+
+    def __contains__(self, recipe_id):
+        return recipe_id in self._documents
+
+    def __len__(self):
+        return len(self._documents)
+
+    # ------------------------ Request history ------------------------
+
+    def most_requested(self, count):
+        with self._lock:
+            return [recipe_id for recipe_id, _ in self._requests.most_common(count)]
+
+    def save_history(self, path):
+        """
+        Merge this process's request counts into the file at `path`; older
+        counts are halved so the list follows current traffic.
+        """
+        counts = Counter({recipe_id: count / 2 for recipe_id, count in load_history(path).items()})
+        with self._lock:
+            counts.update(self._requests)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w") as history_file:
+            json.dump({str(recipe_id): count for recipe_id, count in counts.most_common(MAX_TRACKED)}, history_file)
+        os.replace(tmp_path, path)
+
+
+def load_history(path):
+    """
+    {recipe id: request count} saved by RecipeDocumentCache.save_history, or {}.
+    """
+    if not path or not os.path.exists(path):
+        return {}
+    try:
+        with open(path) as history_file:
+            return {int(recipe_id): count for recipe_id, count in json.load(history_file).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+recipe_cache = RecipeDocumentCache(settings.recipe_cache_size)
+
+
+@invalidation.subscribe
+def _evict(change):
+    # Documents embed tag and category names, so those changes drop everything
+    if change.everything or change.tags or change.categories:
+        recipe_cache.invalidate()
+        return
+    for recipe_id in change.recipes:
+        recipe_cache.invalidate(recipe_id)
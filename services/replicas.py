@@ -0,0 +1,292 @@
+# services/replicas.py
+"""
+Read-replica routing with read-your-writes consistency.
+
+With DATABASE_REPLICA_URLS set, sessions opened while serving a GET or HEAD
+request read from a replica, picked round-robin among the healthy ones and
+kept for the whole session so its reads see one consistent copy. Writes,
+flushes and every other request go to the primary.
+
+After a request commits a write, the response carries a consistency token
+(X-Consistency-Token header and cookie). On PostgreSQL it holds the
+primary's WAL position after the commit, and a replica serves the client's
+later reads only once it has replayed that far. Without WAL positions (SQLite
+for local testing, or a replica whose position is unknown) the token's commit
+time is used instead: for READ_YOUR_WRITES_WINDOW_S after a write the client
+reads from the primary. A client whose token no replica satisfies reads from
+the primary.
+
+A background thread checks each replica every REPLICA_CHECK_INTERVAL_S and
+records its replay position. Replicas that fail the check get no reads until
+they pass again.
+
+To try it locally, point DATABASE_URL and DATABASE_REPLICA_URLS at two SQLite
+files; benchmarks/replica_routing.py does this and checks the routing.
+"""
+import itertools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+
+from sqlalchemy import Delete, Insert, Update, event, text
+from sqlalchemy.orm import Session
+
+from settings import settings
+
+logger = logging.getLogger("cooknook.replicas")
+
+TOKEN_HEADER = "X-Consistency-Token"
+TOKEN_COOKIE = "cooknook_consistency"
+# Methods whose sessions may read from a replica
+READ_METHODS = frozenset({"GET", "HEAD"})
+# How long clients keep the token cookie; older writes are replicated anyway
+TOKEN_COOKIE_MAX_AGE = 3600
+
+
+# ------------------------ Consistency tokens ------------------------
+
+def parse_lsn(value):
+    """
+    PostgreSQL LSN text ("16/B374D848") as an integer, or None.
+    """
+    if not value:
+        return None
+    high, _, low = str(value).partition("/")
+    try:
+        return (int(high, 16) << 32) | int(low, 16)
+    except ValueError:
+        return None
+
+
+def format_lsn(lsn):
+    return None if lsn is None else f"{lsn >> 32:X}/{lsn & 0xFFFFFFFF:X}"
+
+
+def format_token(written_at, lsn=None):
+    """
+    "<commit time>" or "<commit time>:<LSN as one hex number>", using only
+    characters that need no quoting in a cookie.
+    """
+    token = f"{written_at:.3f}"
+    if lsn is not None:
+        token += f":{lsn:X}"
+    return token
+
+
+def parse_token(token):
+    """
+    (written_at, lsn) from a token made by format_token; (None, None) when
+    missing or malformed.
+    """
+    written_at, _, lsn = (token or "").partition(":")
+    try:
+        return float(written_at), int(lsn, 16) if lsn else None
+    except ValueError:
+        return None, None
+
+
+class RoutingContext:
+    """
+    Per-request routing state, shared with the endpoint's sessions.
+    """
+    __slots__ = ("read_only", "written_at", "lsn", "token")
+
+    def __init__(self, read_only, token=None):
+        self.read_only = read_only
+        self.written_at, self.lsn = parse_token(token)
+        # Set when the request commits a write
+        self.token = None
+
+
+_context = ContextVar("replica_routing", default=None)
+
+
+def current_context():
+    """
+    The routing state of the request being served, or None outside route_reads.
+    """
+    return _context.get()
+
+
+# ------------------------ Replicas ------------------------
+
+class Replica:
+    __slots__ = ("engine", "async_engine", "healthy", "replay_lsn", "checked_at", "error")
+
+    def __init__(self, engine, async_engine=None):
+        self.engine = engine
+        self.async_engine = async_engine
+        self.healthy = False
+        self.replay_lsn = None
+        self.checked_at = None
+        self.error = None
+
+    def status(self):
+        return {
+            "url": self.engine.url.render_as_string(hide_password=True),
+            "healthy": self.healthy,
+            "replay_lsn": format_lsn(self.replay_lsn),
+            "checked_seconds_ago": round(time.time() - self.checked_at, 1) if self.checked_at else None,
+            "error": self.error,
+        }
+
+
+class ReplicaSet:
+    def __init__(self):
+        self.primary = None
+        self.replicas = []
+        self._cycle = itertools.count()
+        self._stop = threading.Event()
+        self._checker = None
+
+    @property
+    def enabled(self):
+        return bool(self.replicas)
+
+    def configure(self, primary, replicas):
+        self.primary = primary
+        self.replicas = replicas
+
+    def check(self):
+        """
+        Probe every replica once and record its health and replay position.
+        """
+        for replica in self.replicas:
+            try:
+                with replica.engine.connect() as connection:
+                    if replica.engine.dialect.name == "postgresql":
+                        replica.replay_lsn = parse_lsn(connection.scalar(text("SELECT pg_last_wal_replay_lsn()")))
+                    # Reads a table, so a replica without the schema fails too
+                    connection.scalar(text("SELECT COUNT(*) FROM schema_migrations"))
+                replica.healthy, replica.error = True, None
+            except Exception as exc:
+                if replica.healthy:
+                    logger.warning("replica failed its health check", extra={"error": str(exc)})
+                replica.healthy, replica.error = False, f"{type(exc).__name__}: {exc}"
+            replica.checked_at = time.time()
+
+    def choose(self, context, use_async=False):
+        """
+        The engine a read-only session should use for this client, or None for the primary.
+        """
+        candidates = [
+            replica for replica in self.replicas
+            if replica.healthy and self._caught_up(replica, context)
+        ]
+        if not candidates:
+            return None
+        replica = candidates[next(self._cycle) % len(candidates)]
+        return replica.async_engine.sync_engine if use_async else replica.engine
+
+    @staticmethod
+    def _caught_up(replica, context):
+        if context.written_at is None:
+            return True
+        if context.lsn is not None and replica.replay_lsn is not None:
+            return replica.replay_lsn >= context.lsn
+        return time.time() - context.written_at >= settings.read_your_writes_window_s
+
+    def written_token(self):
+        """
+        Token for a write just committed on the primary.
+        """
+        lsn = None
+        if self.primary.dialect.name == "postgresql":
+            with self.primary.connect() as connection:
+                lsn = parse_lsn(connection.scalar(text("SELECT pg_current_wal_lsn()")))
+        return format_token(time.time(), lsn)
+
+    # ------------------------ Health checks ------------------------
+
+    def start(self):
+        if not self.replicas or self._checker is not None:
+            return
+        self.check()
+        self._stop.clear()
+
+        def check_until_stopped():
+            while not self._stop.wait(settings.replica_check_interval_s):
+                self.check()
+
+        self._checker = threading.Thread(target=check_until_stopped, name="replica-health", daemon=True)
+        self._checker.start()
+
+    def stop(self):
+        if self._checker is not None:
+            self._stop.set()
+            self._checker.join()
+            self._checker = None
+
+
+replica_set = ReplicaSet()
+
+
+# ------------------------ Session ------------------------
+
+class RoutingSession(Session):
+    """
+    Session that reads from a replica while serving a read-only request.
+    """
+    # True for the sync sessions behind AsyncSession
+    use_async = False
+
+    def get_bind(self, mapper=None, clause=None, **kwargs):
+        context = _context.get()
+        if (
+            context is not None
+            and context.read_only
+            and not self._flushing
+            and not self.info.get("wrote")
+            and not isinstance(clause, (Insert, Update, Delete))
+        ):
+            # Keep the session on one replica so its reads see one copy
+            if "replica" not in self.info:
+                self.info["replica"] = replica_set.choose(context, self.use_async)
+            if self.info["replica"] is not None:
+                return self.info["replica"]
+        return super().get_bind(mapper=mapper, clause=clause, **kwargs)
+
+
+class AsyncRoutingSession(RoutingSession):
+    use_async = True
+
+
+def read_from_replica(session) -> bool:
+    """
+    True once `session` (or an AsyncSession) has read from a replica, which may lag the primary.
+    """
+    return session.info.get("replica") is not None
+
+
+@event.listens_for(RoutingSession, "after_flush")
+def _mark_write(session, flush_context):
+    session.info["wrote"] = True
+
+
+@event.listens_for(RoutingSession, "after_commit")
+def _issue_token(session):
+    if not session.info.pop("wrote", False):
+        return
+    context = _context.get()
+    if context is not None:
+        context.token = replica_set.written_token()
+
+
+# ------------------------ Middleware ------------------------
+
+async def route_reads(request, call_next):
+    """
+    Mark read-only requests for replica routing and hand clients that wrote a fresh token.
+    """
+    token = request.headers.get(TOKEN_HEADER) or request.cookies.get(TOKEN_COOKIE)
+    context = RoutingContext(request.method in READ_METHODS, token)
+    reset = _context.set(context)
+    try:
+        response = await call_next(request)
+    finally:
+        _context.reset(reset)
+    if context.token:
+        response.headers[TOKEN_HEADER] = context.token
+        response.set_cookie(TOKEN_COOKIE, context.token, max_age=TOKEN_COOKIE_MAX_AGE, httponly=True, samesite="lax")
+    return response
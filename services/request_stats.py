@@ -0,0 +1,152 @@
+# services/request_stats.py
+import logging
+import re
+import time
+from contextvars import ContextVar
+from functools import lru_cache
+
+from fastapi.responses import JSONResponse
+
+sql_logger = logging.getLogger("cooknook.sql")
+
+_current = ContextVar("request_stats", default=None)
+
+_STRING_LITERAL = re.compile(r"'(?:[^']|'')*'")
+_NUMBER_LITERAL = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PARAM_LIST = re.compile(r"\((?:\s*(?:\?|%\([^)]*\)s|:\w+|\$\d+)\s*,)+\s*(?:\?|%\([^)]*\)s|:\w+|\$\d+)\s*\)")
+_WHITESPACE = re.compile(r"\s+")
+
+
+@lru_cache(maxsize=2048)
+def normalize_sql(statement: str) -> str:
+    """
+    Reduce a statement to its shape: literals become ?, IN lists collapse to (?...),
+    and whitespace is squeezed, so repeated queries group together.
+    """
+    text = _STRING_LITERAL.sub("?", statement)
+    text = _NUMBER_LITERAL.sub("?", text)
+    text = _PARAM_LIST.sub("(?...)", text)
+    return _WHITESPACE.sub(" ", text).strip()
+
+
+class RequestStats:
+    """
+    Database and serialization timings collected while one request is handled.
+    The object is shared by reference with the worker thread or task running the
+    endpoint, which is why it is mutated rather than replaced.
+    """
+
+    __slots__ = (
+        "scope", "started", "statement_count", "db_seconds",
+        "slowest_seconds", "slowest_statement", "serialize_seconds", "statement_log",
+    )
+
+    def __init__(self, scope):
+        self.scope = scope
+        self.started = time.perf_counter()
+        self.statement_count = 0
+        self.db_seconds = 0.0
+        self.slowest_seconds = 0.0
+        self.slowest_statement = None
+        self.serialize_seconds = 0.0
+        # Set to a list to keep every statement (see services.profiling)
+        self.statement_log = None
+
+    @property
+    def route(self):
+        route = self.scope.get("route")
+        return getattr(route, "path", None)
+
+    def record_statement(self, statement: str, parameters, seconds: float):
+        self.statement_count += 1
+        if self.statement_log is not None:
+            self.statement_log.append((statement, parameters, seconds))
+        self.db_seconds += seconds
+        if seconds > self.slowest_seconds:
+            self.slowest_seconds = seconds
+            self.slowest_statement = statement
+
+    def server_timing(self, total_seconds: float) -> str:
+        app_seconds = max(total_seconds - self.db_seconds - self.serialize_seconds, 0.0)
+        return ", ".join((
+            f'db;dur={self.db_seconds * 1000:.2f};desc="{self.statement_count} queries"',
+            f"ser;dur={self.serialize_seconds * 1000:.2f}",
+            f"app;dur={app_seconds * 1000:.2f}",
+            f"total;dur={total_seconds * 1000:.2f}",
+        ))
+
+    def log_fields(self, total_seconds: float) -> dict:
+        return {
+            "route": self.route,
+            "duration_ms": round(total_seconds * 1000, 2),
+            "db_statements": self.statement_count,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "slowest_sql_ms": round(self.slowest_seconds * 1000, 2),
+            "slowest_sql": normalize_sql(self.slowest_statement) if self.slowest_statement else None,
+            "serialize_ms": round(self.serialize_seconds * 1000, 2),
+        }
+
+
+def begin_request(scope):
+    stats = RequestStats(scope)
+    return stats, _current.set(stats)
+
+
+def end_request(token):
+    _current.reset(token)
+
+
+def current_stats():
+    return _current.get()
+
+
+def record_statement(statement, parameters, seconds, slow_query_seconds):
+    """
+    Add one executed statement to the current request, logging it if it was slow.
+    """
+    stats = _current.get()
+    if stats is not None:
+        stats.record_statement(statement, parameters, seconds)
+    if seconds >= slow_query_seconds:
+        sql_logger.warning(
+            "slow query",
+            extra={
+                "duration_ms": round(seconds * 1000, 2),
+                "sql": normalize_sql(statement),
+                "parameters": repr(parameters)[:1000],
+                "route": stats.route if stats is not None else None,
+                "method": stats.scope.get("method") if stats is not None else None,
+            },
+        )
+
+
+class TimedJSONResponse(JSONResponse):
+    """
+    JSONResponse that charges its encoding time to the current request.
+    """
+
+    def render(self, content) -> bytes:
+        started = time.perf_counter()
+        body = super().render(content)
+        stats = _current.get()
+        if stats is not None:
+            stats.serialize_seconds += time.perf_counter() - started
+        return body
+
+
+class StructuredFormatter(logging.Formatter):
+    """
+    Log formatter that appends the record's extra fields as key=value pairs.
+    """
+
+    _STANDARD = set(vars(logging.makeLogRecord({}))) | {"message", "asctime"}
+
+    def format(self, record):
+        line = super().format(record)
+        fields = {
+            key: value for key, value in vars(record).items()
+            if key not in self._STANDARD
+        }
+        if not fields:
+            return line
+        return line + " " + " ".join(f"{key}={value!r}" for key, value in fields.items())
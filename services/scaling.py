@@ -0,0 +1,46 @@
+# services/scaling.py
+from services.units import scale_quantity
+
+NUTRIENTS = ("calories", "fat", "carbohydrates", "protein")
+
+
+def scale_recipe(document: dict, servings: int) -> dict:
+    """
+    Return a copy of a serialized recipe (see services.serializers.recipe_to_dict)
+    rescaled to the given number of servings.
+
+    Only the numeric quantity fields parsed on write are used, so this is pure
+    arithmetic. Ingredients whose quantity could not be parsed keep their text and
+    are marked "scaled": False.
+    """
+    original = document.get("servings") or 0
+    if original <= 0:
+        raise ValueError("Recipe has no servings count to scale from")
+    ratio = servings / original
+
+    ingredients = []
+    for ingredient in document["ingredients"]:
+        ingredient = dict(ingredient)
+        if ingredient.get("quantity_value") is None:
+            ingredient["scaled"] = False
+        else:
+            value, unit, text = scale_quantity(
+                ingredient["quantity_value"], ingredient["quantity_unit"], ratio
+            )
+            ingredient.update(quantity=text, quantity_value=value, quantity_unit=unit, scaled=True)
+        ingredients.append(ingredient)
+
+    nutrition = document.get("nutrition_facts")
+    if nutrition is not None:
+        nutrition = {
+            name: (round(nutrition[name] * ratio, 1) if nutrition.get(name) is not None else None)
+            for name in NUTRIENTS
+        }
+
+    return {
+        **document,
+        "servings": servings,
+        "scaled_from_servings": original,
+        "ingredients": ingredients,
+        "nutrition_facts": nutrition,
+    }
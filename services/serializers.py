@@ -0,0 +1,69 @@
+# services/serializers.py
+from sqlalchemy.orm import selectinload, joinedload
+
+from models import Recipe, RecipeIngredient
+
+# Relationships read by recipe_to_dict, loaded up front. Async sessions cannot
+# lazy-load, and on sync sessions it avoids a query per recipe per relationship.
+RECIPE_DOCUMENT_OPTIONS = (
+    selectinload(Recipe.instructions),
+    selectinload(Recipe.nutrition_facts),
+    selectinload(Recipe.ingredient_links).options(joinedload(RecipeIngredient.ingredient)),
+    selectinload(Recipe.categories),
+    selectinload(Recipe.tags),
+)
+
+
+def recipe_to_dict(recipe: Recipe) -> dict:
+    """
+    Build the JSON-ready dict returned by the recipe read endpoints.
+    """
+    return {
+        "id": recipe.id,
+        "title": recipe.title,
+        "prep_time_value": recipe.prep_time_value,
+        "prep_time_unit": recipe.prep_time_unit,
+        "cook_time_value": recipe.cook_time_value,
+        "cook_time_unit": recipe.cook_time_unit,
+        "total_time_minutes": recipe.total_time_minutes,
+        "servings": recipe.servings,
+        "image": recipe.image,
+        "instructions": [
+            {"step_number": step.step_number, "instruction": step.instruction}
+            for step in recipe.instructions if not step.deleted
+        ],
+        "nutrition_facts": {
+            "calories": recipe.nutrition_facts.calories,
+            "fat": recipe.nutrition_facts.fat,
+            "carbohydrates": recipe.nutrition_facts.carbohydrates,
+            "protein": recipe.nutrition_facts.protein,
+        } if recipe.nutrition_facts else None,
+        "ingredients": [
+            {
+                "item": link.ingredient.item,
+                "quantity": link.quantity,
+                "quantity_value": link.quantity_value,
+                "quantity_unit": link.quantity_unit,
+                "notes": link.notes,
+                "price": link.ingredient.price,
+                "currency": link.ingredient.currency,
+            }
+            for link in recipe.ingredient_links
+        ],
+        "categories": [category.name for category in recipe.categories],
+        "tags": [tag.name for tag in recipe.tags],
+    }
+
+
+def recipe_card(id, title, image, total_time_minutes, servings, calories_per_serving) -> dict:
+    """
+    The summary of a recipe returned by card listings.
+    """
+    return {
+        "id": id,
+        "title": title,
+        "image": image,
+        "total_time_minutes": total_time_minutes,
+        "servings": servings,
+        "calories_per_serving": calories_per_serving,
+    }
@@ -0,0 +1,441 @@
+# services/shared_cache.py
+"""
+Shared second cache tier for serialized recipes, below the per-worker LRU
+(services/recipe_cache.py).
+
+RECIPE_SHARED_CACHE_URL selects the store:
+
+    redis://host:6379/0   any server speaking the Redis protocol (RESP);
+                          spoken directly over a socket, no client library
+    memory://             an in-process stand-in with the same commands, for
+                          local runs and tests (shared by nothing but this worker)
+    (unset)               no shared tier
+
+Documents are stored as JSON, zlib-compressed above
+RECIPE_SHARED_CACHE_COMPRESS_BYTES, for RECIPE_SHARED_CACHE_TTL_S. Keys carry
+a version number so a change to shared vocabulary (a tag rename) drops every
+document with one INCR instead of a scan.
+
+The writing worker evicts the shared copies when it commits (through
+services/invalidation.py); the other workers only re-read the version.
+Eviction also bumps a per-recipe generation. Lookups read it in the same
+MGET as the documents, and a loader stores what it loaded tagged with the
+generation and key its lookup saw; entries tagged with an older generation
+are misses. So a document read before a write committed, but stored after
+the eviction, is never served. Documents read from a replica
+(services/replicas.py) are not stored, as the replica may still lag.
+
+A store that fails is skipped for STORE_RETRY_SECONDS: the shared tier is an
+optimization, and reads fall back to the database.
+"""
+import json
+import logging
+import queue
+import socket
+import threading
+import time
+import zlib
+from urllib.parse import urlparse
+
+from services import invalidation
+from settings import settings
+
+logger = logging.getLogger("cooknook.shared_cache")
+
+KEY_PREFIX = "cooknook:recipe"
+VERSION_KEY = f"{KEY_PREFIX}:version"
+GENERATION_KEY = f"{KEY_PREFIX}:gen"
+# How long a loader holds the lock on a missing document
+LOCK_TTL_MS = 5000
+# How often requests waiting on another loader look for its result
+LOCK_POLL_SECONDS = 0.01
+# How long a failed store is left alone
+STORE_RETRY_SECONDS = 5.0
+# Idle connections kept per worker
+MAX_IDLE_CONNECTIONS = 8
+
+
+class StoreError(Exception):
+    pass
+
+
+# ------------------------ Redis protocol ------------------------
+
+def _encode_command(args):
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode()
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def _read_reply(stream):
+    line = stream.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("connection closed by the cache server")
+    kind, rest = line[:1], line[1:-2]
+    if kind == b"+":
+        return rest
+    if kind == b"-":
+        raise StoreError(rest.decode(errors="replace"))
+    if kind == b":":
+        return int(rest)
+    if kind == b"$":
+        length = int(rest)
+        if length < 0:
+            return None
+        data = stream.read(length + 2)
+        if len(data) != length + 2:
+            raise ConnectionError("connection closed by the cache server")
+        return data[:-2]
+    if kind == b"*":
+        length = int(rest)
+        return None if length < 0 else [_read_reply(stream) for _ in range(length)]
+    raise StoreError(f"unexpected reply {line[:20]!r}")
+
+
+class RespStore:
+    """
+    Minimal client for a Redis-protocol server, with a small connection pool.
+    """
+    blocking = True
+
+    def __init__(self, url, timeout):
+        parsed = urlparse(url)
+        self.address = (parsed.hostname or "localhost", parsed.port or 6379)
+        self.password = parsed.password
+        self.db = int(parsed.path.strip("/") or 0)
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+
+    def _connect(self):
+        connection = socket.create_connection(self.address, timeout=self.timeout)
+        connection.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        stream = connection.makefile("rb")
+        setup = []
+        if self.password:
+            setup.append(("AUTH", self.password))
+        if self.db:
+            setup.append(("SELECT", self.db))
+        if setup:
+            connection.sendall(b"".join(_encode_command(command) for command in setup))
+            for _ in setup:
+                _read_reply(stream)
+        return connection, stream
+
+    def pipeline(self, commands):
+        """
+        Send every command in one write and return their replies in order.
+        """
+        try:
+            connection, stream = self._idle.get_nowait()
+        except queue.Empty:
+            connection, stream = self._connect()
+        try:
+            connection.sendall(b"".join(_encode_command(command) for command in commands))
+            replies = [_read_reply(stream) for _ in commands]
+        except Exception:
+            connection.close()
+            raise
+        if self._idle.qsize() < MAX_IDLE_CONNECTIONS:
+            self._idle.put((connection, stream))
+        else:
+            connection.close()
+        return replies
+
+    def execute(self, *command):
+        return self.pipeline([command])[0]
+
+    def close(self):
+        while not self._idle.empty():
+            self._idle.get_nowait()[0].close()
+
+
+class MemoryStore:
+    """
+    In-process stand-in for a Redis server, supporting the commands used here.
+    """
+    blocking = False
+
+    def __init__(self):
+        self._values = {}  # key -> (value, expires at or None)
+        self._lock = threading.Lock()
+
+    def _get(self, key):
+        entry = self._values.get(key)
+        if entry is None:
+            return None
+        if entry[1] is not None and entry[1] <= time.monotonic():
+            del self._values[key]
+            return None
+        return entry[0]
+
+    def _run(self, name, args):
+        name = name.upper()
+        if name == "PING":
+            return b"PONG"
+        if name == "GET":
+            return self._get(args[0])
+        if name == "MGET":
+            return [self._get(key) for key in args]
+        if name == "SET":
+            key, value, options = args[0], args[1], [str(option).upper() for option in args[2:]]
+            if "NX" in options and self._get(key) is not None:
+                return None
+            expires = None
+            if "PX" in options:
+                expires = time.monotonic() + int(options[options.index("PX") + 1]) / 1000
+            self._values[key] = (value if isinstance(value, bytes) else str(value).encode(), expires)
+            return b"OK"
+        if name == "DEL":
+            return sum(self._values.pop(key, None) is not None for key in args)
+        if name == "INCR":
+            value = int(self._get(args[0]) or 0) + 1
+            self._values[args[0]] = (str(value).encode(), None)
+            return value
+        if name == "PEXPIRE":
+            if self._get(args[0]) is None:
+                return 0
+            self._values[args[0]] = (self._values[args[0]][0], time.monotonic() + int(args[1]) / 1000)
+            return 1
+        if name == "FLUSHDB":
+            self._values.clear()
+            return b"OK"
+        raise StoreError(f"unknown command '{name}'")
+
+    def pipeline(self, commands):
+        with self._lock:
+            return [self._run(command[0], [str(arg) if isinstance(arg, int) else arg for arg in command[1:]])
+                    for command in commands]
+
+    def execute(self, *command):
+        return self.pipeline([command])[0]
+
+    def close(self):
+        pass
+
+
+# ------------------------ Document tier ------------------------
+
+def encode_document(document, compress_bytes):
+    payload = json.dumps(document, separators=(",", ":")).encode()
+    if compress_bytes and len(payload) > compress_bytes:
+        return b"z" + zlib.compress(payload, 1)
+    return b"j" + payload
+
+
+def tag_value(generation, value):
+    return b"%d:" % generation + value
+
+
+def untag_value(value):
+    """
+    (generation, encoded document) of a stored value.
+    """
+    generation, _, value = value.partition(b":")
+    return int(generation), value
+
+
+def decode_document(value):
+    payload = value[1:]
+    if value[:1] == b"z":
+        payload = zlib.decompress(payload)
+    return json.loads(payload)
+
+
+class SharedDocumentCache:
+    def __init__(self, store, ttl_seconds, compress_bytes):
+        self.store = store
+        self.ttl_ms = int(ttl_seconds * 1000)
+        self.compress_bytes = compress_bytes
+        self.hits = 0
+        self.misses = 0
+        self.errors = 0
+        self.lock_waits = 0
+        self.compressed = 0
+        self.stale = 0
+        self._version = None
+        self._down_until = 0.0
+
+    @property
+    def blocking(self):
+        # Blocking stores are called from the thread pool by async endpoints
+        return self.store.blocking
+
+    @property
+    def available(self):
+        return time.monotonic() >= self._down_until
+
+    def _call(self, commands, default):
+        if not self.available:
+            return default
+        try:
+            return self.store.pipeline(commands)
+        except (OSError, StoreError) as exc:
+            self.errors += 1
+            self._down_until = time.monotonic() + STORE_RETRY_SECONDS
+            logger.warning("shared cache unavailable; reading from the database", extra={"error": str(exc)})
+            return default
+
+    def _key(self, recipe_id):
+        if self._version is None:
+            self.refresh_version()
+        return f"{KEY_PREFIX}:v{self._version or 0}:{recipe_id}"
+
+    def _generation_key(self, recipe_id):
+        return f"{GENERATION_KEY}:{recipe_id}"
+
+    def refresh_version(self):
+        replies = self._call([("GET", VERSION_KEY)], None)
+        if replies is None:
+            # Unknown while the store is down: the next key asks again rather than assume version 0
+            self._version = None
+            return
+        (version,) = replies
+        self._version = int(version) if version is not None else 0
+
+    # ------------------------ Reads ------------------------
+
+    def lookup(self, recipe_ids, count=True):
+        """
+        ({recipe id: document} for those of `recipe_ids` in the store, {recipe id: fill token}
+        for the others), with one MGET. Store documents loaded after the lookup with put_many
+        and these tokens.
+        """
+        if not recipe_ids:
+            return {}, {}
+        keys = [self._key(recipe_id) for recipe_id in recipe_ids]
+        generation_keys = [self._generation_key(recipe_id) for recipe_id in recipe_ids]
+        (values,) = self._call([("MGET", *keys, *generation_keys)], [None])
+        values = values or [None] * (2 * len(recipe_ids))
+        documents, tokens = {}, {}
+        for recipe_id, key, value, generation in zip(recipe_ids, keys, values, values[len(recipe_ids):]):
+            generation = int(generation or 0)
+            document = self._decode(recipe_id, value, generation, count)
+            if document is None:
+                tokens[recipe_id] = (key, generation)
+            else:
+                documents[recipe_id] = document
+        if count:
+            self.hits += len(documents)
+            self.misses += len(recipe_ids) - len(documents)
+        return documents, tokens
+
+    def _decode(self, recipe_id, value, generation, count):
+        if value is None:
+            return None
+        try:
+            stored_generation, value = untag_value(value)
+            if stored_generation != generation:
+                # Loaded before a write to the recipe committed
+                self.stale += count
+                return None
+            return decode_document(value)
+        except (ValueError, zlib.error):
+            logger.warning("dropping unreadable shared cache entry", extra={"recipe_id": recipe_id})
+            return None
+
+    def get_many(self, recipe_ids, count=True):
+        return self.lookup(recipe_ids, count)[0]
+
+    def get(self, recipe_id, count=True):
+        return self.get_many([recipe_id], count).get(recipe_id)
+
+    # ------------------------ Writes ------------------------
+
+    def put_many(self, documents, tokens):
+        """
+        Store documents loaded after the lookup that returned `tokens`, under the key
+        and generation it saw.
+        """
+        commands = []
+        for recipe_id, document in documents.items():
+            if recipe_id not in tokens:
+                continue
+            key, generation = tokens[recipe_id]
+            value = encode_document(document, self.compress_bytes)
+            if value[:1] == b"z":
+                self.compressed += 1
+            commands.append(("SET", key, tag_value(generation, value), "PX", self.ttl_ms))
+        if commands:
+            self._call(commands, None)
+
+    def put(self, recipe_id, document, tokens):
+        self.put_many({recipe_id: document}, tokens)
+
+    # ------------------------ Stampede protection ------------------------
+
+    def lock(self, recipe_id):
+        """
+        True if this request should load `recipe_id`; False while another
+        request (in any worker) is loading it. Always True when the store is down.
+        """
+        (acquired,) = self._call([("SET", f"{KEY_PREFIX}:lock:{recipe_id}", "1", "NX", "PX", LOCK_TTL_MS)], [b"OK"])
+        if acquired is None:
+            self.lock_waits += 1
+        return acquired is not None
+
+    def unlock(self, recipe_id):
+        self._call([("DEL", f"{KEY_PREFIX}:lock:{recipe_id}")], None)
+
+    def wait_for(self, recipe_id, timeout):
+        """
+        The document another request is loading, or None after `timeout` seconds.
+        """
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            time.sleep(LOCK_POLL_SECONDS)
+            document = self.get(recipe_id, count=False)
+            if document is not None:
+                return document
+        return None
+
+    # ------------------------ Invalidation ------------------------
+
+    def evict(self, recipe_ids):
+        if not recipe_ids:
+            return
+        commands = [("DEL", *[self._key(recipe_id) for recipe_id in recipe_ids])]
+        for recipe_id in recipe_ids:
+            # Outlives any document tagged with the old generation, so it cannot reset under one
+            commands += [
+                ("INCR", self._generation_key(recipe_id)),
+                ("PEXPIRE", self._generation_key(recipe_id), 2 * self.ttl_ms),
+            ]
+        self._call(commands, None)
+
+    def evict_all(self):
+        (version,) = self._call([("INCR", VERSION_KEY)], [None])
+        if version is not None:
+            self._version = version
+
+    def close(self):
+        self.store.close()
+
+
+def open_store(url):
+    if url.startswith("memory:"):
+        return MemoryStore()
+    return RespStore(url, settings.recipe_shared_cache_timeout_s)
+
+
+shared_cache = None
+if settings.recipe_shared_cache_url:
+    shared_cache = SharedDocumentCache(
+        open_store(settings.recipe_shared_cache_url),
+        settings.recipe_shared_cache_ttl_s,
+        settings.recipe_shared_cache_compress_bytes,
+    )
+
+    @invalidation.subscribe
+    def _evict(change):
+        if change.remote:
+            # The writing worker evicted the shared copies; follow a version bump
+            if change.everything or change.tags or change.categories:
+                shared_cache.refresh_version()
+            return
+        if change.everything or change.tags or change.categories:
+            shared_cache.evict_all()
+        else:
+            shared_cache.evict(sorted(change.recipes))
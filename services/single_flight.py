@@ -0,0 +1,125 @@
+# services/single_flight.py
+"""
+Request coalescing for identical concurrent reads.
+
+While a load for a key is running, other requests for the same key wait for
+its result instead of running the same queries again. The leader's exception
+is raised in every waiting request. Waiting is bounded by
+SINGLE_FLIGHT_TIMEOUT_S; a request that times out gets a 503 rather than
+adding one more load to a database that is already slow.
+
+Keys include the count of cache invalidations applied in this worker, so a
+request arriving after a write does not join a load that began before it,
+and the client's consistency token, so a client that just wrote never gets a
+result read from a replica that may not have its write yet.
+
+Flights for the sync routes wait on threading events; the async routes run
+the load as a task, so it finishes (and fills the caches) even if the
+request that started it is cancelled. An async load therefore opens its own
+session: the leader's request session is closed when the leader goes away.
+"""
+import asyncio
+import threading
+
+from fastapi import HTTPException
+
+from services import invalidation
+from services.replicas import current_context
+from settings import settings
+
+
+class SingleFlightTimeout(HTTPException):
+    def __init__(self):
+        super().__init__(
+            status_code=503, detail="Timed out waiting for the same request to finish",
+            headers={"Retry-After": "1"},
+        )
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    def __init__(self, name):
+        self.name = name
+        self.loads = 0
+        self.collapsed = 0
+        self.timeouts = 0
+        self.errors = 0
+        self._calls = {}
+        self._tasks = {}
+        self._lock = threading.Lock()
+
+    def key(self, *parts):
+        context = current_context()
+        token = (context.written_at, context.lsn) if context is not None and context.written_at else None
+        return (*parts, invalidation.stats["applied"], token)
+
+    def do(self, key, load, timeout=None):
+        """
+        load() for the first caller with `key`; the others wait for its result.
+        """
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+                self.loads += 1
+            else:
+                self.collapsed += 1
+        if leader:
+            try:
+                call.result = load()
+            except BaseException as exc:
+                call.error = exc
+                raise
+            finally:
+                with self._lock:
+                    del self._calls[key]
+                    if call.error is not None:
+                        self.errors += 1
+                call.done.set()
+            return call.result
+        if not call.done.wait(settings.single_flight_timeout_s if timeout is None else timeout):
+            with self._lock:
+                self.timeouts += 1
+            raise SingleFlightTimeout()
+        if call.error is not None:
+            raise call.error
+        return call.result
+
+    async def do_async(self, key, load, timeout=None):
+        """
+        Like do(), for coroutine functions; the event loop makes the check-and-start atomic.
+        """
+        task = self._tasks.get(key)
+        if task is None:
+            task = self._tasks[key] = asyncio.ensure_future(load())
+            task.add_done_callback(lambda finished: self._finished(key, finished))
+            self.loads += 1
+            # The leader waits for its own load without a timeout
+            return await asyncio.shield(task)
+        self.collapsed += 1
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(task), settings.single_flight_timeout_s if timeout is None else timeout,
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise SingleFlightTimeout()
+
+    def _finished(self, key, task):
+        if self._tasks.get(key) is task:
+            del self._tasks[key]
+        if not task.cancelled() and task.exception() is not None:
+            self.errors += 1
+
+
+recipe_flights = SingleFlight("recipe")
+tag_flights = SingleFlight("tag")
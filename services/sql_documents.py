@@ -0,0 +1,170 @@
+# services/sql_documents.py
+"""
+Recipe documents assembled as JSON by the database.
+
+The ORM read path loads a recipe, its steps, nutrition facts, ingredient
+links, ingredients, categories and tags as objects, builds a dict with
+services/serializers.py and encodes it. The statement here has the database
+build the same document with correlated subqueries: json_build_object and
+json_agg on PostgreSQL, json_object and json_group_array on SQLite. The app
+sends the returned text as it is, with no ORM objects and no encoding.
+
+SQL_JSON_ENDPOINTS picks the endpoints that read this way:
+
+    recipe   GET /recipes/{id}
+    list     GET /recipes/
+
+These reads skip the per-worker and shared recipe caches, which hold
+decoded documents. Use them where the caches hit rarely, or to compare
+the two paths (benchmarks/sql_json_check.py). The documents decode to the
+same values as recipe_to_dict with lists in primary-key order. PostgreSQL
+writes whole floats without a fractional part ("250" rather than "250.0").
+"""
+from sqlalchemy import Text, and_, bindparam, cast, func, literal_column, select
+
+from models import Category, Ingredient, NutritionFacts, Recipe, RecipeStep, Tag
+from models.recipes import recipe_categories, recipe_ingredients, recipe_tags
+from settings import settings
+
+_statements = {}
+
+
+def _key(name):
+    # Inline the keys rather than sending each one as a parameter
+    return literal_column(f"'{name}'")
+
+
+class _Dialect:
+    """
+    The JSON functions of one database.
+    """
+
+    def __init__(self, postgres):
+        self.postgres = postgres
+
+    def object(self, **fields):
+        pairs = []
+        for name, value in fields.items():
+            pairs += [_key(name), value]
+        return (func.json_build_object if self.postgres else func.json_object)(*pairs)
+
+    def nested(self, subquery):
+        # SQLite returns a subquery's JSON as text; json() marks it as JSON again
+        return subquery if self.postgres else func.json(subquery)
+
+    def array(self, element, *where, order_by, select_from, objects=True):
+        """
+        A correlated subquery returning `element` for each matching row as a JSON array, never NULL.
+        `objects` is False when the elements are plain values rather than JSON objects.
+        """
+        # Aggregating an ordered subquery keeps the order on both databases
+        rows = (
+            select(element.label("element")).select_from(select_from).where(*where).order_by(*order_by)
+            .correlate(Recipe).subquery()
+        )
+        value = rows.c.element
+        if self.postgres:
+            aggregate = func.coalesce(func.json_agg(value), literal_column("'[]'::json"))
+        else:
+            # Objects come out of the subquery as text
+            aggregate = func.json_group_array(func.json(value) if objects else value)
+        return self.nested(select(aggregate).scalar_subquery())
+
+
+def _document_column(dialect):
+    steps = dialect.array(
+        dialect.object(step_number=RecipeStep.step_number, instruction=RecipeStep.instruction),
+        RecipeStep.recipe_id == Recipe.id, RecipeStep.deleted.is_not(True),
+        order_by=[RecipeStep.id], select_from=RecipeStep,
+    )
+    # The first facts row, deleted or not, as Recipe.nutrition_facts loads it
+    facts = dialect.nested(
+        select(dialect.object(
+            calories=NutritionFacts.calories,
+            fat=NutritionFacts.fat,
+            carbohydrates=NutritionFacts.carbohydrates,
+            protein=NutritionFacts.protein,
+        ))
+        .where(NutritionFacts.recipe_id == Recipe.id)
+        .order_by(NutritionFacts.id)
+        .limit(1)
+        .scalar_subquery()
+    )
+    ingredients = dialect.array(
+        dialect.object(
+            item=Ingredient.item,
+            quantity=recipe_ingredients.c.quantity,
+            quantity_value=recipe_ingredients.c.quantity_value,
+            quantity_unit=recipe_ingredients.c.quantity_unit,
+            notes=recipe_ingredients.c.notes,
+            price=Ingredient.price,
+            currency=Ingredient.currency,
+        ),
+        recipe_ingredients.c.recipe_id == Recipe.id,
+        order_by=[recipe_ingredients.c.ingredient_id],
+        select_from=recipe_ingredients.join(Ingredient, Ingredient.id == recipe_ingredients.c.ingredient_id),
+    )
+    categories = dialect.array(
+        Category.name, recipe_categories.c.recipe_id == Recipe.id,
+        order_by=[Category.id], objects=False,
+        select_from=recipe_categories.join(Category, Category.id == recipe_categories.c.category_id),
+    )
+    tags = dialect.array(
+        Tag.name, recipe_tags.c.recipe_id == Recipe.id,
+        order_by=[Tag.id], objects=False,
+        select_from=recipe_tags.join(Tag, Tag.id == recipe_tags.c.tag_id),
+    )
+    return dialect.object(
+        id=Recipe.id,
+        title=Recipe.title,
+        prep_time_value=Recipe.prep_time_value,
+        prep_time_unit=Recipe.prep_time_unit,
+        cook_time_value=Recipe.cook_time_value,
+        cook_time_unit=Recipe.cook_time_unit,
+        total_time_minutes=Recipe.total_time_minutes,
+        servings=Recipe.servings,
+        image=Recipe.image,
+        instructions=steps,
+        nutrition_facts=facts,
+        ingredients=ingredients,
+        categories=categories,
+        tags=tags,
+    )
+
+
+def documents_statement():
+    """
+    (id, document JSON text) for the live recipes in the expanding parameter "ids".
+    """
+    postgres = settings.is_postgres
+    if postgres not in _statements:
+        document = _document_column(_Dialect(postgres))
+        if postgres:
+            # json_build_object returns json; the driver would decode it
+            document = cast(document, Text)
+        _statements[postgres] = (
+            select(Recipe.id, document.label("document"))
+            .where(and_(Recipe.id.in_(bindparam("ids", expanding=True)), Recipe.deleted.is_(False)))
+        )
+    return _statements[postgres]
+
+
+def load_json(db, recipe_ids):
+    """
+    {id: document bytes} for the live recipes among `recipe_ids`.
+    """
+    if not recipe_ids:
+        return {}
+    rows = db.execute(documents_statement(), {"ids": list(recipe_ids)})
+    return {recipe_id: document.encode("utf-8") for recipe_id, document in rows}
+
+
+async def load_json_async(db, recipe_ids):
+    if not recipe_ids:
+        return {}
+    rows = await db.execute(documents_statement(), {"ids": list(recipe_ids)})
+    return {recipe_id: document.encode("utf-8") for recipe_id, document in rows}
+
+
+def json_array(documents):
+    return b"[" + b",".join(documents) + b"]"
@@ -0,0 +1,84 @@
+# services/streaming.py
+"""
+Incremental JSON encoding for recipe listings too large to build in memory.
+
+A streamed listing reads the rows in batches of STREAM_BATCH_SIZE (a
+server-side cursor where the driver has one) and encodes each batch as soon as
+it is loaded, so only one batch of ORM objects, dicts and bytes is alive at a
+time. The body is the same {"recipes": [...]} document as the buffered path.
+"""
+import json
+
+from fastapi.responses import StreamingResponse
+from sqlalchemy import func, select
+
+from settings import settings
+from services.serializers import recipe_to_dict
+
+# Peak memory per listed recipe on the buffered path (ORM graph + dict + JSON),
+# measured with benchmarks/memory.py on the seeded catalog
+ROW_BYTES_ESTIMATE = 64 * 1024
+
+
+def count_statement(statement):
+    """
+    SELECT COUNT(*) over the rows a listing statement would return.
+    """
+    return select(func.count()).select_from(statement.order_by(None).subquery())
+
+
+def exceeds_memory_ceiling(row_count: int) -> bool:
+    ceiling = settings.response_memory_ceiling_mb
+    return bool(ceiling) and row_count * ROW_BYTES_ESTIMATE > ceiling * 1024 * 1024
+
+
+def _encode_batch(recipes, first: bool) -> bytes:
+    # Same encoder settings as JSONResponse.render
+    body = json.dumps(
+        [recipe_to_dict(recipe) for recipe in recipes],
+        ensure_ascii=False, allow_nan=False, indent=None, separators=(",", ":"),
+    )[1:-1]
+    if not body:
+        return b""
+    return (body if first else "," + body).encode("utf-8")
+
+
+def stream_recipe_list(statement, session_factory) -> StreamingResponse:
+    """
+    Stream a recipe listing from its own session; the request's session is
+    closed before a streamed body is sent.
+    """
+    def generate():
+        yield b'{"recipes":['
+        with session_factory() as session:
+            result = session.scalars(statement.execution_options(yield_per=settings.stream_batch_size))
+            first = True
+            for recipes in result.partitions():
+                chunk = _encode_batch(recipes, first)
+                if chunk:
+                    first = False
+                    yield chunk
+        yield b"]}"
+
+    return StreamingResponse(generate(), media_type="application/json")
+
+
+def stream_recipe_list_async(statement, session_factory) -> StreamingResponse:
+    """
+    Async counterpart of stream_recipe_list.
+    """
+    async def generate():
+        yield b'{"recipes":['
+        async with session_factory() as session:
+            result = await session.stream_scalars(
+                statement.execution_options(yield_per=settings.stream_batch_size)
+            )
+            first = True
+            async for recipes in result.partitions():
+                chunk = _encode_batch(recipes, first)
+                if chunk:
+                    first = False
+                    yield chunk
+        yield b"]}"
+
+    return StreamingResponse(generate(), media_type="application/json")
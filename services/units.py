@@ -0,0 +1,242 @@
+# services/units.py
+import re
+from functools import lru_cache
+from typing import Optional
+
+# Minutes per time unit, keyed by every spelling we accept
+TIME_UNITS = {
+    "s": 1 / 60, "sec": 1 / 60, "secs": 1 / 60, "second": 1 / 60, "seconds": 1 / 60,
+    "m": 1, "min": 1, "mins": 1, "minute": 1, "minutes": 1,
+    "h": 60, "hr": 60, "hrs": 60, "hour": 60, "hours": 60,
+    "d": 1440, "day": 1440, "days": 1440,
+}
+
+# Grams per mass unit used for fat, carbohydrates and protein
+NUTRIENT_UNITS = {
+    "": 1, "g": 1, "gr": 1, "gram": 1, "grams": 1,
+    "mg": 0.001, "milligram": 0.001, "milligrams": 0.001,
+    "mcg": 0.000001, "µg": 0.000001, "ug": 0.000001,
+    "kg": 1000, "oz": 28.349523125,
+}
+
+# Kilocalories per energy unit
+ENERGY_UNITS = {
+    "": 1, "kcal": 1, "cal": 1, "cals": 1, "calorie": 1, "calories": 1,
+    "kj": 1 / 4.184, "kilojoule": 1 / 4.184, "kilojoules": 1 / 4.184,
+}
+
+_MEASURE = re.compile(r"^\s*(\d+(?:[.,]\d+)?)\s*([^\d\s.][^\d\s]*?)?\.?\s*$")
+
+
+@lru_cache(maxsize=4096)
+def parse_measure(text: str):
+    """
+    Split a measurement such as "10g", "1.5 hrs" or "250" into (value, unit).
+    The unit is lower-cased and empty when missing. Returns None if the text is not
+    a single number followed by an optional unit.
+    """
+    match = _MEASURE.match(text)
+    if not match:
+        return None
+    value, unit = match.groups()
+    return float(value.replace(",", ".")), (unit or "").lower()
+
+
+def _convert(value, units: dict) -> Optional[float]:
+    if value is None:
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    parsed = parse_measure(str(value))
+    if parsed is None:
+        raise ValueError(f"Could not read a number from '{value}'")
+    amount, unit = parsed
+    if unit not in units:
+        raise ValueError(f"Unknown unit '{unit}' in '{value}'")
+    return amount * units[unit]
+
+
+def to_minutes(value, unit: Optional[str]) -> Optional[float]:
+    """
+    Convert a time value in the given free-text unit to minutes.
+    """
+    if value is None:
+        return None
+    key = (unit or "min").strip().lower().rstrip(".")
+    if key not in TIME_UNITS:
+        raise ValueError(f"Unknown time unit '{unit}'")
+    return value * TIME_UNITS[key]
+
+
+def parse_grams(value) -> Optional[float]:
+    """
+    Parse a nutrient amount such as "10g" or "500 mg" into grams.
+    """
+    return _convert(value, NUTRIENT_UNITS)
+
+
+def parse_kcal(value) -> Optional[float]:
+    """
+    Parse an energy amount such as "250", "250 kcal" or "1046 kJ" into kilocalories.
+    """
+    return _convert(value, ENERGY_UNITS)
+
+# Canonical unit code for each ingredient unit spelling
+INGREDIENT_UNITS = {
+    "tsp": "tsp", "tsps": "tsp", "teaspoon": "tsp", "teaspoons": "tsp", "t": "tsp",
+    "tbsp": "tbsp", "tbsps": "tbsp", "tbs": "tbsp", "tablespoon": "tbsp", "tablespoons": "tbsp", "T": "tbsp",
+    "cup": "cup", "cups": "cup", "c": "cup",
+    "floz": "fl oz", "fl oz": "fl oz", "fluid ounce": "fl oz", "fluid ounces": "fl oz",
+    "pint": "pint", "pints": "pint", "pt": "pint",
+    "quart": "quart", "quarts": "quart", "qt": "quart",
+    "gallon": "gallon", "gallons": "gallon", "gal": "gallon",
+    "ml": "ml", "milliliter": "ml", "milliliters": "ml", "millilitre": "ml", "millilitres": "ml",
+    "l": "l", "liter": "l", "liters": "l", "litre": "l", "litres": "l",
+    "g": "g", "gr": "g", "gram": "g", "grams": "g",
+    "kg": "kg", "kilogram": "kg", "kilograms": "kg",
+    "oz": "oz", "ounce": "oz", "ounces": "oz",
+    "lb": "lb", "lbs": "lb", "pound": "lb", "pounds": "lb",
+    "pinch": "pinch", "pinches": "pinch",
+    "clove": "clove", "cloves": "clove",
+}
+
+_UNICODE_FRACTIONS = {
+    "½": 0.5, "⅓": 1 / 3, "⅔": 2 / 3, "¼": 0.25, "¾": 0.75,
+    "⅛": 0.125, "⅜": 0.375, "⅝": 0.625, "⅞": 0.875,
+}
+
+_QUANTITY = re.compile(
+    r"^\s*(?:(?P<whole>\d+(?:[.,]\d+)?)(?![\d/.,])\s*)?"
+    r"(?:(?P<num>\d+)\s*/\s*(?P<den>\d+)|(?P<frac>[½⅓⅔¼¾⅛⅜⅝⅞]))?"
+    r"\s*(?P<unit>.*?)\s*$"
+)
+
+
+@lru_cache(maxsize=8192)
+def parse_quantity(text: str):
+    """
+    Parse an ingredient quantity such as "2 cups", "1 1/2 tbsp", "½ cup" or "3"
+    into (value, unit). The unit is a canonical code from INGREDIENT_UNITS, or None
+    for plain counts. Returns None when the text has no leading amount or the unit
+    is not one we know.
+    """
+    match = _QUANTITY.match(text or "")
+    if not match or not (match["whole"] or match["num"] or match["frac"]):
+        return None
+    value = float(match["whole"].replace(",", ".")) if match["whole"] else 0.0
+    if match["num"]:
+        if int(match["den"]) == 0:
+            return None
+        value += int(match["num"]) / int(match["den"])
+    elif match["frac"]:
+        value += _UNICODE_FRACTIONS[match["frac"]]
+
+    unit = match["unit"].rstrip(".")
+    if not unit:
+        return value, None
+    code = INGREDIENT_UNITS.get(unit) or INGREDIENT_UNITS.get(unit.lower())
+    if code is None:
+        return None
+    return value, code
+
+# ------------------------ Scaling tables ------------------------
+
+# Conversion factor of each canonical unit to its base (ml or g), grouped into the
+# systems whose units may replace each other when a quantity is rescaled. Units in
+# the same system are tried largest first; a unit is used once the amount reaches
+# its threshold (in base units); units without one are read but never chosen.
+_SYSTEMS = {
+    "us_volume": [
+        # (unit, factor to ml, threshold in ml)
+        ("tsp", 4.92892, 0),
+        ("tbsp", 14.7868, 14.7868),         # 3 tsp
+        ("fl oz", 29.5735, None),
+        ("cup", 236.588, 59.147),           # 1/4 cup
+        ("pint", 473.176, None),
+        ("quart", 946.353, None),
+        ("gallon", 3785.41, None),
+    ],
+    "metric_volume": [("ml", 1, 0), ("l", 1000, 1000)],
+    "metric_mass": [("g", 1, 0), ("kg", 1000, 1000)],
+    "imperial_mass": [("oz", 28.349523125, 0), ("lb", 453.59237, 453.59237)],
+}
+
+# unit -> (factor to base, system name); built once at import
+UNIT_FACTORS = {
+    unit: (factor, system)
+    for system, units in _SYSTEMS.items()
+    for unit, factor, _ in units
+}
+
+# system -> [(threshold, unit, factor)] largest first
+UNIT_LADDERS = {
+    system: sorted(
+        ((threshold, unit, factor) for unit, factor, threshold in units if threshold is not None),
+        reverse=True,
+    )
+    for system, units in _SYSTEMS.items()
+}
+
+# Fractions used when displaying US and count amounts
+_DISPLAY_FRACTIONS = (
+    (0, ""), (1 / 8, "1/8"), (1 / 4, "1/4"), (1 / 3, "1/3"), (3 / 8, "3/8"), (1 / 2, "1/2"),
+    (5 / 8, "5/8"), (2 / 3, "2/3"), (3 / 4, "3/4"), (7 / 8, "7/8"), (1, ""),
+)
+
+_PLURALS = {
+    "cup": "cups", "pint": "pints", "quart": "quarts", "gallon": "gallons",
+    "pinch": "pinches", "clove": "cloves",
+}
+
+
+def _round_fraction(value: float):
+    """
+    Round to the nearest kitchen fraction, returning (value, display text).
+    """
+    whole = int(value)
+    fraction, text = min(_DISPLAY_FRACTIONS, key=lambda option: abs(value - whole - option[0]))
+    if fraction == 1:
+        whole, fraction = whole + 1, 0
+    if whole == 0 and fraction == 0:
+        # Never round an ingredient away entirely
+        fraction, text = 1 / 8, "1/8"
+    display = " ".join(part for part in (str(whole) if whole else "", text) if part)
+    return round(whole + fraction, 3), display
+
+
+def _round_metric(value: float, unit: str):
+    if unit in ("kg", "l"):
+        value = round(value, 2)
+    elif value >= 100:
+        value = round(value / 5) * 5
+    elif value >= 10:
+        value = round(value)
+    elif value > 0:
+        # Never round an ingredient away entirely
+        value = max(round(value, 1), 0.1)
+    return value, f"{value:g}"
+
+
+def scale_quantity(value: float, unit: Optional[str], ratio: float):
+    """
+    Scale a parsed quantity and move it to the most readable unit of the same
+    system (e.g. 6 tsp -> 2 tbsp, 1500 g -> 1.5 kg). Uses only the precomputed
+    tables above. Returns (value, unit, display text).
+    """
+    amount = value * ratio
+    if unit in UNIT_FACTORS:
+        factor, system = UNIT_FACTORS[unit]
+        base = amount * factor
+        for threshold, candidate, candidate_factor in UNIT_LADDERS[system]:
+            if base >= threshold * 0.999:
+                amount, unit = base / candidate_factor, candidate
+                break
+        if system.startswith("metric"):
+            amount, text = _round_metric(amount, unit)
+            return amount, unit, f"{text} {unit}"
+
+    amount, text = _round_fraction(amount)
+    if unit is None:
+        return amount, None, text
+    label = _PLURALS.get(unit, unit) if amount > 1 else unit
+    return amount, unit, f"{text} {label}"
@@ -0,0 +1,73 @@
+# services/vocabulary.py
+"""
+Name -> id maps for the tag and category vocabularies.
+
+create_recipe and create_tag look names up case-insensitively, which is a
+scan of the table. With the vocabulary loaded a known name becomes a primary
+key lookup. Entries are hints only: a hit is checked against the row it points
+to, and a miss still falls back to the name query, so rows written by other
+workers are found either way.
+"""
+import threading
+
+from sqlalchemy import select
+
+from models import Category, Tag
+from services import invalidation
+
+
+class Vocabulary:
+    def __init__(self, model):
+        self.model = model
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def load(self, db):
+        rows = db.execute(select(self.model.id, self.model.name)).all()
+        with self._lock:
+            self._ids = {name.lower(): row_id for row_id, name in rows}
+
+    def remember(self, row):
+        with self._lock:
+            self._ids[row.name.lower()] = row.id
+
+    def forget(self, row_id):
+        with self._lock:
+            self._ids = {name: known_id for name, known_id in self._ids.items() if known_id != row_id}
+
+    def clear(self):
+        with self._lock:
+            self._ids = {}
+
+    def find(self, db, name):
+        """
+        The row whose name matches `name` case-insensitively, or None.
+        """
+        row_id = self._ids.get(name.lower())
+        if row_id is not None:
+            row = db.get(self.model, row_id)
+            if row is not None and row.name.lower() == name.lower():
+                return row
+        row = db.query(self.model).filter(self.model.name.ilike(name)).first()
+        if row is not None:
+            self.remember(row)
+        return row
+
+    def __len__(self):
+        return len(self._ids)
+
+
+tag_vocabulary = Vocabulary(Tag)
+category_vocabulary = Vocabulary(Category)
+
+
+@invalidation.subscribe
+def _evict(change):
+    if change.everything:
+        tag_vocabulary.clear()
+        category_vocabulary.clear()
+        return
+    for tag_id in change.tags:
+        tag_vocabulary.forget(tag_id)
+    for category_id in change.categories:
+        category_vocabulary.forget(category_id)
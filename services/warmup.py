@@ -0,0 +1,203 @@
+# services/warmup.py
+"""
+Warm-up run by each worker after startup, before /ready reports healthy.
+
+    connections   open the pool up to WARMUP_CONNECTIONS (default DB_POOL_SIZE)
+    statements    run the hot recipe and tag statements once so SQLAlchemy's
+                  compiled cache already holds them
+    vocabulary    load the tag and category name maps (services/vocabulary.py)
+    recipes       preload the WARMUP_RECIPES most-requested recipes, from the
+                  history saved by the previous workers, into the recipe cache
+                  (through the shared tier, when there is one)
+    cards         load the recipe card index behind GET /recipes/
+                  (services/card_index.py), when enabled
+
+A failing step is logged and reported on /ready; the worker still becomes
+ready, since serving cold is better than not serving.
+"""
+import asyncio
+import logging
+import time
+
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import select
+
+import database
+from settings import settings
+
+logger = logging.getLogger("cooknook.warmup")
+
+# Recipes loaded per query while preloading
+PRELOAD_BATCH_SIZE = 100
+
+
+class Readiness:
+    def __init__(self):
+        self.ready = False
+        self.steps = {}
+        self.started = None
+        self.seconds = None
+
+    def as_dict(self):
+        return {
+            "status": "ready" if self.ready else "warming",
+            "warmup_seconds": self.seconds,
+            "steps": self.steps,
+        }
+
+
+readiness = Readiness()
+
+
+# ------------------------ Steps ------------------------
+
+def _connection_count():
+    return min(settings.warmup_connections or settings.db_pool_size, settings.db_pool_size)
+
+
+def open_connections():
+    # Hold them all at once so the pool has to open each one
+    connections = [database.engine.connect() for _ in range(_connection_count())]
+    for connection in connections:
+        connection.close()
+    return {"opened": len(connections)}
+
+
+async def open_async_connections():
+    connections = [await database.async_engine.connect() for _ in range(_connection_count())]
+    for connection in connections:
+        await connection.close()
+    return {"opened": len(connections)}
+
+
+def _any_recipe_id():
+    from models import Recipe
+    return select(Recipe.id).where(Recipe.deleted.is_(False)).limit(1)
+
+
+def _hot_statements(recipe_id):
+    """
+    The statements behind the recipe and tag routes, with representative parameters.
+    """
+    from models import Category, Ingredient, Recipe, Tag
+    from routers.recipes import (
+        RecipeListFilters, recipe_by_id_statement, recipe_list_ids_statement, recipe_list_statement,
+    )
+    from services.document_loader import recipes_by_id_statement
+    from services.streaming import count_statement
+
+    filters = RecipeListFilters(
+        min_total_minutes=None, max_total_minutes=None, min_servings=None, max_servings=None,
+        min_calories=None, max_calories=None, sort="id", order="asc",
+    )
+    listing = recipe_list_statement(filters)
+    statements = [
+        # yield_per=1 loads a single row (and its relationships) but compiles the same statements
+        listing.execution_options(yield_per=1),
+        count_statement(listing),
+        recipe_list_ids_statement(filters),
+        recipes_by_id_statement([recipe_id or 0]),
+        recipe_by_id_statement(recipe_id or 0),
+        select(Tag),
+        select(Tag).where(Tag.id == 0).limit(1),
+        # Name lookups done by create_recipe and create_tag
+        select(Recipe).where(Recipe.title.ilike("")).limit(1),
+        select(Ingredient).where(Ingredient.item.ilike("")).limit(1),
+        select(Category).where(Category.name.ilike("")).limit(1),
+        select(Tag).where(Tag.name.ilike("")).limit(1),
+    ]
+    if settings.sql_json_endpoint_names:
+        from services.sql_documents import documents_statement
+
+        statements.append(documents_statement().params(ids=[recipe_id or 0]))
+    if settings.recipe_document_table:
+        from services.document_table import stored_statement
+
+        statements += [stored_statement(compressed).params(recipe_id=recipe_id or 0) for compressed in (False, True)]
+    return statements
+
+
+def compile_statements():
+    with database.SessionLocal() as db:
+        statements = _hot_statements(db.scalar(_any_recipe_id()))
+        for statement in statements:
+            db.execute(statement).first()
+    return {"statements": len(statements)}
+
+
+async def compile_async_statements():
+    async with database.AsyncSessionLocal() as db:
+        statements = _hot_statements(await db.scalar(_any_recipe_id()))
+        for statement in statements:
+            # stream() because the listing asks for yield_per
+            await (await db.stream(statement)).first()
+    return {"statements": len(statements)}
+
+
+def load_vocabularies():
+    from services.vocabulary import category_vocabulary, tag_vocabulary
+
+    with database.SessionLocal() as db:
+        tag_vocabulary.load(db)
+        category_vocabulary.load(db)
+    return {"tags": len(tag_vocabulary), "categories": len(category_vocabulary)}
+
+
+def preload_recipes():
+    from services.document_loader import load_documents
+    from services.recipe_cache import load_history, recipe_cache
+
+    history = load_history(settings.warmup_history_path)
+    count = min(settings.warmup_recipes, settings.recipe_cache_size)
+    ids = sorted(history, key=history.get, reverse=True)[:count]
+    loaded = 0
+    with database.SessionLocal() as db:
+        for start in range(0, len(ids), PRELOAD_BATCH_SIZE):
+            documents = load_documents(db, ids[start:start + PRELOAD_BATCH_SIZE])
+            # load_documents keeps only short batches in the cache; keep these all
+            for document in documents:
+                recipe_cache.put(document["id"], document, requested=False)
+            loaded += len(documents)
+            db.expunge_all()
+    return {"recipes": loaded}
+
+
+def load_card_index():
+    from services.card_index import card_index
+
+    card_index.ensure_current()
+    return card_index.status()
+
+
+# ------------------------ Runner ------------------------
+
+async def _run_step(name, step):
+    started = time.perf_counter()
+    try:
+        result = await step() if asyncio.iscoroutinefunction(step) else await run_in_threadpool(step)
+    except Exception as exc:
+        logger.exception("warm-up step failed", extra={"step": name})
+        result = {"error": f"{type(exc).__name__}: {exc}"}
+    readiness.steps[name] = {**result, "seconds": round(time.perf_counter() - started, 3)}
+
+
+async def warm_up():
+    """
+    Run every warm-up step, then mark the worker ready.
+    """
+    readiness.started = time.perf_counter()
+    steps = [("connections", open_connections)]
+    if database.async_engine is not None:
+        steps.append(("async_connections", open_async_connections))
+    steps.append(("statements", compile_statements))
+    if database.async_engine is not None:
+        steps.append(("async_statements", compile_async_statements))
+    steps += [("vocabulary", load_vocabularies), ("recipes", preload_recipes)]
+    if settings.recipe_card_index:
+        steps.append(("cards", load_card_index))
+
+    for name, step in steps:
+        await _run_step(name, step)
+    readiness.seconds = round(time.perf_counter() - readiness.started, 3)
+    readiness.ready = True
+    logger.info("warm-up finished", extra={"seconds": readiness.seconds})
@@ -0,0 +1,233 @@
+# settings.py
+import os
+from dataclasses import dataclass, fields
+
+from dotenv import load_dotenv
+
+# Load environment variables
+load_dotenv()
+
+
+def _env(name, default, cast):
+    value = os.getenv(name)
+    if value is None or value == "":
+        return default
+    if cast is bool:
+        return value.strip().lower() in ("1", "true", "yes", "on")
+    return cast(value)
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    Runtime configuration, read from the environment (or .env) once at import.
+    Each field is set by the upper-cased variable of the same name.
+    """
+
+    database_url: str = None
+    use_async_db: bool = False
+
+    # Connection pool (applies to the sync and the async engine separately)
+    db_pool_size: int = 5
+    db_max_overflow: int = 10
+    db_pool_timeout: float = 30.0
+    db_pool_recycle: int = 1800
+    db_pool_pre_ping: bool = True
+    # Per-statement timeout enforced by PostgreSQL; 0 disables it
+    db_statement_timeout_ms: int = 0
+
+    # Log every SQL statement (synchronously, so keep it off under load)
+    sql_echo: bool = False
+    # Statements at least this slow are logged with their parameters and route
+    slow_query_ms: int = 500
+    log_level: str = "INFO"
+
+    # Worker threads for sync endpoints (AnyIO's default is 40)
+    thread_limiter_size: int = 15
+    # Processes running meal-plan searches; 0 uses one per CPU
+    meal_plan_workers: int = 0
+
+    # Shared directory where each worker writes its metrics for /metrics to merge;
+    # unset for a single process. Empty it before starting the server.
+    metrics_multiproc_dir: str = None
+
+    # Requests sending this value in X-Profile-Token are profiled; unset disables profiling
+    profile_token: str = None
+    # Fraction of those requests actually profiled
+    profile_sample_rate: float = 1.0
+    profile_dir: str = "profiles"
+
+    # Recipe listings estimated to need more memory than this are streamed; 0 always builds them whole
+    response_memory_ceiling_mb: int = 256
+    # Rows loaded and encoded per step of a streamed listing
+    stream_batch_size: int = 500
+    # Trace allocations and report peak memory per route on /health/memory (serializes requests)
+    memory_profiling: bool = False
+
+    # Append sampled, scrubbed requests to this JSONL file for replay; unset disables capture
+    capture_path: str = None
+    capture_sample_rate: float = 1.0
+    # Larger request bodies are captured without their body
+    capture_max_body_bytes: int = 65536
+
+    # Apply pending schema migrations when a worker starts; turn off when a deploy step runs them
+    migrate_on_startup: bool = True
+
+    # Serialized recipes kept per worker for GET /recipes/{id}; 0 disables the cache
+    recipe_cache_size: int = 1000
+    # List, filter and sort GET /recipes/ from a compact in-memory index of recipe cards
+    # (see services/card_index.py) instead of querying the database. Off by default: the
+    # index has no expiry, so with several workers it needs INVALIDATION_BACKEND to see
+    # the other workers' writes, and on PostgreSQL it sorts titles by code point
+    recipe_card_index: bool = False
+    # Comma-separated endpoints whose recipe documents the database assembles as JSON,
+    # skipping the ORM and the recipe caches (see services/sql_documents.py): "recipe", "list"
+    sql_json_endpoints: str = None
+    # Keep each recipe's rendered document in the recipe_documents table, rewritten in the
+    # writing transaction, and serve GET /recipes/{id} from it (see services/document_table.py)
+    recipe_document_table: bool = False
+    # Open connections, compile the hot statements and preload caches before /ready reports healthy
+    warmup_enabled: bool = True
+    # Connections opened by the warm-up; 0 opens DB_POOL_SIZE
+    warmup_connections: int = 0
+    # Most-requested recipes preloaded into the recipe cache
+    warmup_recipes: int = 200
+    # File where workers save recipe request counts on shutdown for the next warm-up;
+    # unset preloads no recipes. Point it at storage that survives deploys.
+    warmup_history_path: str = None
+
+    # Shared cache tier for serialized recipes (see services/shared_cache.py):
+    # redis://host:port/db, or memory:// for an in-process stand-in; unset disables it
+    recipe_shared_cache_url: str = None
+    recipe_shared_cache_ttl_s: float = 3600.0
+    # Documents larger than this (as JSON) are stored compressed; 0 never compresses
+    recipe_shared_cache_compress_bytes: int = 4096
+    # Socket timeout for the shared cache; a slow or failing store is skipped for a while
+    recipe_shared_cache_timeout_s: float = 0.1
+    # How long a request waits for another worker loading the same missing recipe
+    recipe_shared_cache_lock_wait_s: float = 1.0
+    # How long a recipe or tag read waits for an identical read already running
+    # (see services/single_flight.py) before giving up with a 503
+    single_flight_timeout_s: float = 5.0
+
+    # Memory-mapped file of every live recipe, shared by the workers on a host
+    # (see services/catalog_snapshot.py); unset disables it
+    catalog_snapshot_path: str = None
+    # How long a rebuild waits for more writes, and how often workers look for a new file
+    catalog_snapshot_debounce_s: float = 0.5
+    catalog_snapshot_poll_interval_s: float = 1.0
+
+    # Comma-separated read replica URLs; GET requests read from them (see services/replicas.py)
+    database_replica_urls: str = None
+    replica_check_interval_s: float = 5.0
+    # Where replicas report no WAL position, clients read from the primary for this long after a write
+    read_your_writes_window_s: float = 5.0
+
+    # How workers tell each other to evict cached recipes and tags after a write
+    # (see services/invalidation.py): "postgres" (LISTEN/NOTIFY), "unix" (datagram
+    # sockets in INVALIDATION_SOCKET_DIR, single host) or unset for a single worker
+    invalidation_backend: str = None
+    invalidation_socket_dir: str = "/tmp/cooknook-invalidation"
+    # How often workers check the shared generation counter for lost messages
+    invalidation_poll_interval_s: float = 1.0
+
+    @classmethod
+    def from_env(cls):
+        return cls(**{
+            field.name: _env(field.name.upper(), field.default, field.type)
+            for field in fields(cls)
+        })
+
+    @property
+    def replica_urls(self) -> list:
+        return [url.strip() for url in (self.database_replica_urls or "").split(",") if url.strip()]
+
+    @property
+    def sql_json_endpoint_names(self) -> set:
+        return {name.strip() for name in (self.sql_json_endpoints or "").split(",") if name.strip()}
+
+    @property
+    def is_postgres(self) -> bool:
+        return (self.database_url or "").startswith("postgresql")
+
+    def validate(self):
+        """
+        Check the settings together and raise ValueError listing every problem.
+        """
+        errors = []
+        if not self.database_url:
+            errors.append("DATABASE_URL is not set")
+        if self.db_pool_size < 1:
+            errors.append("DB_POOL_SIZE must be at least 1")
+        if self.db_max_overflow < 0:
+            errors.append("DB_MAX_OVERFLOW cannot be negative")
+        if self.db_pool_timeout <= 0:
+            errors.append("DB_POOL_TIMEOUT must be positive")
+        if self.thread_limiter_size < 1:
+            errors.append("THREAD_LIMITER_SIZE must be at least 1")
+        # Every sync request thread can hold a connection; more threads than
+        # connections only moves the queue from the limiter to pool checkout.
+        max_connections = self.db_pool_size + self.db_max_overflow
+        if self.thread_limiter_size > max_connections:
+            errors.append(
+                f"THREAD_LIMITER_SIZE ({self.thread_limiter_size}) exceeds "
+                f"DB_POOL_SIZE + DB_MAX_OVERFLOW ({max_connections})"
+            )
+        if self.meal_plan_workers < 0:
+            errors.append("MEAL_PLAN_WORKERS must not be negative")
+        if self.slow_query_ms < 0:
+            errors.append("SLOW_QUERY_MS cannot be negative")
+        if self.db_statement_timeout_ms < 0:
+            errors.append("DB_STATEMENT_TIMEOUT_MS cannot be negative")
+        if self.db_statement_timeout_ms and not self.is_postgres:
+            errors.append("DB_STATEMENT_TIMEOUT_MS is only supported on PostgreSQL")
+        if not 0 <= self.profile_sample_rate <= 1:
+            errors.append("PROFILE_SAMPLE_RATE must be between 0 and 1")
+        if self.response_memory_ceiling_mb < 0:
+            errors.append("RESPONSE_MEMORY_CEILING_MB cannot be negative")
+        if self.stream_batch_size < 1:
+            errors.append("STREAM_BATCH_SIZE must be at least 1")
+        if not self.sql_json_endpoint_names <= {"recipe", "list"}:
+            errors.append("SQL_JSON_ENDPOINTS may only list 'recipe' and 'list'")
+        if not 0 <= self.capture_sample_rate <= 1:
+            errors.append("CAPTURE_SAMPLE_RATE must be between 0 and 1")
+        if self.recipe_cache_size < 0:
+            errors.append("RECIPE_CACHE_SIZE cannot be negative")
+        if self.warmup_connections < 0:
+            errors.append("WARMUP_CONNECTIONS cannot be negative")
+        if self.warmup_recipes < 0:
+            errors.append("WARMUP_RECIPES cannot be negative")
+        if self.recipe_shared_cache_url and not self.recipe_shared_cache_url.startswith(("redis://", "memory:")):
+            errors.append("RECIPE_SHARED_CACHE_URL must be a redis:// or memory:// URL")
+        if self.recipe_shared_cache_ttl_s <= 0:
+            errors.append("RECIPE_SHARED_CACHE_TTL_S must be positive")
+        if self.recipe_shared_cache_compress_bytes < 0:
+            errors.append("RECIPE_SHARED_CACHE_COMPRESS_BYTES cannot be negative")
+        if self.recipe_shared_cache_timeout_s <= 0:
+            errors.append("RECIPE_SHARED_CACHE_TIMEOUT_S must be positive")
+        if self.recipe_shared_cache_lock_wait_s < 0:
+            errors.append("RECIPE_SHARED_CACHE_LOCK_WAIT_S cannot be negative")
+        if self.single_flight_timeout_s <= 0:
+            errors.append("SINGLE_FLIGHT_TIMEOUT_S must be positive")
+        if self.catalog_snapshot_debounce_s < 0:
+            errors.append("CATALOG_SNAPSHOT_DEBOUNCE_S cannot be negative")
+        if self.catalog_snapshot_poll_interval_s <= 0:
+            errors.append("CATALOG_SNAPSHOT_POLL_INTERVAL_S must be positive")
+        if self.replica_check_interval_s <= 0:
+            errors.append("REPLICA_CHECK_INTERVAL_S must be positive")
+        if self.read_your_writes_window_s < 0:
+            errors.append("READ_YOUR_WRITES_WINDOW_S cannot be negative")
+        if self.invalidation_backend not in (None, "postgres", "unix"):
+            errors.append("INVALIDATION_BACKEND must be 'postgres', 'unix' or unset")
+        if self.invalidation_backend == "postgres" and not self.is_postgres:
+            errors.append("INVALIDATION_BACKEND=postgres needs a PostgreSQL DATABASE_URL")
+        if self.invalidation_poll_interval_s <= 0:
+            errors.append("INVALIDATION_POLL_INTERVAL_S must be positive")
+        if self.recipe_card_index and self.metrics_multiproc_dir and self.invalidation_backend is None:
+            # Several workers: without messages, each index would never see the others' writes
+            errors.append("RECIPE_CARD_INDEX with several workers (METRICS_MULTIPROC_DIR) needs INVALIDATION_BACKEND")
+        if errors:
+            raise ValueError("Invalid settings:\n  - " + "\n  - ".join(errors))
+
+
+settings = Settings.from_env()